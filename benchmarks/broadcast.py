@@ -0,0 +1,41 @@
+"""
+Measures the time `sqf.client.Simulation` takes to deliver broadcasts, as a function of
+the number of clients and of broadcasts. Every client has a public variable event handler.
+
+    python -m benchmarks.broadcast --clients 1 10 100 --broadcasts 10 100 1000
+"""
+import argparse
+import time
+
+from sqf.client import Simulation, Client
+from sqf.types import Number
+
+
+def run(clients, broadcasts):
+    sim = Simulation()
+    for _ in range(clients):
+        client_id = sim.add_client(Client(sim))
+        sim.clients[client_id].execute('"x" addPublicVariableEventHandler {y = _this select 1};')
+
+    start = time.perf_counter()
+    for i in range(broadcasts):
+        sim.broadcast('x', Number(i))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scaling of the broadcasts of a simulation')
+    parser.add_argument('--clients', nargs='+', type=int, default=[1, 10, 100])
+    parser.add_argument('--broadcasts', nargs='+', type=int, default=[10, 100])
+    args = parser.parse_args()
+
+    print('%8s %12s %12s %16s' % ('clients', 'broadcasts', 'time (s)', 'deliveries/s'))
+    for clients in args.clients:
+        for broadcasts in args.broadcasts:
+            elapsed = run(clients, broadcasts)
+            deliveries = (clients + 1)*broadcasts
+            print('%8d %12d %12.3f %16.0f' % (clients, broadcasts, elapsed, deliveries/elapsed))
+
+
+if __name__ == '__main__':
+    main()
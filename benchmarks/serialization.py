@@ -0,0 +1,58 @@
+"""
+Compares the size of the trees serialized by `sqf.serialization` and the time of `loads` with the size
+of the code and the time of `sqf.parser.parse`, on files or on generated code of some numbers of lines.
+
+    python -m benchmarks.serialization --lines 100 1000
+    python -m benchmarks.serialization path/to/file.sqf
+"""
+import argparse
+import time
+
+from sqf.parser import parse
+from sqf.serialization import dumps, loads
+
+
+def generate(lines):
+    return ''.join('_a%d = [1, 2] select 0;\nif (_a%d > 2) then {\n    hint str _a%d;\n};\n' % (i, i, i)
+                   for i in range(lines // 4))
+
+
+def best_time(function, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run(code):
+    tree = parse(code)
+    data = dumps(tree)
+    return len(code.encode('utf-8')), len(data), best_time(lambda: parse(code)), best_time(lambda: loads(data))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Size and speed of the serialization of parsed trees')
+    parser.add_argument('files', nargs='*', help='Files to measure, instead of generated code')
+    parser.add_argument('--lines', nargs='+', type=int, default=[100, 1000])
+    args = parser.parse_args()
+
+    if args.files:
+        cases = []
+        for path in args.files:
+            with open(path, encoding='utf-8') as f:
+                cases.append((path, f.read()))
+    else:
+        cases = [('%d lines' % lines, generate(lines)) for lines in args.lines]
+
+    print('%-20s %10s %10s %8s %10s %10s %8s' % (
+        'code', 'code (B)', 'data (B)', 'size', 'parse (s)', 'loads (s)', 'speedup'))
+    for name, code in cases:
+        code_size, data_size, parse_time, loads_time = run(code)
+        print('%-20s %10d %10d %7.2fx %10.4f %10.4f %7.1fx' % (
+            name, code_size, data_size, data_size/code_size, parse_time, loads_time, parse_time/loads_time))
+
+
+if __name__ == '__main__':
+    main()
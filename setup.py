@@ -16,6 +16,7 @@ setup(
     entry_points={
         'console_scripts': [
             'sqflint = sqflint:_main',
+            'sqftest = sqf.testrunner:_main',
         ],
     },
     classifiers=[
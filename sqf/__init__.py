@@ -0,0 +1,6 @@
+def __getattr__(name):
+    # imported on first use, so that importing the modules of this package does not import asyncio
+    if name in ('analyze_async', 'analyze_files_async'):
+        from sqf import async_analysis
+        return getattr(async_analysis, name)
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
@@ -1,7 +1,5 @@
-from copy import deepcopy
-
 from sqf.types import Statement, Code, Nothing, Variable, Array, String, Type, File, BaseType, \
-    Number, Preprocessor, Script, Anything
+    Number, Preprocessor, Script, Anything, fork_value, Namespace
 from sqf.interpreter_types import InterpreterType, PrivateType, ForType, SwitchType, \
     DefineStatement, DefineResult, IfDefResult
 from sqf.keywords import Keyword, PREPROCESSORS
@@ -13,6 +11,9 @@ from sqf.common_expressions import COMMON_EXPRESSIONS, ForEachExpression, ElseEx
 from sqf.expressions_cache import values_to_expressions, build_database
 from sqf.parser_types import Comment
 from sqf.parser import parse
+from sqf.timing import phase
+from sqf.namespace import normalize
+from sqf.cfg import build as build_cfg
 
 
 def all_equal(iterable):
@@ -44,15 +45,118 @@ class UnexecutedCode:
     """
     A piece of code that needs to be re-run on a contained env to check for issues.
     We copy the state of the analyzer (namespaces) so we get what that code would run.
+    Like `Interpreter.fork`, only the arrays are copied.
     """
     def __init__(self, code, analyzer):
-        self.namespaces = deepcopy(analyzer._namespaces)
+        memo = {}
+
+        def fork(value):
+            return fork_value(value, memo)
+
+        self.namespaces = {name: namespace.fork(fork) for name, namespace in analyzer._namespaces.items()}
         self.namespace_name = analyzer.current_namespace.name
         self.code = code
         self.position = code.position
         self.delete_scope_level = analyzer.delete_scope_level
 
 
+class FunctionSummary:
+    """
+    What calling a function with arguments of given types does: the parameters it declares with
+    `params`, the type it returns and the global variables it reads and assigns.
+    """
+    def __init__(self):
+        self.params = None  # [(name, tuple of the accepted types, or None when any type)]
+        self.return_type = Anything
+        self.globals_read = set()
+        self.globals_written = {}  # name -> type
+
+
+class Function:
+    """
+    A global variable assigned to a code literal (e.g. `fnc_foo = {...}`), and its summaries
+    by the types of the arguments it is called with.
+    """
+    def __init__(self, name, code):
+        self.name = name
+        self.code = code
+        self.summaries = {}  # signature -> FunctionSummary (None while it is computed)
+        self._single_exit = None
+
+    @property
+    def single_exit(self):
+        """
+        Whether the function always returns on its last statement (i.e. has no `exitWith` or `throw`),
+        so its return type is the type of its last statement.
+        """
+        if self._single_exit is None:
+            self._single_exit = len(build_cfg(self.code).exit.predecessors) == 1
+        return self._single_exit
+
+
+def _value_type(value):
+    # the type of a value, for the types whose values can be created without arguments
+    if not isinstance(value, Type) or isinstance(value, (InterpreterType, Variable, Namespace, File)):
+        return Anything
+    return type(value)
+
+
+def _signature(arguments):
+    if isinstance(arguments, Array) and not arguments.is_undefined:
+        return Array, tuple(_value_type(value) for value in arguments.value)
+    return _value_type(arguments)
+
+
+def _declared_params(base_token):
+    params = []
+    for token in base_token.value:
+        if isinstance(token, String):
+            params.append((token.value, None))
+        elif isinstance(token, Array) and not token.is_undefined and token.value and \
+                isinstance(token.value[0], String):
+            types = None
+            if len(token.value) >= 3 and isinstance(token.value[2], Array) and not token.value[2].is_undefined:
+                types = tuple(type(value) for value in token.value[2].value)
+            params.append((token.value[0].value, types))
+    return params
+
+
+class SymbolTable:
+    """
+    The private variables declared by the analyzed code and how many times each was used.
+
+    Each declaration is a symbol, identified by the namespace, the scope level and the
+    (normalized) name of the variable, and numbered in order of declaration. A declaration
+    with the identity of an existing symbol (e.g. on a sibling scope) replaces it.
+    """
+    def __init__(self):
+        self._ids = {}  # (namespace name, scope level, normalized name) -> symbol id
+        self.counts = []  # symbol id -> number of uses
+        self.variables = []  # symbol id -> the declaring `String`
+
+    def declare(self, namespace_name, level, name, variable):
+        key = namespace_name, level, normalize(name)
+        symbol = self._ids.get(key)
+        if symbol is None:
+            self._ids[key] = len(self.counts)
+            self.counts.append(0)
+            self.variables.append(variable)
+        else:
+            self.counts[symbol] = 0
+            self.variables[symbol] = variable
+
+    def use(self, namespace_name, level, name):
+        symbol = self._ids.get((namespace_name, level, normalize(name)))
+        if symbol is not None:
+            self.counts[symbol] += 1
+
+    def unused(self):
+        """
+        Returns the declaring `String` of the symbols that were never used, in order of declaration.
+        """
+        return [variable for count, variable in zip(self.counts, self.variables) if count == 0]
+
+
 class Analyzer(BaseInterpreter):
     """
     The Analyzer. This is an interpreter that:
@@ -70,8 +174,15 @@ class Analyzer(BaseInterpreter):
         self.unevaluated_interpreter_tokens = []
         self._unexecuted_codes = {}
         self._executed_codes = {}  # executed code -> result
+        # the un-executed codes already analyzed in this file, shared with the nested analyzers
+        self._analyzed_codes = set()
+
+        self.symbols = SymbolTable()
 
-        self.variable_uses = {}
+        # normalized name -> `Function` assigned to it, shared with the nested analyzers
+        self._functions = {}
+        # the `FunctionSummary` collected by this analyzer, when it analyzes a call of a function
+        self.summary = None
 
         # a counter used by `self.assign` to identify if a variable is deleted (assigned to Anything) or not.
         self.delete_scope_level = 0
@@ -79,6 +190,9 @@ class Analyzer(BaseInterpreter):
         # list of variables that we currently know the type during the script.
         self.undefined_variables = set()
 
+        # a `sqf.timing.Timer` that, when set, collects the time spent on un-executed code
+        self.timer = None
+
     def exception(self, exception):
         self.exceptions.append(exception)
 
@@ -121,9 +235,9 @@ class Analyzer(BaseInterpreter):
                 result = self.private_default_class()
             result.position = token.position
 
-            key = '%s_%s_%s' % (namespace_name, scope.level, scope.normalize(token.name))
-            if key in self.variable_uses:
-                self.variable_uses[key]['count'] += 1
+            self.symbols.use(namespace_name, scope.level, token.name)
+            if self.summary is not None and token.is_global:
+                self.summary.globals_read.add(normalize(token.name))
 
         elif isinstance(token, Array) and not token.is_undefined:
             result = Array([self.value(self.execute_token(s)) for s in token.value])
@@ -167,10 +281,22 @@ class Analyzer(BaseInterpreter):
         """
         container = self._unexecuted_codes[code_key]
 
+        # the same code (e.g. referenced by more than one variable, or found by more than one nested analyzer)
+        # is only analyzed once per file. The position of a code is the one of where it was referenced,
+        # so its source is identified by the position of its first token.
+        source = next((token._position for token in container.code._tokens if token._position is not None),
+                      container.position)
+        analyzed_key = source, self.exe_code_key(container.code, extra_scope), own_namespace
+        if analyzed_key in self._analyzed_codes:
+            return
+        self._analyzed_codes.add(analyzed_key)
+
         analyzer = Analyzer()
         if not own_namespace:
             analyzer._namespaces = container.namespaces
-        analyzer.variable_uses = self.variable_uses
+        analyzer.symbols = self.symbols
+        analyzer._analyzed_codes = self._analyzed_codes
+        analyzer._functions = self._functions
         analyzer.delete_scope_level = container.delete_scope_level
 
         file = File(container.code._tokens)
@@ -199,8 +325,9 @@ class Analyzer(BaseInterpreter):
             self._executed_codes[exe_code_key] = outcome
 
         if isinstance(code, File):
-            for key in self._unexecuted_codes:
-                self.execute_unexecuted_code(key)
+            with phase(self.timer, 'unexecuted_code'):
+                for key in self._unexecuted_codes:
+                    self.execute_unexecuted_code(key)
 
             # collect `private` statements that have a variable but were not collected by the assignment operator
             # this check is made at the scope level
@@ -214,14 +341,75 @@ class Analyzer(BaseInterpreter):
             # this check is made at script level
             if not delete_mode:
                 # collect variables that were not used
-                for key in self.variable_uses:
-                    if self.variable_uses[key]['count'] == 0:
-                        variable = self.variable_uses[key]['variable']
-                        self.exception(
-                            SQFWarning(variable.position, 'Variable "%s" not used' % variable.value))
+                for variable in self.symbols.unused():
+                    self.exception(SQFWarning(variable.position, 'Variable "%s" not used' % variable.value))
 
         return outcome
 
+    def summarize(self, function, arguments):
+        """
+        Returns the `FunctionSummary` of calling `function` with `arguments`, analyzing its code once
+        per signature of the types of the arguments, or None when it is being analyzed (recursion).
+        """
+        signature = _signature(arguments)
+        if signature in function.summaries:
+            return function.summaries[signature]
+        function.summaries[signature] = None
+
+        analyzer = Analyzer()
+        analyzer._functions = self._functions
+        analyzer.summary = FunctionSummary()
+        if isinstance(arguments, Array) and not arguments.is_undefined:
+            this = Array([value_type() for value_type in signature[1]])
+        else:
+            this = signature()
+        this.position = function.code.position
+
+        # the warnings of the code are the ones of its analysis as un-executed code
+        outcome = analyzer.execute_code(function.code, extra_scope={'_this': this})
+        # the analyzer discards the value of a statement ending with ";", but SQF returns the value of
+        # the last statement whatever its ending, so its type is only known when it has no ending.
+        statements = function.code.base_tokens
+        if function.single_exit and not (statements and statements[-1].ending):
+            analyzer.summary.return_type = _value_type(outcome)
+        function.summaries[signature] = analyzer.summary
+        return analyzer.summary
+
+    def call_function(self, token, arguments):
+        """
+        Returns the outcome of calling `token` with `arguments`. When it is a global variable
+        assigned to a code on this file, its summary is used to check the arguments and
+        obtain the type it returns and the global variables it assigns.
+        """
+        function = None
+        if isinstance(token, Variable) and token.is_global:
+            function = self._functions.get(normalize(token.name))
+        if function is None:
+            return Anything()
+        summary = self.summarize(function, arguments)
+        if summary is None:
+            return Anything()
+
+        if summary.params and isinstance(arguments, Array) and not arguments.is_undefined:
+            for i, ((name, types), argument) in enumerate(zip(summary.params, arguments.value)):
+                if types and type(argument) not in (Anything, Nothing) + types:
+                    self.exception(SQFWarning(
+                        arguments.position, 'Argument %d of "%s" ("%s") is %s but must be of types [%s]' % (
+                            i, function.name, name, type(argument).__name__,
+                            ','.join(value_type.__name__ for value_type in types))))
+
+        scope = self.current_namespace.base_scope
+        for name, written_type in summary.globals_written.items():
+            if name in scope and type(scope[name]) != written_type:
+                written_type = Anything
+            scope[name] = written_type()
+        return summary.return_type()
+
+    def add_params(self, base_token, arguments=None):
+        if self.summary is not None and self.summary.params is None and arguments is None:
+            self.summary.params = _declared_params(base_token)
+        return super().add_params(base_token, arguments)
+
     def _parse_params_args(self, arguments, base_token):
         if isinstance(arguments, Anything) or (isinstance(arguments, Array) and arguments.is_undefined):
             return [Anything() for _ in range(len(base_token))]
@@ -229,9 +417,7 @@ class Analyzer(BaseInterpreter):
 
     def _add_private(self, variable):
         super()._add_private(variable)
-        scope = self.current_scope
-        key = '%s_%s_%s' % (self.current_namespace.name, scope.level, scope.normalize(variable.value))
-        self.variable_uses[key] = {'count': 0, 'variable': variable}
+        self.symbols.declare(self.current_namespace.name, self.current_scope.level, variable.value, variable)
 
     def assign(self, lhs, rhs_v):
         """
@@ -263,6 +449,8 @@ class Analyzer(BaseInterpreter):
             rhs_t = Anything
 
         scope[lhs_name] = rhs_t()
+        if self.summary is not None and scope.level == 0 and not lhs_name.startswith('_'):
+            self.summary.globals_written[normalize(lhs_name)] = _value_type(scope[lhs_name])
 
         if scope.level == 0 and lhs_name.startswith('_'):
             self.exception(
@@ -274,12 +462,11 @@ class Analyzer(BaseInterpreter):
         outcome = Nothing()
         outcome.position = statement.position
 
-        base_tokens = []
-        for token in statement.tokens:
-            if not statement.is_base_token(token):
-                self.execute_other(token)
-            else:
-                base_tokens.append(token)
+        base_tokens = statement.base_tokens
+        if len(base_tokens) != len(statement.tokens):
+            for token in statement.tokens:
+                if not statement.is_base_token(token):
+                    self.execute_other(token)
 
         if not base_tokens:
             return outcome
@@ -339,6 +526,8 @@ class Analyzer(BaseInterpreter):
 
                 rhs_v = self.value(base_tokens[2])
                 self.assign(lhs, rhs_v)
+                if lhs.is_global and isinstance(rhs_v, Code) and not rhs_v.is_undefined:
+                    self._functions[normalize(lhs.name)] = Function(lhs.name, rhs_v)
                 if not statement.ending:
                     outcome = rhs_v
             return outcome
@@ -415,6 +604,12 @@ class Analyzer(BaseInterpreter):
                 # when a case is found but we cannot decide on the type, it is anything
                 outcome = Anything()
 
+            # calls of code that is not a literal (e.g. a variable assigned to a function)
+            if case_found.keyword == Keyword('call') and not (isinstance(values[-1], Code) and
+                                                              not values[-1].is_undefined):
+                arguments = values[0] if len(values) == 3 else Anything()
+                outcome = self.call_function(tokens[-1], arguments)
+
             extra_scope = None
             if case_found.keyword in (Keyword('select'), Keyword('apply'), Keyword('count')):
                 extra_scope = {'_x': Anything()}
@@ -542,3 +737,16 @@ def analyze(statement, analyzer=None):
     analyzer.execute_code(file, extra_scope={'_this': arg})
 
     return analyzer
+
+
+def analyze_source(source):
+    """
+    Parses and analyzes a pair (name, code), returning (name, exceptions), where the exceptions
+    are the parser error or the exceptions of the analyzer.
+    """
+    name, code = source
+    try:
+        statement = parse(code)
+    except SQFParserError as e:
+        return name, [e]
+    return name, analyze(statement).exceptions
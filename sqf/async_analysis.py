@@ -0,0 +1,145 @@
+"""
+Coroutines that analyze code on a bounded pool of processes, so that asyncio applications are not
+blocked while the analyzer runs.
+
+Usage:
+    exceptions = await sqf.analyze_async(code)
+    results = await sqf.analyze_files_async(paths)  # [(path, exceptions), ...]
+
+    async with AsyncAnalyzer(workers=4, concurrency=8) as analyzer:
+        exceptions = await analyzer.analyze(code)
+"""
+import asyncio
+
+from sqf.pool import Pool
+
+
+def _analyze_code(name, code):
+    # runs in the worker processes, that import the analyzer on first use
+    from sqf.analyzer import analyze_source
+    return analyze_source((name, code))[1]
+
+
+def _analyze_file(path):
+    with open(path) as f:
+        return _analyze_code(path, f.read())
+
+
+def _aborted(error):
+    # imported on first use, since it imports the analyzer
+    from sqf.parallel_analysis import aborted
+    return aborted(error)
+
+
+def _release(loop, semaphore):
+    # called by the thread of the pool when an analysis finishes
+    try:
+        loop.call_soon_threadsafe(semaphore.release)
+    except RuntimeError:  # the loop was closed meanwhile
+        pass
+
+
+class AsyncAnalyzer:
+    """
+    Analyzes code on a pool of `workers` processes (by default one per CPU), with at most `concurrency`
+    (by default `workers`) analyses submitted at a time; the others wait without using the pool.
+
+    Cancelling an analysis that waits is immediate. An analysis that is already running in a process
+    cannot be interrupted: its result is discarded and it keeps its place in `concurrency` until it
+    finishes, so cancelled work never exceeds the limit.
+
+    The processes are a `sqf.pool.Pool`: an analysis that fails (e.g. its process dies) returns a single
+    "Analysis aborted" error (see `sqf.parallel_analysis.aborted`), its process is replaced and the other
+    analyses continue.
+    """
+    def __init__(self, workers=None, concurrency=None):
+        self._pool = Pool(workers)
+        self.workers = self._pool.workers
+        self.concurrency = concurrency or self.workers
+        self._semaphore = None
+        self._loop = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Stops the processes; the analyses that did not finish are aborted.
+        """
+        self._pool.close()
+
+    def _get_semaphore(self):
+        # a semaphore belongs to a single event loop
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def _run(self, function, *arguments):
+        semaphore = self._get_semaphore()
+        await semaphore.acquire()
+        try:
+            future = self._pool.submit(function, *arguments)
+        except BaseException:
+            semaphore.release()
+            raise
+        loop = self._loop
+        future.add_done_callback(lambda _: _release(loop, semaphore))
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.cancel()  # only succeeds while the analysis waits in the pool
+            raise
+
+    async def _analyze(self, function, *arguments):
+        try:
+            return await self._run(function, *arguments)
+        except Exception as e:
+            return _aborted(e)
+
+    async def analyze(self, code, name=None):
+        """
+        Returns the exceptions of the analysis of `code`: its parser error or the exceptions of the analyzer.
+        """
+        return await self._analyze(_analyze_code, name, code)
+
+    async def analyze_files(self, paths):
+        """
+        Analyzes files concurrently, returning a list with (path, exceptions) of each path, in order.
+        The files are read by the workers. When a file cannot be analyzed (e.g. it cannot be read),
+        its exceptions are a single "Analysis aborted" error with the reason, and the other
+        files are still analyzed.
+        """
+        paths = list(paths)
+        results = await asyncio.gather(*[self._analyze(_analyze_file, path) for path in paths])
+        return list(zip(paths, results))
+
+
+# the analyzer of `analyze_async` and `analyze_files_async`, created on first use
+_default_analyzer = None
+
+
+def default_analyzer():
+    global _default_analyzer
+    if _default_analyzer is None:
+        _default_analyzer = AsyncAnalyzer()
+    return _default_analyzer
+
+
+async def analyze_async(code):
+    """
+    Returns the exceptions of the analysis of `code`, analyzed on the pool of `default_analyzer`.
+    """
+    return await default_analyzer().analyze(code)
+
+
+async def analyze_files_async(paths):
+    """
+    Returns (path, exceptions) of each file of `paths`, analyzed on the pool of `default_analyzer`
+    (see `AsyncAnalyzer.analyze_files`).
+    """
+    return await default_analyzer().analyze_files(paths)
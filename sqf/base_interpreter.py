@@ -20,6 +20,9 @@ class BaseInterpreter:
 
         self.current_namespace = self.namespace('missionnamespace')
 
+        # a `sqf.profiler.Profiler` that, when set, collects the time spent on each statement
+        self.profiler = None
+
     def exception(self, exception):
         """
         We can overwrite this method to handle exceptions differently
@@ -173,11 +176,25 @@ class BaseInterpreter:
         # execute the code
         outcome = self.private_default_class()
         outcome.position = code.position
-        for statement in code.base_tokens:
-            token = self.execute_token(statement)
-            if isinstance(token, tuple):
-                token = token[0]
-            outcome = self.value(token)
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.enter_code(code)
+        try:
+            for statement in code.base_tokens:
+                if profiler is not None:
+                    profiler.enter_statement(statement)
+                try:
+                    token = self.execute_token(statement)
+                    if isinstance(token, tuple):
+                        token = token[0]
+                    outcome = self.value(token)
+                finally:
+                    # the profiler is balanced when the statement raises (e.g. an error of the script)
+                    if profiler is not None:
+                        profiler.exit_statement()
+        finally:
+            if profiler is not None:
+                profiler.exit_code()
 
         # cleanup
         if not isinstance(code, File):  # so we have access to its scope
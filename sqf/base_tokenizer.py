@@ -1,7 +1,33 @@
+import codecs
 import re
 
 
+# the len=2 tokens have to be first!
+REGEX = re.compile(r'(\\\n|\r\n|>>|\/\*|\*\/|\|\||//|!=|<=|>=|==|\n|\t|[\"\' =:\{\}\(\)\[\];/,\!\/\*\%\^\-\+<>])')
+
+
 def tokenize(statement):
-    # the len=2 tokens have to be first!
-    regex = r'(\\\n|\r\n|>>|\/\*|\*\/|\|\||//|!=|<=|>=|==|\n|\t|[\"\' =:\{\}\(\)\[\];/,\!\/\*\%\^\-\+<>])'
-    return list(filter(None, re.split(regex, statement)))
+    return list(filter(None, REGEX.split(statement)))
+
+
+def tokenize_buffer(buffer, chunk_size=1 << 16, encoding='utf-8'):
+    """
+    Yields the tokens of a bytes-like object (e.g. a `mmap.mmap` of a file), decoding `chunk_size` bytes
+    at a time, so neither the decoded script nor the list of its tokens are in memory at once.
+    The tokens are the ones of `tokenize` of the decoded buffer.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    remainder = ''
+    for start in range(0, len(buffer), chunk_size):
+        tokens = REGEX.split(remainder + decoder.decode(buffer[start:start + chunk_size]))
+        # the last token may continue on the next chunk (e.g. a word or the "\r" of "\r\n")
+        remainder = tokens.pop()
+        if not remainder and tokens:
+            remainder = tokens.pop()
+        for token in tokens:
+            if token:
+                yield token
+    remainder += decoder.decode(b'', final=True)
+    for token in REGEX.split(remainder):
+        if token:
+            yield token
@@ -19,14 +19,34 @@ def get_coord(string):
 assert(get_coord('aa') == (1, 3))
 
 
-def get_all_tokens(nested_tokens):
-    tokens = []
-    for token in nested_tokens:
-        if isinstance(token, BaseTypeContainer):
-            tokens += get_all_tokens(token.tokens)
+def _walk(tokens):
+    """
+    Yields (token, is_leaf) of the nested tokens in order, a container before its tokens,
+    without recursion (so that the depth of the nesting is only limited by memory).
+    A container is a leaf when its string is not the string of its tokens (e.g. an undefined array).
+    """
+    stack = [iter(tokens)]
+    while stack:
+        for token in stack[-1]:
+            if isinstance(token, BaseTypeContainer) and token.string_tokens is token.tokens:
+                yield token, False
+                stack.append(iter(token.tokens))
+                break
+            yield token, True
         else:
-            tokens.append(token)
-    return tokens
+            stack.pop()
+
+
+def get_all_tokens(nested_tokens):
+    return [token for token, is_leaf in _walk(nested_tokens)
+            if not isinstance(token, BaseTypeContainer)]
+
+
+def join_tokens(tokens):
+    """
+    The string of `tokens`, i.e. the concatenation of the strings of its nested tokens.
+    """
+    return ''.join(str(token) for token, is_leaf in _walk(tokens) if is_leaf)
 
 
 def get_diff(string):
@@ -46,13 +66,16 @@ class BaseType:
     This is used for identifying, in a script, the line and column of an error.
     It also defines the __eq__
     """
+    # attributes that are not compared by __eq__ (e.g. the position or cached values)
+    _uncompared = frozenset(['_position'])
+
     def __init__(self):
         self._position = None
 
     @property
     def _key(self):
         # idiom described in https://stackoverflow.com/a/2909119/931303
-        return tuple(x for x in sorted(self.__dict__.items()) if x[0] != '_position')
+        return tuple(x for x in sorted(self.__dict__.items()) if x[0] not in self._uncompared)
 
     def __eq__(self, other):
         return isinstance(other, self.__class__) and self._key == other._key
@@ -111,7 +134,11 @@ class BaseTypeContainer(BaseType):
 
     def set_position(self, position):
         self._position = position
-        for token in self._tokens:
+        for token, is_leaf in _walk(self._tokens):
+            if not is_leaf:
+                # its tokens follow, starting at the same position
+                token._position = position
+                continue
             token.set_position(position)
 
             token_delta = get_diff(str(token))
@@ -134,6 +161,13 @@ class BaseTypeContainer(BaseType):
     def tokens(self):
         return self._tokens
 
+    @property
+    def string_tokens(self):
+        """
+        The tokens whose strings form the string of this container.
+        """
+        return self._tokens
+
     def get_all_tokens(self):
         return get_all_tokens(self.tokens)
 
@@ -142,4 +176,4 @@ class BaseTypeContainer(BaseType):
         return [token for token in self._tokens if self.is_base_token(token)]
 
     def __str__(self):
-        return self._as_str()
+        return join_tokens(self.string_tokens)
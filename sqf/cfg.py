@@ -0,0 +1,533 @@
+"""
+Control-flow graphs of SQF code.
+
+`build(code)` returns the `CFG` of a parsed code (e.g. the result of `sqf.parser.parse`): its
+basic blocks, each a list of `Node` (statements, or parts of statements such as the condition
+of an `if`) executed in sequence, connected by the flows of `if`/`then`/`else`, `exitWith`,
+`switch`, the loops (`while`, `for`, `forEach`, `count`, `apply`, `select`, `findIf`,
+`waitUntil`), `call` of code literals, `try`/`catch` and `throw`.
+
+Each node has the local variables it reads (`uses`) and assigns (`defines`), so the analyses of
+`sqf.dataflow` do not walk the tree again. Code that is not executed in place (e.g. assigned to a
+variable or spawned) is a function of its own (see `CFG.functions`); the local variables it reads
+are conservatively uses of the node it is in, since it may be called from there. Since local
+variables are dynamically scoped, a node that calls or spawns code that is not a literal (e.g.
+`call _f` or `[] call fnc_x`) uses every local variable of the graph.
+
+A local variable declared (`private` or `params`) in a nested code (e.g. a branch of an `if`) is
+a different variable from the variables of the same name outside it: its name in the uses and
+definitions of the nodes is the variable name followed by `#` and a number (see `variable_name`).
+
+Usage:
+    cfg = build(parse(script))
+    for block in cfg.blocks:
+        print(block, block.nodes, block.successors)
+"""
+from sqf.namespace import normalize
+from sqf.types import Statement, Code, Array, Variable, Keyword, String
+
+
+def variable_name(name):
+    """
+    The name of a local variable as written, given its name in the uses or definitions of a node.
+    """
+    return name.partition('#')[0]
+
+
+class Node:
+    """
+    A statement (or part of a statement) of a basic block, with the (normalized) names of the local
+    variables it reads and assigns, and whether it calls code that is not a literal.
+    """
+    def __init__(self, token, uses=(), defines=(), calls=False):
+        self.token = token
+        self.uses = frozenset(uses)
+        self.defines = frozenset(defines)
+        self.calls = calls
+
+    @property
+    def position(self):
+        return self.token.position
+
+    def __repr__(self):
+        return 'Node<%s>' % str(self.token).strip()
+
+
+class Block:
+    """
+    A sequence of nodes that are always executed one after the other.
+    """
+    def __init__(self, index):
+        self.index = index
+        self.nodes = []
+        self.successors = []
+        self.predecessors = []
+
+    def __repr__(self):
+        return 'B%d' % self.index
+
+
+class CFG:
+    """
+    The control-flow graph of a code: execution starts on `entry` and ends on `exit`, which has no nodes.
+    """
+    def __init__(self):
+        self.blocks = []
+        self.entry = self.add_block()
+        self.exit = self.add_block()
+        # the code literals that are not executed in place, e.g. functions
+        self.functions = []
+
+    def add_block(self):
+        block = Block(len(self.blocks))
+        self.blocks.append(block)
+        return block
+
+    @staticmethod
+    def connect(source, target):
+        if target not in source.successors:
+            source.successors.append(target)
+            target.predecessors.append(source)
+
+    def reverse_postorder(self):
+        """
+        Returns the blocks reachable from the entry in reverse postorder, i.e. every block before its
+        successors except on back edges of loops.
+        """
+        postorder = []
+        visited = {self.entry}
+        stack = [(self.entry, iter(self.entry.successors))]
+        while stack:
+            block, successors = stack[-1]
+            for successor in successors:
+                if successor not in visited:
+                    visited.add(successor)
+                    stack.append((successor, iter(successor.successors)))
+                    break
+            else:
+                stack.pop()
+                postorder.append(block)
+        postorder.reverse()
+        return postorder
+
+
+def _unwrap(token):
+    # a statement with a single token (e.g. the token and its spaces, or between parenthesis) is the token
+    while isinstance(token, Statement) and len(token.base_tokens) == 1:
+        token = token.base_tokens[0]
+    return token
+
+
+def _parts(token):
+    token = _unwrap(token)
+    if isinstance(token, Statement):
+        return [_unwrap(part) for part in token.base_tokens]
+    return [token]
+
+
+def _is_keyword(token, name):
+    return isinstance(token, Keyword) and token.unique_token == name
+
+
+def _is_code(token):
+    return isinstance(token, Code) and not token.is_undefined
+
+
+def _calls(parts):
+    # whether the parts of a statement call or spawn code that is not a literal
+    if len(parts) == 2:
+        keyword, code = parts
+    elif len(parts) == 3:
+        keyword, code = parts[1:]
+    else:
+        return False
+    return (_is_keyword(keyword, 'call') or _is_keyword(keyword, 'spawn')) and not _is_code(code)
+
+
+def _names(token):
+    """
+    Returns the names of the variables declared by the argument of `private` or `params`,
+    e.g. `"_x"`, `["_x", "_y"]` or `["_x", ["_y", 1]]`.
+    """
+    token = _unwrap(token)
+    if isinstance(token, String) and not token.is_undefined:
+        return [normalize(token.value)]
+    names = []
+    if isinstance(token, Array) and not token.is_undefined:
+        for item in token.value:
+            item = _unwrap(item)
+            if isinstance(item, Array) and not item.is_undefined and item.value:
+                item = _unwrap(item.value[0])
+            if isinstance(item, String) and not item.is_undefined:
+                names.append(normalize(item.value))
+    return names
+
+
+class _Builder:
+    def __init__(self, cfg):
+        self.cfg = cfg
+        # the entry blocks of the enclosing `catch` and the blocks created within their `try`
+        self.handlers = []
+        self.try_blocks = []
+        # the local variables declared in each of the enclosing codes: name -> name in the nodes
+        self.scopes = []
+        self.declarations = 0
+
+    def add_block(self):
+        block = self.cfg.add_block()
+        if self.try_blocks:
+            self.try_blocks[-1].append(block)
+        return block
+
+    def resolve(self, name):
+        # the name in the nodes of the variable `name` in the current scope
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        return name
+
+    def declare(self, names):
+        # declares the variables `names` in the current scope, returning their names in the nodes
+        scope = self.scopes[-1]
+        result = []
+        for name in names:
+            if len(self.scopes) > 1:
+                self.declarations += 1
+                scope[name] = '%s#%d' % (name, self.declarations)
+            else:
+                scope[name] = name
+            result.append(scope[name])
+        return result
+
+    def uses(self, token):
+        """
+        Returns the local variables read by `token`, and whether it calls code that is not a literal.
+        """
+        uses = set()
+        calls = False
+        tokens = [(token, False)]  # (token, whether it is inside a code literal)
+        while tokens:
+            token, in_code = tokens.pop()
+            if isinstance(token, Variable):
+                if not token.is_global:
+                    uses.add(self.resolve(normalize(token.name)))
+            elif isinstance(token, Array):
+                if not token.is_undefined:
+                    tokens.extend((item, in_code) for item in token.value)
+            elif isinstance(token, Code):
+                if not in_code:
+                    self.cfg.functions.append(token)
+                tokens.extend((item, True) for item in token.base_tokens)
+            elif isinstance(token, Statement):
+                calls = calls or _calls([_unwrap(item) for item in token.base_tokens])
+                tokens.extend((item, in_code) for item in token.base_tokens)
+        return uses, calls
+
+    def node(self, token):
+        parts = _parts(token)
+        uses, calls = self.uses(token)
+        defines = ()
+        if len(parts) == 2 and (_is_keyword(parts[0], 'private') or _is_keyword(parts[0], 'params')):
+            defines = self.declare(_names(parts[1]))
+        elif len(parts) == 3 and _is_keyword(parts[1], 'params'):
+            defines = self.declare(_names(parts[2]))
+        return Node(token, uses, defines, calls)
+
+    def code(self, code, block, exit):
+        """
+        Adds the statements of `code` starting on `block`, returning the block where they end.
+        `exit` is where `exitWith` leaves the scope of the code to.
+        """
+        self.scopes.append({})
+        for statement in code.base_tokens:
+            block = self.expression(statement, block, exit)
+            if self.try_blocks:
+                # any statement of a `try` may throw, so each ends a block that reaches the handler
+                next_block = self.add_block()
+                self.cfg.connect(block, next_block)
+                block = next_block
+        self.scopes.pop()
+        return block
+
+    def expression(self, token, block, exit):
+        """
+        Adds the evaluation of `token` to `block`, returning the block where it ends.
+        """
+        end = self.structure(token, block, exit)
+        if end is None:
+            block.nodes.append(self.node(token))
+            end = block
+        return end
+
+    def structure(self, token, block, exit):
+        """
+        Adds the evaluation of `token` when it is a control structure or an assignment, returning
+        the block where it ends, or returns None when it is neither.
+        """
+        parts = _parts(token)
+        if len(parts) == 3 and isinstance(parts[1], Keyword):
+            method = self._BINARY.get(parts[1].unique_token)
+            if method is not None:
+                return method(self, token, parts[0], parts[2], block, exit)
+        elif len(parts) == 2 and isinstance(parts[0], Keyword):
+            method = self._UNARY.get(parts[0].unique_token)
+            if method is not None:
+                return method(self, token, parts[1], block, exit)
+        return None
+
+    def assignment(self, token, lhs, rhs, block, exit):
+        lhs_parts = _parts(lhs)
+        private = len(lhs_parts) == 2 and _is_keyword(lhs_parts[0], 'private')
+        if private:
+            lhs = lhs_parts[1]
+        if not isinstance(lhs, Variable):
+            return None
+
+        # the value is evaluated before the variable is declared
+        end = self.structure(rhs, block, exit)
+        uses, calls = self.uses(rhs) if end is None else ((), False)
+
+        if lhs.is_global:
+            defines = ()
+        elif private:
+            defines = self.declare([normalize(lhs.name)])
+        else:
+            defines = (self.resolve(normalize(lhs.name)),)
+
+        if end is None:
+            block.nodes.append(Node(token, uses, defines, calls))
+            return block
+        end.nodes.append(Node(token, (), defines))
+        return end
+
+    def branches(self, block, codes, after, optional):
+        # each code is a branch from `block` to `after`; when optional, none may be executed
+        for code in codes:
+            start = self.add_block()
+            self.cfg.connect(block, start)
+            self.cfg.connect(self.code(code, start, after), after)
+        if optional:
+            self.cfg.connect(block, after)
+
+    def if_then(self, token, lhs, rhs, block, exit):
+        condition = _parts(lhs)
+        if len(condition) != 2 or not _is_keyword(condition[0], 'if'):
+            return None
+        branches = _parts(rhs)
+        if len(branches) == 3 and _is_keyword(branches[1], 'else'):
+            # if c then {} else {}
+            branches = [branches[0], branches[2]]
+        elif isinstance(rhs, Array) and not rhs.is_undefined:
+            # if c then [{}, {}]
+            branches = [_unwrap(item) for item in rhs.value]
+        if not branches or len(branches) > 2 or not all(_is_code(code) for code in branches):
+            return None
+
+        block = self.expression(condition[1], block, exit)
+        after = self.add_block()
+        self.branches(block, branches, after, len(branches) == 1)
+        return after
+
+    def exit_with(self, token, lhs, rhs, block, exit):
+        condition = _parts(lhs)
+        if len(condition) != 2 or not _is_keyword(condition[0], 'if') or not _is_code(rhs):
+            return None
+        block = self.expression(condition[1], block, exit)
+        self.branches(block, [rhs], exit, False)
+        after = self.add_block()
+        self.cfg.connect(block, after)
+        return after
+
+    def do(self, token, lhs, rhs, block, exit):
+        if not _is_code(rhs):
+            return None
+        parts = _parts(lhs)
+        if len(parts) == 2 and _is_keyword(parts[0], 'while') and _is_code(parts[1]):
+            return self.while_do(parts[1], rhs, block)
+        if len(parts) == 2 and _is_keyword(parts[0], 'switch'):
+            return self.switch_do(parts[1], rhs, block, exit)
+        return self.for_do(token, lhs, rhs, block, exit)
+
+    def while_do(self, condition, body, block):
+        header = self.add_block()
+        self.cfg.connect(block, header)
+        after = self.add_block()
+        condition_end = self.code(condition, header, after)
+        start = self.add_block()
+        self.cfg.connect(condition_end, start)
+        self.cfg.connect(condition_end, after)
+        self.cfg.connect(self.code(body, start, after), header)
+        return after
+
+    def for_do(self, token, lhs, body, block, exit):
+        # for "_i" from a to b [step c] do {}, the bounds in order of evaluation
+        bounds = []
+        parts = _parts(lhs)
+        while len(parts) == 3 and any(_is_keyword(parts[1], name) for name in ('from', 'to', 'step')):
+            bounds.insert(0, parts[2])
+            parts = _parts(parts[0])
+        if len(parts) != 2 or not _is_keyword(parts[0], 'for'):
+            return None
+        variable = parts[1]
+
+        if isinstance(variable, String) and not variable.is_undefined:
+            for bound in bounds:
+                block = self.expression(bound, block, exit)
+            header = self.add_block()
+            self.cfg.connect(block, header)
+            header.nodes.append(Node(lhs, (), (self.resolve(normalize(variable.value)),)))
+            after = self.add_block()
+            start = self.add_block()
+            self.cfg.connect(header, start)
+            self.cfg.connect(header, after)
+            self.cfg.connect(self.code(body, start, after), header)
+            return after
+
+        # for [{init}, {condition}, {step}] do {}
+        if bounds or not isinstance(variable, Array) or variable.is_undefined or len(variable.value) != 3:
+            return None
+        init, condition, step = [_unwrap(item) for item in variable.value]
+        if not all(_is_code(code) for code in (init, condition, step)):
+            return None
+        after = self.add_block()
+        block = self.code(init, block, after)
+        header = self.add_block()
+        self.cfg.connect(block, header)
+        condition_end = self.code(condition, header, after)
+        start = self.add_block()
+        self.cfg.connect(condition_end, start)
+        self.cfg.connect(condition_end, after)
+        end = self.code(body, start, after)
+        self.cfg.connect(self.code(step, end, after), header)
+        return after
+
+    def switch_do(self, value, body, block, exit):
+        block = self.expression(value, block, exit)
+        after = self.add_block()
+        bodies = []
+        has_default = False
+        for statement in body.base_tokens:
+            parts = _parts(statement)
+            case = parts
+            if len(parts) == 3 and _is_keyword(parts[1], ':') and _is_code(parts[2]):
+                # case x: {}
+                case = _parts(parts[0])
+                bodies.append(parts[2])
+            if len(case) == 2 and _is_keyword(case[0], 'case'):
+                # the values are compared in order; `case x;` falls through to the next body
+                block = self.expression(case[1], block, exit)
+            elif len(parts) == 2 and _is_keyword(parts[0], 'default') and _is_code(parts[1]):
+                bodies.append(parts[1])
+                has_default = True
+            else:
+                block = self.expression(statement, block, exit)
+        self.branches(block, bodies, after, not has_default)
+        return after
+
+    def iterate(self, token, lhs, rhs, block, exit):
+        # {} forEach a, {} count a, a apply {}, a select {}, a findIf {}
+        keyword = _parts(token)[1].unique_token
+        if keyword in ('foreach', 'count') and _is_code(lhs):
+            body, values = lhs, rhs
+        elif keyword in ('apply', 'select', 'findif') and _is_code(rhs):
+            body, values = rhs, lhs
+        else:
+            return None
+        block = self.expression(values, block, exit)
+        header = self.add_block()
+        self.cfg.connect(block, header)
+        after = self.add_block()
+        start = self.add_block()
+        self.cfg.connect(header, start)
+        self.cfg.connect(header, after)
+        self.cfg.connect(self.code(body, start, after), header)
+        return after
+
+    def wait_until(self, token, rhs, block, exit):
+        if not _is_code(rhs):
+            return None
+        header = self.add_block()
+        self.cfg.connect(block, header)
+        after = self.add_block()
+        end = self.code(rhs, header, after)
+        self.cfg.connect(end, header)
+        self.cfg.connect(end, after)
+        return after
+
+    def call(self, token, arguments, code, block, exit):
+        if not _is_code(code):
+            return None
+        if arguments is not None:
+            block = self.expression(arguments, block, exit)
+        after = self.add_block()
+        self.cfg.connect(self.code(code, block, after), after)
+        return after
+
+    def unary_call(self, token, rhs, block, exit):
+        return self.call(token, None, rhs, block, exit)
+
+    def binary_call(self, token, lhs, rhs, block, exit):
+        return self.call(token, lhs, rhs, block, exit)
+
+    def try_catch(self, token, lhs, rhs, block, exit):
+        parts = _parts(lhs)
+        if len(parts) != 2 or not _is_keyword(parts[0], 'try') or not _is_code(parts[1]) or not _is_code(rhs):
+            return None
+        after = self.add_block()
+        handler = self.add_block()
+
+        # every block of the `try` may throw to the handler
+        self.handlers.append(handler)
+        self.try_blocks.append([block])
+        start = self.add_block()
+        self.cfg.connect(block, start)
+        end = self.code(parts[1], start, after)
+        self.handlers.pop()
+        for try_block in self.try_blocks.pop():
+            self.cfg.connect(try_block, handler)
+        self.cfg.connect(end, after)
+
+        self.cfg.connect(self.code(rhs, handler, after), after)
+        return after
+
+    def throw(self, token, rhs, block, exit):
+        block.nodes.append(self.node(token))
+        self.cfg.connect(block, self.handlers[-1] if self.handlers else self.cfg.exit)
+        # what follows a `throw` is unreachable
+        return self.add_block()
+
+    _BINARY = {
+        '=': assignment,
+        'then': if_then,
+        'exitwith': exit_with,
+        'do': do,
+        'foreach': iterate,
+        'count': iterate,
+        'apply': iterate,
+        'select': iterate,
+        'findif': iterate,
+        'call': binary_call,
+        'catch': try_catch,
+    }
+    _UNARY = {
+        'call': unary_call,
+        'waituntil': wait_until,
+        'throw': throw,
+    }
+
+
+def build(code):
+    """
+    Returns the `CFG` of `code`, a `Code`, `File` or the `Statement` returned by `sqf.parser.parse`.
+    """
+    cfg = CFG()
+    builder = _Builder(cfg)
+    cfg.connect(builder.code(code, cfg.entry, cfg.exit), cfg.exit)
+
+    # code that is not a literal may read any local variable
+    variables = frozenset().union(*[node.defines for block in cfg.blocks for node in block.nodes])
+    for block in cfg.blocks:
+        for node in block.nodes:
+            if node.calls:
+                node.uses |= variables
+    return cfg
@@ -1,5 +1,7 @@
+import collections
+
 from sqf.interpreter import Interpreter, interpret
-from sqf.types import Code, Array, String
+from sqf.types import Code, Array, String, fork_value
 
 
 class Client:
@@ -13,6 +15,17 @@ class Client:
     def simulation(self):
         return self._simulation
 
+    def fork(self, simulation, memo):
+        """
+        Returns a copy of this client in `simulation` (see `Interpreter.fork`).
+        """
+        client = Client.__new__(Client)
+        client._simulation = simulation
+        client._interpreter = self._interpreter._fork(memo)
+        client._interpreter.client = client
+        client._listening_variables = dict(self._listening_variables)
+        return client
+
     def add_listening(self, var_name, code):
         assert(isinstance(var_name, str) and isinstance(code, Code))
         self._listening_variables[var_name] = code
@@ -46,10 +59,30 @@ class Simulation:
 
         self._broadcasted = {}
 
+        # broadcasts waiting to be delivered, as (var_name, value, clients)
+        self._queue = collections.deque()
+        self._delivering = False
+
     @property
     def is_dedicated(self):
         return self._is_dedicated
 
+    def fork(self):
+        """
+        Returns a copy of this simulation, e.g. after the init of a mission, whose server and clients can
+        execute code without modifying the ones of this simulation.
+        """
+        assert not self._queue
+        memo = {}
+        simulation = Simulation.__new__(Simulation)
+        simulation._is_dedicated = self._is_dedicated
+        simulation.server = self.server.fork(simulation, memo)
+        simulation._clients = [client.fork(simulation, memo) for client in self._clients]
+        simulation._broadcasted = {name: fork_value(value, memo) for name, value in self._broadcasted.items()}
+        simulation._queue = collections.deque()
+        simulation._delivering = False
+        return simulation
+
     @property
     def clients(self):
         return self._clients
@@ -69,9 +102,39 @@ class Simulation:
         # client_id=-1 => to the server
         if client_id is None:
             self._broadcasted[var_name] = value
-            for client in self._clients + [self.server]:
-                client.set_variable(var_name, value)
+            clients = self._clients + [self.server]
         elif client_id == -1:
-            self.server.set_variable(var_name, value)
+            clients = [self.server]
         else:
-            self._clients[client_id].set_variable(var_name, value)
+            clients = [self._clients[client_id]]
+
+        self._queue.append((var_name, value, clients))
+        self.deliver()
+
+    def deliver(self):
+        """
+        Delivers the queued broadcasts in the order they were made.
+        Broadcasts made by event handlers during the delivery are queued and delivered
+        by the same loop after the current one, instead of recursively.
+
+        When an event handler raises an error, the broadcast is still delivered to the other clients
+        and the queued broadcasts are delivered, and the first error is raised afterwards.
+        """
+        if self._delivering:
+            return
+        self._delivering = True
+        error = None
+        try:
+            while self._queue:
+                var_name, value, clients = self._queue.popleft()
+                for client in clients:
+                    try:
+                        client.set_variable(var_name, value)
+                    except Exception as e:
+                        error = error or e
+        finally:
+            # e.g. on KeyboardInterrupt, the broadcasts are not left for unrelated deliveries
+            self._queue.clear()
+            self._delivering = False
+        if error is not None:
+            raise error
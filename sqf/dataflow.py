@@ -0,0 +1,153 @@
+"""
+Dataflow analyses over the control-flow graphs of `sqf.cfg`.
+
+`solve(cfg, analysis)` computes the value of an `Analysis` at the start and end of every block with
+a worklist: blocks are visited in reverse postorder (postorder for backward analyses) and a block
+is visited again only when the value flowing into it changed, so analyses whose values only grow
+(like `Liveness` and `ReachingDefinitions`) take a number of visits linear in the size of the graph
+on code without deeply nested loops.
+
+Usage:
+    cfg = build(parse(script))
+    before, after = solve(cfg, Liveness())
+    after[block]  # the local variables read after `block` before being assigned
+"""
+import collections
+
+from sqf.cfg import variable_name
+
+
+class Analysis:
+    """
+    A dataflow analysis. Its values must be comparable with `==`.
+    """
+    # whether values flow from the entry to the exit or from the exit to the entry
+    forward = True
+
+    def boundary(self):
+        """
+        The value at the entry of the graph (at the exit, for backward analyses).
+        """
+        raise NotImplementedError
+
+    def initial(self):
+        """
+        The value of every block before it is visited.
+        """
+        raise NotImplementedError
+
+    def meet(self, values):
+        """
+        The value flowing into a block from the values of its predecessors (successors, for backward analyses).
+        """
+        raise NotImplementedError
+
+    def transfer(self, block, value):
+        """
+        The value after the nodes of `block` given the value before them (in the direction of the analysis).
+        """
+        raise NotImplementedError
+
+
+def solve(cfg, analysis):
+    """
+    Returns two dictionaries with the values of `analysis` at the start and at the end of each block of `cfg`.
+    """
+    order = cfg.reverse_postorder()
+    reachable = set(order)
+    order += [block for block in cfg.blocks if block not in reachable]
+    if analysis.forward:
+        boundary_block = cfg.entry
+    else:
+        order.reverse()
+        boundary_block = cfg.exit
+
+    inputs = {}
+    outputs = {block: analysis.initial() for block in cfg.blocks}
+    worklist = collections.deque(order)
+    queued = set(order)
+    while worklist:
+        block = worklist.popleft()
+        queued.remove(block)
+
+        if analysis.forward:
+            sources, targets = block.predecessors, block.successors
+        else:
+            sources, targets = block.successors, block.predecessors
+        values = [outputs[source] for source in sources]
+        if block is boundary_block:
+            values.append(analysis.boundary())
+        inputs[block] = analysis.meet(values) if values else analysis.initial()
+
+        output = analysis.transfer(block, inputs[block])
+        if output != outputs[block]:
+            outputs[block] = output
+            for target in targets:
+                if target not in queued:
+                    worklist.append(target)
+                    queued.add(target)
+
+    if analysis.forward:
+        return inputs, outputs
+    return outputs, inputs
+
+
+class Liveness(Analysis):
+    """
+    The local variables that may be read before being assigned, from a point until the end of the code.
+    """
+    forward = False
+
+    def boundary(self):
+        return frozenset()
+
+    def initial(self):
+        return frozenset()
+
+    def meet(self, values):
+        return frozenset().union(*values)
+
+    def transfer(self, block, live):
+        for node in reversed(block.nodes):
+            live = (live - node.defines) | node.uses
+        return live
+
+
+class ReachingDefinitions(Analysis):
+    """
+    The definitions, pairs (variable name, node), that may be the last assignment of their variable at a point.
+    """
+    def boundary(self):
+        return frozenset()
+
+    def initial(self):
+        return frozenset()
+
+    def meet(self, values):
+        return frozenset().union(*values)
+
+    def transfer(self, block, definitions):
+        for node in block.nodes:
+            if node.defines:
+                definitions = frozenset(definition for definition in definitions
+                                        if definition[0] not in node.defines) | \
+                    frozenset((name, node) for name in node.defines)
+        return definitions
+
+
+def dead_definitions(cfg):
+    """
+    Returns the definitions (variable name, node) of `cfg` whose value is never read,
+    in order of blocks and nodes.
+    """
+    after = solve(cfg, Liveness())[1]
+    dead = []
+    for block in cfg.blocks:
+        live = after[block]
+        block_dead = []
+        for node in reversed(block.nodes):
+            for name in sorted(node.defines - live, reverse=True):
+                block_dead.append((variable_name(name), node))
+            live = (live - node.defines) | node.uses
+        dead.extend(reversed(block_dead))
+    return dead
@@ -11,11 +11,24 @@ class SQFParserException(SQFError):
         self.position = position
         self.message = message.replace("\n", "\\n").replace("\t", "\\t").replace("\r", "\\r")
 
+    def __reduce__(self):
+        # so exceptions can be sent to and from other processes
+        return _rebuild_exception, (self.__class__, self.position, self.message)
+
+
+def _rebuild_exception(exception_class, position, message):
+    exception = exception_class.__new__(exception_class)
+    exception.position = position
+    exception.message = message
+    return exception
+
 
 class SQFParserError(SQFParserException):
     """
     Raised by the parser and analyzer
     """
+    severity = 'error'
+
     def __init__(self, position, message):
         super().__init__(position, "error:%s" % message)
 
@@ -29,6 +42,8 @@ class SQFWarning(SQFParserException):
     Something that the interpreter understands but that is a bad practice or potentially
     semantically incorrect.
     """
+    severity = 'warning'
+
     def __init__(self, position, message):
         super().__init__(position, "warning:%s" % message)
 
@@ -0,0 +1,94 @@
+"""
+A lightweight scan of the `#include` directives of files, to know which files depend on a header
+without parsing them.
+
+Usage:
+    graph = IncludeGraph(directory)
+    for path in sqf_paths:
+        graph.scan(path)
+    graph.dependents({header_path})  # the scanned files that include the header, directly or not
+"""
+import collections
+import os
+import re
+
+
+INCLUDE = re.compile(r'^[ \t]*#include[ \t]+(?:"([^"\n]+)"|<([^>\n]+)>)', re.MULTILINE)
+
+
+def normalize_path(path):
+    return os.path.normcase(os.path.normpath(os.path.abspath(path)))
+
+
+def find_includes(code):
+    """
+    Returns the files included by `code`, as written in its `#include` directives.
+    """
+    return [match.group(1) or match.group(2) for match in INCLUDE.finditer(code)]
+
+
+class IncludeGraph:
+    """
+    The files included by each scanned file. An include is resolved relative to the directory of
+    the file and then relative to `root`; headers that are found are scanned too.
+    """
+    def __init__(self, root):
+        self.root = normalize_path(root)
+        # path: the set of paths it includes
+        self.includes = {}
+        # path: the set of paths that include it
+        self.included_by = collections.defaultdict(set)
+
+    def resolve(self, include, path):
+        """
+        The path of `include` when included from `path`. When it does not exist (e.g. it was deleted),
+        the path relative to the directory of `path` is returned.
+        """
+        include = include.replace('\\', '/')
+        candidates = [os.path.join(os.path.dirname(path), include),
+                      os.path.join(self.root, include.lstrip('/'))]
+        for candidate in candidates:
+            if os.path.isfile(candidate):
+                return normalize_path(candidate)
+        return normalize_path(candidates[0])
+
+    def scan(self, path, code=None):
+        """
+        (Re)scans the includes of a file, and of the headers it includes that were not scanned yet.
+        `code` is the content of the file, read from it when not given.
+        """
+        pending = [(normalize_path(path), code)]
+        while pending:
+            path, code = pending.pop()
+            if code is None:
+                try:
+                    with open(path, errors='replace') as f:
+                        code = f.read()
+                except OSError:
+                    code = ''
+            self.remove(path)
+
+            includes = set(self.resolve(include, path) for include in find_includes(code))
+            self.includes[path] = includes
+            for include in includes:
+                self.included_by[include].add(path)
+                if include not in self.includes and os.path.isfile(include):
+                    pending.append((include, None))
+
+    def remove(self, path):
+        path = normalize_path(path)
+        for include in self.includes.pop(path, ()):
+            self.included_by[include].discard(path)
+
+    def dependents(self, paths):
+        """
+        Returns the paths that include any of `paths`, directly or through other headers.
+        """
+        result = set()
+        pending = [normalize_path(path) for path in paths]
+        while pending:
+            for dependent in self.included_by.get(pending.pop(), ()):
+                if dependent not in result:
+                    result.add(dependent)
+                    pending.append(dependent)
+        return result
@@ -1,4 +1,4 @@
-from sqf.types import Statement, Code, Number, Boolean, Nothing, Variable, Array, String, Type, File
+from sqf.types import Statement, Code, Number, Boolean, Nothing, Variable, Array, String, Type, File, fork_value
 from sqf.interpreter_types import PrivateType
 from sqf.keywords import Keyword
 from sqf.parser import parse
@@ -8,6 +8,9 @@ from sqf.interpreter_expressions import INTERPRETER_EXPRESSIONS
 from sqf.base_interpreter import BaseInterpreter
 
 
+# the interpreter uses its own list so the expressions of the analyzer are not modified
+EXPRESSIONS = list(EXPRESSIONS)
+
 # Replace all expressions in `database` by expressions from `COMMON_EXPRESSIONS` with the same signature
 for exp in INTERPRETER_EXPRESSIONS:
     if exp in EXPRESSIONS:
@@ -24,6 +27,12 @@ class Interpreter(BaseInterpreter):
         self._simulation = None
         self._client = None
 
+        # the `sqf.scheduler.Scheduler` that runs the scripts spawned by this interpreter
+        self.scheduler = None
+
+        # the (position, passed) of each executed `assert`
+        self.assertions = []
+
     @property
     def simulation(self):
         return self._simulation
@@ -37,6 +46,46 @@ class Interpreter(BaseInterpreter):
         self._client = client
         self._simulation = client.simulation
 
+    def fork(self):
+        """
+        Returns a copy of this interpreter (e.g. after executing the init of a mission) that can be executed
+        without modifying this one. Only the arrays are copied; code and every other value are shared.
+        Scripts spawned on its scheduler are not copied.
+
+        The interpreter of a client is copied with its simulation (see `sqf.client.Simulation.fork`), so that
+        the copy broadcasts to the copies of the other clients.
+        """
+        client = self._client
+        if client is None:
+            return self._fork({})
+
+        simulation = self._simulation.fork()
+        if client is self._simulation.server:
+            return simulation.server._interpreter
+        if client in self._simulation.clients:
+            return simulation.clients[self._simulation.clients.index(client)]._interpreter
+        # a client that was not added to its simulation
+        return client.fork(simulation, {})._interpreter
+
+    def _fork(self, memo):
+        # the copy of this interpreter, whose arrays are copied with `memo`, without a client
+        def fork(value):
+            return fork_value(value, memo)
+
+        interpreter = self.__class__.__new__(self.__class__)
+        interpreter.__dict__.update(self.__dict__)
+        interpreter._client = None
+        interpreter._simulation = None
+        interpreter._namespaces = {}
+        for name, namespace in self._namespaces.items():
+            interpreter._namespaces[name] = namespace.fork(fork)
+            if namespace is self.current_namespace:
+                interpreter.current_namespace = interpreter._namespaces[name]
+        interpreter.scheduler = None
+        interpreter.profiler = None
+        interpreter.assertions = list(self.assertions)
+        return interpreter
+
     def _add_params(self, token):
         super()._add_params(token)
         lhs = token[0].value
@@ -66,26 +115,36 @@ class Interpreter(BaseInterpreter):
     def execute_single(self, statement):
         assert(not isinstance(statement, Code))
 
-        outcome = Nothing()
-        _outcome = outcome
-
-        # evaluate the types of all tokens
         base_tokens = statement.base_tokens
+        tokens, values = self.execute_tokens(base_tokens)
+        return self.execute_values(statement, base_tokens, tokens, values, self.find_expression(values))
+
+    def execute_tokens(self, base_tokens):
+        """
+        Evaluates all tokens of a statement, returning their results and their values.
+        """
         values = []
         tokens = []
-        types = []
-
         for token in base_tokens:
             t, v = self.execute_token(token)
             values.append(v)
             tokens.append(t)
-            types.append(type(v))
+        return tokens, values
 
-        case_found = None
+    @staticmethod
+    def find_expression(values):
         for case in EXPRESSIONS:
             if case.is_match(values):
-                case_found = case
-                break
+                return case
+        return None
+
+    def execute_values(self, statement, base_tokens, tokens, values, case_found):
+        """
+        Executes a statement whose tokens were already evaluated by `execute_tokens`.
+        """
+        outcome = Nothing()
+        _outcome = outcome
+        types = [type(v) for v in values]
 
         if case_found is not None:
             outcome = case_found.execute(values, self)
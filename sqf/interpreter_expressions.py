@@ -3,10 +3,10 @@ import math
 from sqf.common_expressions import TryCatchExpression, ForEachExpression, \
     WhileDoExpression, ForFromToDoExpression, ForSpecDoExpression, SwitchDoExpression, \
     IfThenSpecExpression, IfThenElseExpression, IfThenExpression, IfThenExitWithExpression
-from sqf.types import Keyword, Namespace, Number, Array, Code, Type, Boolean, String, Nothing, Variable
+from sqf.types import Keyword, Namespace, Number, Array, Code, Type, Boolean, String, Nothing, Variable, Script
 from sqf.exceptions import SQFParserError
 from sqf.keywords import OP_ARITHMETIC, OP_COMPARISON, OP_LOGICAL
-from sqf.expressions import BinaryExpression, UnaryExpression
+from sqf.expressions import BinaryExpression, UnaryExpression, NullExpression
 from sqf.interpreter_types import SwitchType
 
 
@@ -182,6 +182,36 @@ def _addPublicVariableEventHandler(lhs_v, rhs_v, interpreter):
     interpreter.client.add_listening(lhs_v.value, rhs_v)
 
 
+def _get_scheduler(interpreter, token):
+    if interpreter.scheduler is None:
+        interpreter.exception(SQFParserError(token.position, 'Scripts can only be spawned with a scheduler'))
+    return interpreter.scheduler
+
+
+def _spawn(lhs_v, rhs_v, interpreter):
+    return _get_scheduler(interpreter, rhs_v).spawn(rhs_v, lhs_v)
+
+
+def _exec_vm(lhs_v, rhs_v, interpreter):
+    return _get_scheduler(interpreter, rhs_v).exec_vm(rhs_v.value, lhs_v)
+
+
+def _suspend(rhs_v, interpreter):
+    # the scheduled environment (sqf.scheduler) executes the suspensions itself
+    interpreter.exception(SQFParserError(rhs_v.position, 'Suspending not allowed in this context'))
+
+
+def _time(interpreter):
+    if interpreter.scheduler is None:
+        return 0
+    return interpreter.scheduler.time
+
+
+def _assert(rhs_v, interpreter):
+    interpreter.assertions.append((rhs_v.position, rhs_v.value))
+    return rhs_v.value
+
+
 def _if_then_else_code(interpreter, condition, then, else_=None):
     """
     The equivalent Python code for a if-then-else SQF statement
@@ -391,6 +421,21 @@ INTERPRETER_EXPRESSIONS = [
 
     BinaryExpression(String, Keyword('addPublicVariableEventHandler'), Code, None, _addPublicVariableEventHandler),
 
+    UnaryExpression(Keyword('assert'), Boolean, Boolean, _assert),
+
+    # scheduled environment
+    BinaryExpression(Type, Keyword('spawn'), Code, Script, _spawn),
+    UnaryExpression(Keyword('execVM'), String, Script, lambda rhs_v, i: _exec_vm(Nothing(), rhs_v, i)),
+    BinaryExpression(Type, Keyword('execVM'), String, Script, _exec_vm),
+    UnaryExpression(Keyword('scriptDone'), Script, Boolean,
+                    lambda rhs_v, i: _get_scheduler(i, rhs_v).is_done(rhs_v.value)),
+    UnaryExpression(Keyword('terminate'), Script, Nothing,
+                    lambda rhs_v, i: _get_scheduler(i, rhs_v).terminate(rhs_v.value)),
+    UnaryExpression(Keyword('sleep'), Number, Nothing, _suspend),
+    UnaryExpression(Keyword('uiSleep'), Number, Nothing, _suspend),
+    UnaryExpression(Keyword('waitUntil'), Code, Nothing, _suspend),
+    NullExpression(Keyword('time'), Number, _time),
+
     BinaryExpression(Array, Keyword('+'), Array, Array, Action(lambda lhs_v, rhs_v: lhs_v.value + rhs_v.value)),
     BinaryExpression(Array, Keyword('-'), Array, Array, Action(_subtract_arrays)),
 
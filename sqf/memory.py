@@ -0,0 +1,117 @@
+import tracemalloc
+
+from sqf.parser import parse
+from sqf.analyzer import Analyzer, analyze
+from sqf.timing import phase
+
+
+class MemoryTracker:
+    """
+    Collects, using `tracemalloc`, the memory allocated on named phases (e.g. "parse_block", "analysis").
+    It has the interface of `sqf.timing.Timer`, so it can be passed wherever a timer is accepted.
+
+    Usage:
+        with MemoryTracker() as tracker:
+            analyze(parse(code, tracker), analyzer_with_tracker)
+        tracker.phases
+
+    For each phase it stores, in bytes, the `peak` of traced memory during the phase relative to
+    its start and the `net` memory it left allocated, both including the phases started within it,
+    and the `limit` source lines that allocated most memory during it, summed over the times the phase ran.
+    The memory of the snapshots taken to compare the source lines is not counted.
+    """
+    def __init__(self, limit=10):
+        self.limit = limit
+        self.phases = {}
+        self.peak = 0
+        self._stack = []  # stack of [name, start, peak so far, snapshot, memory of the snapshot]
+        self._baseline = 0
+        # the memory of the snapshots of the phases in the stack
+        self._overhead = 0
+        self._started = False
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started = True
+        self._baseline = tracemalloc.get_traced_memory()[0]
+        self._reset_peak()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.peak = max(self.peak, tracemalloc.get_traced_memory()[1] - self._baseline)
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    @staticmethod
+    def _reset_peak():
+        # before Python 3.9, the peak is the one since `tracemalloc` started
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+
+    @staticmethod
+    def _snapshot():
+        # ignore the memory of the snapshots themselves
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+
+    def _traced_memory(self):
+        # the current and peak traced memory, without the memory of the snapshots
+        current, peak = tracemalloc.get_traced_memory()
+        return current - self._overhead, peak - self._overhead
+
+    def start(self, name):
+        current, peak = self._traced_memory()
+        if self._stack:
+            self._stack[-1][2] = max(self._stack[-1][2], peak)
+        snapshot = self._snapshot()
+        overhead = tracemalloc.get_traced_memory()[0] - self._overhead - current
+        self._overhead += overhead
+        self._reset_peak()
+        self._stack.append([name, current, current, snapshot, overhead])
+
+    def stop(self):
+        # measured before the snapshot of the comparison
+        current, peak = self._traced_memory()
+        name, start, peak_so_far, snapshot, overhead = self._stack.pop()
+        peak = max(peak, peak_so_far)
+        if self._stack:
+            self._stack[-1][2] = max(self._stack[-1][2], peak)
+        self.peak = max(self.peak, peak - self._baseline)
+
+        if name not in self.phases:
+            self.phases[name] = {'peak': 0, 'net': 0, 'top': []}
+        stats = self.phases[name]
+        stats['peak'] = max(stats['peak'], peak - start)
+        stats['net'] += current - start
+
+        sites = {(site['file'], site['line']): site for site in stats['top']}
+        for stat in self._snapshot().compare_to(snapshot, 'lineno')[:self.limit]:
+            frame = stat.traceback[0]
+            site = sites.setdefault((frame.filename, frame.lineno), {
+                'file': frame.filename, 'line': frame.lineno, 'size': 0, 'count': 0})
+            site['size'] += stat.size_diff
+            site['count'] += stat.count_diff
+        stats['top'] = sorted(sites.values(), key=lambda site: abs(site['size']), reverse=True)[:self.limit]
+
+        del snapshot
+        self._overhead -= overhead
+        # the comparison is not part of the phase that contains this one
+        self._reset_peak()
+
+
+def analyze_memory(code, limit=10):
+    """
+    Parses and analyzes `code` while tracking its memory, and returns the `MemoryTracker`.
+    """
+    with MemoryTracker(limit) as tracker:
+        result = parse(code, tracker)
+
+        analyzer = Analyzer()
+        analyzer.timer = tracker
+        with phase(tracker, 'analysis'):
+            analyze(result, analyzer)
+    return tracker
@@ -1,33 +1,73 @@
+import bisect
+import sys
+
+
+# cache of normalized (lowercased and interned) variable names
+_NORMALIZED = {}
+# the maximum number of entries, so that analyzing many names (e.g. in watch mode) does not grow the table indefinitely
+_NORMALIZED_LIMIT = 1 << 16
+
+
+def normalize(name):
+    """
+    Returns the normalized name of a variable. SQF variables are case-insensitive,
+    so every name is lowercased once and interned, and subsequent calls are a dict hit.
+    """
+    try:
+        return _NORMALIZED[name]
+    except KeyError:
+        normalized = sys.intern(name.lower())
+        if len(_NORMALIZED) < _NORMALIZED_LIMIT:
+            _NORMALIZED[name] = normalized
+        return normalized
+
+
 class Scope:
     """
     A scope is a dictionary that stores variables. Its level is controlled by a namespace
     and has no function to the scope itself.
     The values are case insensitive because SQF variables are case-insensitive.
     """
-    def __init__(self, level, values=None):
+    def __init__(self, level, values=None, index=None):
         if values is None:
             values = {}
-        self.values = {self.normalize(key): values[key] for key in values}
+        self.values = {}
         self.level = level
+        # the index of the namespace this scope belongs to (see `Namespace.get_scope`)
+        self._index = index
+        for key in values:
+            self[key] = values[key]
 
     def __contains__(self, name):
-        return self.normalize(name) in self.values
+        return normalize(name) in self.values
 
     def __getitem__(self, name):
-        return self.values[self.normalize(name)]
+        return self.values[normalize(name)]
 
     def __setitem__(self, name, value):
-        self.values[self.normalize(name)] = value
+        name = normalize(name)
+        if name not in self.values and self._index is not None:
+            levels = self._index.get(name)
+            if levels is None:
+                self._index[name] = [self.level]
+            else:
+                bisect.insort(levels, self.level)
+        self.values[name] = value
 
     @staticmethod
     def normalize(name):
-        return name.lower()
+        return normalize(name)
 
 
 class Namespace:
     def __init__(self, name, all_vars=None):
         self._stack = [Scope(0, all_vars)]
         self.name = name
+        # normalized local variable name -> sorted levels of the scopes that define it.
+        # SQF is dynamically scoped (called code sees the locals of its caller), so the scope
+        # of a local variable can only be resolved at runtime; this index resolves it
+        # without walking the stack.
+        self._index = {}
 
     def __repr__(self):
         return '<Namespace %s>' % self.name
@@ -36,7 +76,7 @@ class Namespace:
         return self.get_scope(name)[name]
 
     def __contains__(self, name):
-        return name.lower() in self.get_scope(name)
+        return name in self.get_scope(name)
 
     @property
     def current_scope(self):
@@ -48,16 +88,51 @@ class Namespace:
 
     def get_scope(self, name):
         if name.startswith('_'):
-            for i in reversed(range(1, len(self._stack))):
-                scope = self._stack[i]
-                if name in scope:
-                    return scope
-            return self._stack[0]
-        else:
-            return self._stack[0]
+            levels = self._index.get(normalize(name))
+            if levels:
+                return self._stack[levels[-1]]
+        return self._stack[0]
+
+    def new_locals(self):
+        """
+        Returns an empty local state: only the base scope, shared by all local states.
+        """
+        return [self._stack[0]], {}
+
+    def get_locals(self):
+        """
+        Returns the local state (the stack of scopes and its index) of this namespace.
+        """
+        return self._stack, self._index
+
+    def set_locals(self, local_state):
+        """
+        Replaces the local state of this namespace, e.g. to resume a suspended script.
+        """
+        self._stack, self._index = local_state
+
+    def fork(self, fork_value):
+        """
+        Returns a copy of this namespace whose values are the ones of this namespace copied by `fork_value`.
+        The scopes are copied without normalizing their names again.
+        """
+        namespace = Namespace(self.name)
+        namespace._index = {name: list(levels) for name, levels in self._index.items()}
+        namespace._stack = []
+        for scope in self._stack:
+            # the base scope is not indexed
+            copy = Scope(scope.level, index=None if scope._index is None else namespace._index)
+            copy.values = {name: fork_value(value) for name, value in scope.values.items()}
+            namespace._stack.append(copy)
+        return namespace
 
     def add_scope(self, values=None):
-        self._stack.append(Scope(len(self._stack), values))
+        self._stack.append(Scope(len(self._stack), values, self._index))
 
     def del_scope(self):
-        del self._stack[-1]
+        scope = self._stack.pop()
+        for name in scope.values:
+            levels = self._index[name]
+            levels.remove(scope.level)
+            if not levels:
+                del self._index[name]
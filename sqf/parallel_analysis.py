@@ -0,0 +1,48 @@
+"""
+Analyzes many sources on a pool of processes (see `sqf.pool`), so that one failing source
+does not prevent the analysis of the others.
+
+Usage:
+    for name, exceptions in analyze_many(sources, workers=4):
+        ...
+"""
+import os
+
+from sqf.analyzer import analyze_source
+from sqf.exceptions import SQFParserError
+from sqf.pool import Pool, describe
+
+
+def aborted(error):
+    """
+    Returns the exceptions of a source whose analysis failed with `error` (see `sqf.pool.Pool`):
+    a single "Analysis aborted" error, like the one of the files that exceed the limits of sqflint.
+    """
+    return [SQFParserError((1, 1), 'Analysis aborted: %s' % describe(error))]
+
+
+def analyze_many(sources, workers=None, ordered=False, max_pending=None):
+    """
+    Analyzes an iterable of pairs (name, code) on `workers` processes (by default one per CPU), yielding
+    (name, exceptions) of each of them (see `analyze_source`) as they complete or, when `ordered`,
+    in the order of `sources`. The exceptions of a source whose analysis failed (e.g. its process
+    exited) are `aborted`.
+
+    Only `max_pending` (by default twice `workers`) sources are taken from `sources` before their results
+    are consumed, so `sources` can be lazy and results do not pile up when they are consumed slowly.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers == 1:
+        for source in sources:
+            try:
+                result = analyze_source(source)
+            except Exception as e:
+                result = source[0], aborted(e)
+            yield result
+        return
+
+    with Pool(workers) as pool:
+        for source, result, error in pool.imap(analyze_source, sources, ordered, max_pending):
+            yield result if error is None else (source[0], aborted(error))
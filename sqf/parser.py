@@ -2,7 +2,7 @@ from collections import defaultdict
 import re
 
 import sqf.base_type
-from sqf.base_tokenizer import tokenize
+from sqf.base_tokenizer import tokenize, tokenize_buffer
 
 from sqf.exceptions import SQFParenthesisError, SQFParserError
 from sqf.types import Statement, Code, Number, Boolean, Variable, Array, String, Keyword, Namespace, Preprocessor, ParserType
@@ -10,6 +10,7 @@ from sqf.keywords import KEYWORDS, NAMESPACES, PREPROCESSORS
 from sqf.parser_types import Comment, Space, Tab, EndOfLine, BrokenEndOfLine, EndOfFile, ParserKeyword
 from sqf.interpreter_types import DefineStatement, DefineResult, IfDefStatement, IfDefResult
 from sqf.parser_exp import parse_exp
+from sqf.timing import phase
 
 
 def rindex(the_list, value):
@@ -26,6 +27,8 @@ STOP_KEYWORDS = {
 
 OPEN_PARENTHESIS = (ParserKeyword('['), ParserKeyword('('), ParserKeyword('{'))
 CLOSE_PARENTHESIS = (ParserKeyword(']'), ParserKeyword(')'), ParserKeyword('}'))
+_OPEN_VALUES = frozenset(token.value for token in OPEN_PARENTHESIS)
+_CLOSE_VALUES = frozenset(token.value for token in CLOSE_PARENTHESIS)
 
 
 def get_coord(tokens):
@@ -37,12 +40,34 @@ def add_coords(coord1, tokens):
     return coord1[0] + coord2[0], coord1[1] + coord2[1] - 1
 
 
+# raw token -> (class, attributes) of its node. Nodes store their position, so each occurrence of a token
+# is a new node with the attributes of the first one, which shares its (lowercased) strings
+# and skips classifying the token again.
+_IDENTIFIED = {}
+# the maximum number of entries, so that unique tokens (e.g. numbers) do not grow the table indefinitely
+_IDENTIFIED_LIMIT = 1 << 16
+
+
 def identify_token(token):
     """
     The function that converts a token from tokenize to a BaseType.
     """
     if isinstance(token, (Comment, String)):
         return token
+    try:
+        node_class, attributes = _IDENTIFIED[token]
+    except KeyError:
+        prototype = _classify_token(token)
+        node_class, attributes = prototype.__class__, tuple(prototype.__dict__.items())
+        if len(_IDENTIFIED) < _IDENTIFIED_LIMIT:
+            _IDENTIFIED[token] = node_class, attributes
+    node = node_class.__new__(node_class)
+    for name, value in attributes:
+        setattr(node, name, value)
+    return node
+
+
+def _classify_token(token):
     if token == ' ':
         return Space()
     if token == '\t':
@@ -93,25 +118,41 @@ def replace_in_expression(expression, args, arg_indexes, all_tokens):
     return replacing_expression
 
 
-def parse_strings_and_comments(all_tokens):
+class _StringNotClosed(Exception):
+    pass
+
+
+def _with_next(tokens):
+    # yields each token with the one after it (None for the last)
+    tokens = iter(tokens)
+    token = next(tokens, None)
+    if token is None:
+        return
+    for next_token in tokens:
+        yield token, next_token
+        token = next_token
+    yield token, None
+
+
+def iter_strings_and_comments(all_tokens):
     """
-    Function that parses the strings of a script, transforming them into `String`.
+    Yields the tokens of an iterable of tokens, with the strings and comments merged into `String`
+    and `Comment`. Raises `_StringNotClosed` if the last string is not closed.
     """
     string = ''  # the buffer for the activated mode
-    tokens = []  # the final result
     in_double = False
     mode = None  # [None, "string_single", "string_double", "comment_line", "comment_bulk"]
 
-    for i, token in enumerate(all_tokens):
+    for token, next_token in _with_next(all_tokens):
         if mode == "string_double":
             string += token
             if token == '"':
                 if in_double:
                     in_double = False
-                elif not in_double and i != len(all_tokens) - 1 and all_tokens[i+1] == '"':
+                elif not in_double and next_token == '"':
                     in_double = True
                 else:
-                    tokens.append(String(string))
+                    yield String(string)
                     mode = None
                     in_double = False
         elif mode == "string_single":
@@ -119,23 +160,23 @@ def parse_strings_and_comments(all_tokens):
             if token == "'":
                 if in_double:
                     in_double = False
-                elif not in_double and i != len(all_tokens) - 1 and all_tokens[i + 1] == "'":
+                elif not in_double and next_token == "'":
                     in_double = True
                 else:
-                    tokens.append(String(string))
+                    yield String(string)
                     mode = None
                     in_double = False
         elif mode == "comment_bulk":
             string += token
             if token == '*/':
                 mode = None
-                tokens.append(Comment(string))
+                yield Comment(string)
                 string = ''
         elif mode == "comment_line":
             string += token
             if token in ('\n', '\r\n'):
                 mode = None
-                tokens.append(Comment(string))
+                yield Comment(string)
                 string = ''
         else:  # mode is None
             if token == '"':
@@ -151,13 +192,23 @@ def parse_strings_and_comments(all_tokens):
                 string = token
                 mode = "comment_line"
             else:
-                tokens.append(token)
+                yield token
 
     if mode in ("comment_line", "comment_bulk"):
-        tokens.append(Comment(string))
+        yield Comment(string)
     elif mode is not None:
-        raise SQFParserError(get_coord(tokens), 'String is not closed')
+        raise _StringNotClosed
 
+
+def parse_strings_and_comments(all_tokens):
+    """
+    Function that parses the strings of a script, transforming them into `String`.
+    """
+    tokens = []  # the final result
+    try:
+        tokens.extend(iter_strings_and_comments(all_tokens))
+    except _StringNotClosed:
+        raise SQFParserError(get_coord(tokens), 'String is not closed')
     return tokens
 
 
@@ -180,15 +231,16 @@ def _analyze_tokens(tokens):
     return statement
 
 
-def _analyze_array(tokens, analyze_tokens, tokens_until):
+def _analyze_array(tokens, analyze_tokens, all_tokens, end):
+    # `all_tokens[:end]` are the tokens until the array, for the position of errors
     result = []
     part = []
     first_comma_found = False
     for token in tokens:
-        if token == ParserKeyword(','):
+        if type(token) is ParserKeyword and token.value == ',':
             first_comma_found = True
             if not part:
-                raise SQFParserError(get_coord(tokens_until), 'Array cannot have an empty element')
+                raise SQFParserError(get_coord(all_tokens[:end]), 'Array cannot have an empty element')
             result.append(analyze_tokens(part))
             part = []
         else:
@@ -196,7 +248,7 @@ def _analyze_array(tokens, analyze_tokens, tokens_until):
 
     # an empty array is a valid array
     if part == [] and first_comma_found:
-        raise SQFParserError(get_coord(tokens_until), 'Array cannot have an empty element')
+        raise SQFParserError(get_coord(all_tokens[:end]), 'Array cannot have an empty element')
     elif tokens:
         result.append(analyze_tokens(part))
     return result
@@ -325,7 +377,9 @@ def parse_ifdef_block(expression, defines, coord_until_here):
         replacing_expression.append(next_if_def)
         remaining_tokens = tokens[if_def_i + 1:]
         next_if_def.tokens.extend(remaining_tokens)
+        next_if_def.reset_views()
         expression._tokens = tokens[:if_def_i + 1]
+        expression.reset_views()
     except StopIteration:
         replacing_expression += tokens[endif_i + 1:]
 
@@ -333,8 +387,8 @@ def parse_ifdef_block(expression, defines, coord_until_here):
 
 
 def is_finish_ifdef_condition(tokens, lvls):
-    return lvls['ifdef'] == sum(1 for token in tokens if token == Preprocessor('#endif')) > 0 and \
-        lvls['ifdef_open_close'] == 0
+    return lvls['ifdef'] > 0 and lvls['ifdef_open_close'] == 0 and \
+        lvls['ifdef'] == sum(1 for token in tokens if type(token) is Preprocessor and token.value == '#endif')
 
 
 def is_finish_ifdef_parenthesis(token, lvls):
@@ -350,15 +404,52 @@ def finish_ifdef(tokens, all_tokens, start, statements):
     return IfDefStatement(tokens)
 
 
+# the values of the `ParserKeyword` that end a statement
+_STOP_VALUES = {
+    'single': frozenset([';']),
+    'both': frozenset([';', ',']),
+}
+
+
 def is_end_statement(token, stop_statement):
-    return token in STOP_KEYWORDS[stop_statement] or isinstance(token, EndOfFile)
+    return type(token) is ParserKeyword and token.value in _STOP_VALUES[stop_statement] or \
+        isinstance(token, EndOfFile)
 
 
 def parse_block(all_tokens, analyze_tokens, start=0, initial_lvls=None, stop_statement='both', defines=None):
-    if not initial_lvls:
-        initial_lvls = _LEVELS
+    """
+    Parses the tokens from `start` until the end of the block they are in (e.g. the `}` that closes it)
+    and returns the parsed block and the number of tokens it took.
+
+    Nested blocks are parsed by `_parse_block` frames that are kept on an explicit stack instead of
+    Python's call stack, so the depth of the code is not limited by the recursion limit.
+    """
     if defines is None:
         defines = defaultdict(dict)
+
+    frames = [_parse_block(all_tokens, analyze_tokens, start, initial_lvls, stop_statement, defines)]
+    result = None
+    while True:
+        try:
+            arguments = frames[-1].send(result)
+        except StopIteration as e:
+            frames.pop()
+            if not frames:
+                return e.value
+            result = e.value
+        else:
+            # a nested block: parse it and send its result to the frame that requested it
+            frames.append(_parse_block(*arguments, defines))
+            result = None
+
+
+def _parse_block(all_tokens, analyze_tokens, start, initial_lvls, stop_statement, defines):
+    """
+    The frame of `parse_block`: a generator that yields the arguments of each nested block it needs
+    parsed and receives its (block, size); it returns its own (block, size).
+    """
+    if not initial_lvls:
+        initial_lvls = _LEVELS
     lvls = initial_lvls.copy()
 
     statements = []
@@ -369,17 +460,18 @@ def parse_block(all_tokens, analyze_tokens, start=0, initial_lvls=None, stop_sta
 
     while i < len(all_tokens):
         token = all_tokens[i]
+        token_type = type(token)
+        keyword = token.value if token_type is ParserKeyword else None
 
         # begin #ifdef controls
-        if lvls['ifdef'] and token in OPEN_PARENTHESIS:
+        if lvls['ifdef'] and keyword in _OPEN_VALUES:
             lvls['ifdef_open_close'] += 1
 
         stop = False
-        if token in (Preprocessor('#ifdef'), Preprocessor('#ifndef')):
+        if token_type is Preprocessor and token.value in ('#ifdef', '#ifndef'):
             stop = True
             lvls['ifdef'] += 1
-            expression, size = parse_block(all_tokens, _analyze_simple, i + 1, lvls, stop_statement,
-                                           defines=defines)
+            expression, size = yield all_tokens, _analyze_simple, i + 1, lvls, stop_statement
             lvls['ifdef'] -= 1
             if lvls['ifdef'] == 0:
                 assert (isinstance(expression, IfDefStatement))
@@ -387,8 +479,7 @@ def parse_block(all_tokens, analyze_tokens, start=0, initial_lvls=None, stop_sta
 
                 new_all_tokens = sqf.base_type.get_all_tokens(tokens + replacing_expression)
 
-                result, _ = parse_block(new_all_tokens, analyze_tokens, 0, None, stop_statement,
-                                        defines=defines)
+                result, _ = yield new_all_tokens, analyze_tokens, 0, None, stop_statement
 
                 expression.prepend(tokens)
 
@@ -406,9 +497,9 @@ def parse_block(all_tokens, analyze_tokens, start=0, initial_lvls=None, stop_sta
         elif is_finish_ifdef_condition(tokens, lvls) and (
                     is_end_statement(token, stop_statement) or
                     is_finish_ifdef_parenthesis(token, lvls)
-                ) or lvls['ifdef'] > 1 and token == Preprocessor('#endif'):
+                ) or lvls['ifdef'] > 1 and token_type is Preprocessor and token.value == '#endif':
 
-            if token != EndOfFile() and token not in CLOSE_PARENTHESIS:
+            if token_type is not EndOfFile and keyword not in _CLOSE_VALUES:
                 tokens.append(token)
 
             if_def = finish_ifdef(tokens, all_tokens, start, statements)
@@ -419,7 +510,7 @@ def parse_block(all_tokens, analyze_tokens, start=0, initial_lvls=None, stop_sta
             tokens.append(token)
 
         # end ifdef controls
-        if lvls['ifdef'] and token in (STOP_KEYWORDS['single'] + CLOSE_PARENTHESIS):
+        if lvls['ifdef'] and (keyword == ';' or keyword in _CLOSE_VALUES):
             lvls['ifdef_open_close'] -= 1
             if lvls['ifdef_open_close'] < 0:
                 lvls['ifdef_open_close'] = 0
@@ -427,7 +518,7 @@ def parse_block(all_tokens, analyze_tokens, start=0, initial_lvls=None, stop_sta
         if stop:
             pass
         # try to match a #defined and get the arguments
-        elif str(token) in defines:  # is a define
+        elif defines and str(token) in defines:  # is a define
             stop, define_statement, arg_indexes = find_match_if_def(all_tokens, i, defines, token)
 
             if stop:
@@ -446,8 +537,7 @@ def parse_block(all_tokens, analyze_tokens, start=0, initial_lvls=None, stop_sta
 
                 new_start = i - len(tokens)
 
-                expression, size = parse_block(new_all_tokens, analyze_tokens, new_start, lvls,
-                                               stop_statement, defines=defines)
+                expression, size = yield new_all_tokens, analyze_tokens, new_start, lvls, stop_statement
 
                 # the all_tokens of the statement before replacement
                 original_tokens_taken = len(replaced_expression) - len(replacing_expression) + size
@@ -469,38 +559,39 @@ def parse_block(all_tokens, analyze_tokens, start=0, initial_lvls=None, stop_sta
                 tokens = []
         if stop:
             pass
-        elif token == ParserKeyword('['):
+        elif keyword == '[':
             lvls['[]'] += 1
-            expression, size = parse_block(all_tokens, analyze_tokens, i + 1, lvls, stop_statement='single', defines=defines)
+            expression, size = yield all_tokens, analyze_tokens, i + 1, lvls, 'single'
             lvls['[]'] -= 1
             tokens.append(expression)
             i += size + 1
-        elif token == ParserKeyword('('):
+        elif keyword == '(':
             lvls['()'] += 1
-            expression, size = parse_block(all_tokens, analyze_tokens, i + 1, lvls, stop_statement, defines=defines)
+            expression, size = yield all_tokens, analyze_tokens, i + 1, lvls, stop_statement
             lvls['()'] -= 1
             tokens.append(expression)
             i += size + 1
-        elif token == ParserKeyword('{'):
+        elif keyword == '{':
             lvls['{}'] += 1
-            expression, size = parse_block(all_tokens, analyze_tokens, i + 1, lvls, stop_statement, defines=defines)
+            expression, size = yield all_tokens, analyze_tokens, i + 1, lvls, stop_statement
             lvls['{}'] -= 1
             tokens.append(expression)
             i += size + 1
 
-        elif token == ParserKeyword(']'):
+        elif keyword == ']':
             if lvls['[]'] == 0:
                 raise SQFParenthesisError(get_coord(all_tokens[:i]), 'Trying to close right parenthesis without them opened.')
 
             if statements:
                 if isinstance(statements[0], DefineResult):
-                    statements[0]._tokens = [Array(_analyze_array(statements[0]._tokens, analyze_tokens, all_tokens[:i]))]
+                    statements[0]._tokens = [Array(_analyze_array(statements[0]._tokens, analyze_tokens, all_tokens, i))]
+                    statements[0].reset_views()
                     return statements[0], i - start
                 else:
                     raise SQFParserError(get_coord(all_tokens[:i]), 'A statement %s cannot be in an array' % Statement(statements))
 
-            return Array(_analyze_array(tokens, analyze_tokens, all_tokens[:i])), i - start
-        elif token == ParserKeyword(')'):
+            return Array(_analyze_array(tokens, analyze_tokens, all_tokens, i)), i - start
+        elif keyword == ')':
             if lvls['()'] == 0:
                 raise SQFParenthesisError(get_coord(all_tokens[:i]), 'Trying to close parenthesis without opened parenthesis.')
 
@@ -508,7 +599,7 @@ def parse_block(all_tokens, analyze_tokens, start=0, initial_lvls=None, stop_sta
                 statements.append(analyze_tokens(tokens))
 
             return Statement(statements, parenthesis=True), i - start
-        elif token == ParserKeyword('}'):
+        elif keyword == '}':
             if lvls['{}'] == 0:
                 raise SQFParenthesisError(get_coord(all_tokens[:i]), 'Trying to close brackets without opened brackets.')
 
@@ -517,14 +608,14 @@ def parse_block(all_tokens, analyze_tokens, start=0, initial_lvls=None, stop_sta
 
             return Code(statements), i - start
         # end of statement when not in preprocessor states
-        elif all(lvls[lvl_type] == 0 for lvl_type in ('#define', '#include')) and is_end_statement(token, stop_statement):
-            if type(token) != EndOfFile:
+        elif lvls['#define'] == 0 and lvls['#include'] == 0 and is_end_statement(token, stop_statement):
+            if token_type is not EndOfFile:
                 tokens.append(token)
             if tokens:
                 statements.append(analyze_tokens(tokens))
 
             tokens = []
-        elif token in (Preprocessor('#define'), Preprocessor('#include')):
+        elif token_type is Preprocessor and token.value in ('#define', '#include'):
             # notice that `token` is ignored here. It will be picked up in the end
             if tokens:
                 # a pre-processor starts a new statement
@@ -532,12 +623,12 @@ def parse_block(all_tokens, analyze_tokens, start=0, initial_lvls=None, stop_sta
                 tokens = []
 
             lvls[token.value] += 1
-            expression, size = parse_block(all_tokens, analyze_tokens, i + 1, lvls, stop_statement, defines=defines)
+            expression, size = yield all_tokens, analyze_tokens, i + 1, lvls, stop_statement
             lvls[token.value] -= 1
 
             statements.append(expression)
             i += size
-        elif type(token) in (EndOfLine, Comment, EndOfFile) and any(lvls[x] != 0 for x in {'#define', '#include'}):
+        elif token_type in (EndOfLine, Comment, EndOfFile) and (lvls['#define'] != 0 or lvls['#include'] != 0):
             tokens.insert(0, all_tokens[start - 1])  # pick the token that triggered the statement
             if tokens[0] == Preprocessor('#define'):
                 define_statement = _analyze_define(tokens)
@@ -547,7 +638,7 @@ def parse_block(all_tokens, analyze_tokens, start=0, initial_lvls=None, stop_sta
                 statements.append(analyze_tokens(tokens))
 
             return Statement(statements), i - start
-        elif type(token) != EndOfFile:
+        elif token_type is not EndOfFile:
             tokens.append(token)
         i += 1
 
@@ -568,11 +659,42 @@ def parse_block(all_tokens, analyze_tokens, start=0, initial_lvls=None, stop_sta
     return Statement(statements), i - start
 
 
-def parse(script):
-    tokens = [identify_token(x) for x in parse_strings_and_comments(tokenize(script))]
+def _identify_buffer(buffer):
+    """
+    Returns the identified tokens of a bytes-like object, tokenized and decoded incrementally.
+    """
+    tokens = []
+    try:
+        tokens.extend(identify_token(x) for x in iter_strings_and_comments(tokenize_buffer(buffer)))
+    except _StringNotClosed:
+        raise SQFParserError(get_coord(tokens), 'String is not closed')
+    return tokens
+
 
-    result = parse_block(tokens + [EndOfFile()], _analyze_tokens)[0]
+def parse(script, timer=None):
+    """
+    Parses a script. `timer` is an optional `sqf.timing.Timer` that collects the time of each phase.
 
-    result.set_position((1, 1))
+    `script` is a `str` or a bytes-like object with the script in UTF-8, e.g. the `mmap.mmap` of a file,
+    which is decoded and tokenized incrementally so it is never copied in full (the phases
+    tokenize, strings_and_comments and identify_tokens are then timed together as tokenize).
+    """
+    if not isinstance(script, str):
+        with phase(timer, 'tokenize'):
+            tokens = _identify_buffer(script)
+    else:
+        with phase(timer, 'tokenize'):
+            tokens = tokenize(script)
+        with phase(timer, 'strings_and_comments'):
+            tokens = parse_strings_and_comments(tokens)
+        with phase(timer, 'identify_tokens'):
+            tokens = [identify_token(x) for x in tokens]
+
+    # the preprocessor (#define, #ifdef, ...) is resolved while parsing the blocks
+    with phase(timer, 'parse_block'):
+        result = parse_block(tokens + [EndOfFile()], _analyze_tokens)[0]
+
+    with phase(timer, 'set_position'):
+        result.set_position((1, 1))
 
     return result
@@ -1,4 +1,4 @@
-from sqf.base_type import ParserType
+from sqf.base_type import ParserType, BaseTypeContainer
 from sqf.keywords import BINARY_OPERATORS, UNARY_OPERATORS, OP_COMPARISON, PREPROCESSORS_UNARY
 
 
@@ -6,46 +6,26 @@ class EndToken:
     pass
 
 
-def _normalize(item):
-    return str(item).lower()
+_COMPARISON = frozenset(x.value for x in OP_COMPARISON)
 
 
-def nud(token, parser):
-    n_token = _normalize(token)
-    if n_token in UNARY_OPERATORS:
-        return parser.container([token, parser.expression(100)])
-    elif str(token) in PREPROCESSORS_UNARY:
-        return parser.container([token, parser.expression(100)])
-    elif str(token) == '#define':
-        arg = parser.expression(100)
-        args = parser.expression(100)
-        func = parser.expression(100)
-        return parser.container([token, arg, args, func])
-    elif str(token).isupper():
-        # heuristic to catch global defines with arguments
-        if str(parser.next)[0] == '(':
-            return parser.container([token, parser.expression(100)])
-    return token
-
-
-def get_lbp(token):
-    n_token = _normalize(token)
-
-    if token == EndToken:
-        return 0
-    elif n_token == '=':
+def binding_power(n_token):
+    """
+    The left binding power of a token, given its normalized string.
+    """
+    if n_token == '=':
         return 0.8
     elif n_token == 'private':
         return 0.9
     elif n_token in ('||', 'or'):
         return 1
-    elif n_token in {'&&', 'and'}:
+    elif n_token in ('&&', 'and'):
         return 2
-    elif n_token in set(x.value for x in OP_COMPARISON):
+    elif n_token in _COMPARISON:
         return 3
-    elif n_token in {'*', '/', '%', 'mod', 'atan2'}:
+    elif n_token in ('*', '/', '%', 'mod', 'atan2'):
         return 7
-    elif n_token in {'+', 'max', 'min', '-'}:
+    elif n_token in ('+', 'max', 'min', '-'):
         return 6
     elif n_token == 'else':
         return 5
@@ -57,47 +37,108 @@ def get_lbp(token):
         return 0.1
 
 
+def _opening(token):
+    """
+    The bracket that starts the string of a container (e.g. an array), or None.
+    """
+    if isinstance(token, BaseTypeContainer) and token.string_tokens:
+        first = token.string_tokens[0]
+        if not isinstance(first, BaseTypeContainer):
+            string = str(first)[:1]
+            if string in ('(', '[', '{'):
+                return string
+    return None
+
+
 class Parser:
+    """
+    A Pratt parser of expressions, that can be reused for many expressions.
+
+    `parse` separates the base tokens from the other tokens (`ParserType`, e.g. spaces and comments),
+    that are kept in the expressions next to the base tokens around them, and computes the string
+    and the binding power of each base token once. The base tokens are then accessed by index.
+    The string of a container that starts with a bracket is not an operator, and is only computed
+    when needed, since computing it on every level of nested containers is quadratic.
+    """
 
     def __init__(self, container):
-        self.next = None
         self.container = container
-        self.tokens = []
+        self.next = None
+        # the non-base tokens since the last expression that took them
         self.cumulator = []
-        self.iterator = self._iterator()
-
-    def _iterator(self):
-        for token in self.tokens:
-            if isinstance(token, ParserType):
-                self.cumulator.append(token)
-            else:
-                yield token
-        yield EndToken
+        self._tokens = []
+        # the base tokens (and `EndToken`), their index in `_tokens`, their strings and their binding powers
+        self._base = []
+        self._positions = []
+        self._strings = []
+        self._lbps = []
+        # the index in `_base` of `next`
+        self._index = 0
+
+    def _advance(self):
+        # moves `next` to the next base token, collecting the tokens before it
+        index = self._index + 1
+        start, end = self._positions[index - 1] + 1, self._positions[index]
+        if start < end:
+            self.cumulator.extend(self._tokens[start:end])
+        self._index = index
+        self.next = self._base[index]
+
+    def _first(self, index):
+        # the first character of the base token at `index`
+        string = self._strings[index]
+        if string is None:
+            return _opening(self._base[index])
+        return string[0]
+
+    def _nud(self, token, string):
+        if string is None:
+            if self._first(self._index) != '(':
+                return token
+            string = str(token)
+        if string.lower() in UNARY_OPERATORS:
+            return self.container([token, self.expression(100)])
+        elif string in PREPROCESSORS_UNARY:
+            return self.container([token, self.expression(100)])
+        elif string == '#define':
+            arg = self.expression(100)
+            args = self.expression(100)
+            func = self.expression(100)
+            return self.container([token, arg, args, func])
+        elif string.isupper():
+            # heuristic to catch global defines with arguments
+            if self._first(self._index) == '(':
+                return self.container([token, self.expression(100)])
+        return token
 
     def expression(self, rbp=0):
         current = self.next
+        string = self._strings[self._index]
 
         cum_prefix = self.cumulator
         self.cumulator = []
 
-        try:
-            self.next = next(self.iterator)
-        except StopIteration:
-            if len(cum_prefix + self.cumulator) == 1:
-                return (cum_prefix + self.cumulator)[0]
-            return self.container(cum_prefix + self.cumulator)
-
-        left = nud(current, self)
-        if cum_prefix + self.cumulator:
-            left = self.container(cum_prefix + [left] + self.cumulator)
+        if current is EndToken:
+            # only the tokens after the last base token remain
+            if len(cum_prefix) == 1:
+                return cum_prefix[0]
+            return self.container(cum_prefix)
+        self._advance()
+
+        left = self._nud(current, string)
+        if cum_prefix or self.cumulator:
+            cum_prefix.append(left)
+            cum_prefix.extend(self.cumulator)
+            left = self.container(cum_prefix)
             self.cumulator = []
 
-        while rbp < get_lbp(self.next):
+        while rbp < self._lbps[self._index]:
             current = self.next
-            self.next = next(self.iterator)
+            current_lbp = self._lbps[self._index]
+            self._advance()
             if self.next is EndToken:
                 return self.container([left, current])
-            right = self.expression(get_lbp(current))
+            right = self.expression(current_lbp)
             left = self.container([left, current, right])
 
         return left
@@ -105,11 +146,41 @@ class Parser:
     def parse(self, tokens):
         if len(tokens) == 1:
             return tokens[0]
-        self.tokens = tokens
-        self.iterator = self._iterator()
-        self.next = next(self.iterator)
+        self._tokens = tokens
+        self.cumulator = []
+        # the first entry of each list is before the first token
+        base = self._base = [None]
+        positions = self._positions = [-1]
+        strings = self._strings = [None]
+        lbps = self._lbps = [None]
+        for i, token in enumerate(tokens):
+            if not isinstance(token, ParserType):
+                base.append(token)
+                positions.append(i)
+                if _opening(token) is None:
+                    string = str(token)
+                    strings.append(string)
+                    lbps.append(binding_power(string.lower()))
+                else:
+                    strings.append(None)
+                    lbps.append(0.1)  # the binding power of any token that is not an operator
+        base.append(EndToken)
+        positions.append(len(tokens))
+        strings.append(str(EndToken))
+        lbps.append(0)
+
+        self._index = 0
+        self._advance()
         return self.expression()
 
 
+# the parsers of `parse_exp`, by container
+_PARSERS = {}
+
+
 def parse_exp(tokens, container=list):
-    return Parser(container).parse(tokens)
+    try:
+        parser = _PARSERS[container]
+    except KeyError:
+        parser = _PARSERS[container] = Parser(container)
+    return parser.parse(tokens)
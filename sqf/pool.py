@@ -0,0 +1,348 @@
+"""
+A pool of processes that runs a function on items, shared by the analyses and the test runner
+that run on many processes.
+
+Unlike `multiprocessing.Pool` and `concurrent.futures.ProcessPoolExecutor`, the failure of an item does not
+break the pool: an item whose function raises, whose process exits (e.g. it crashes or is killed) or that
+exceeds the time limit gets its own error, its process is replaced by a new one when needed, and the other
+items continue.
+
+Usage:
+    with Pool(workers=4, timeout=60) as pool:
+        for item, result, error in pool.imap(function, items):
+            ...
+        future = pool.submit(function, *arguments)  # a `concurrent.futures.Future`
+"""
+import collections
+import concurrent.futures
+import multiprocessing
+import multiprocessing.connection
+import os
+import threading
+import time
+
+
+class WorkerError(Exception):
+    """
+    The error of an item whose process exited, or that exceeded the time limit of its pool.
+    """
+
+
+def describe(error):
+    """
+    Returns the reason of the error of an item: the message of a `WorkerError`, or the class and
+    the message of the exception raised by the function.
+    """
+    if isinstance(error, WorkerError):
+        return str(error)
+    return '%s: %s' % (error.__class__.__name__, error)
+
+
+def default_start_method():
+    # processes forked from a process with threads (e.g. the one of `Pool`) can deadlock, and they would
+    # reuse the memory freed by this process
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return 'forkserver'
+    return 'spawn'
+
+
+class Worker:
+    """
+    A process that runs `target(connection, *arguments)`, and this end of `connection`.
+    """
+    def __init__(self, context, target, arguments=()):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=target, args=(child_connection,) + tuple(arguments), daemon=True)
+        self.process.start()
+        child_connection.close()
+
+    def _exited(self):
+        self.process.join()
+        return WorkerError('the worker exited unexpectedly (exit code %s)' % self.process.exitcode)
+
+    def send(self, message):
+        """
+        Sends a message to the process, or raises `WorkerError` when the process exited.
+        """
+        try:
+            self.connection.send(message)
+        except (BrokenPipeError, ConnectionResetError):
+            raise self._exited()
+
+    def receive(self):
+        """
+        Returns the next message of the process, or raises `WorkerError` when the process exited.
+        """
+        try:
+            return self.connection.recv()
+        except (EOFError, ConnectionResetError):
+            raise self._exited()
+
+    def stop(self):
+        """
+        Sends None, the message that stops the process, and waits for it to exit.
+        """
+        try:
+            self.connection.send(None)
+        except OSError:  # the process already exited
+            pass
+        self.process.join()
+        self.connection.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+def _reply(connection, status, value):
+    try:
+        connection.send((status, value))
+    except Exception as e:  # e.g. the value cannot be pickled
+        connection.send(('error', WorkerError(describe(e))))
+
+
+def _serve(connection):
+    """
+    The loop of a process of a `Pool`. Every message is a task (function, arguments), or None to stop,
+    and is answered with ('ok', result) or ('error', exception). The process stops after a `MemoryError`,
+    since its memory can be exhausted.
+    """
+    connection.send(('ready',))
+    while True:
+        task = connection.recv()
+        if task is None:
+            break
+        function, arguments = task
+        try:
+            result = function(*arguments)
+        except MemoryError as e:
+            _reply(connection, 'error', e)
+            break
+        except Exception as e:
+            _reply(connection, 'error', e)
+        else:
+            _reply(connection, 'ok', result)
+    connection.close()
+
+
+class _PoolWorker(Worker):
+    def __init__(self, context):
+        super().__init__(context, _serve)
+        self.ready = False
+        self.tasks = 0
+        # the future of the running task, and when it started
+        self.future = None
+        self.started = None
+
+    def submit(self, future, function, arguments):
+        self.send((function, arguments))
+        self.future = future
+        self.started = time.monotonic()
+        self.tasks += 1
+
+
+class Pool:
+    """
+    Runs functions on `workers` processes (by default one per CPU), started with `start_method`
+    (by default `default_start_method()`) when there are tasks for them.
+
+    timeout: the time, in seconds, after which a task fails with `WorkerError` and its process is killed
+        (None for no limit)
+    tasks_per_worker: the number of tasks after which a process is replaced by a new one, so its memory
+        does not grow indefinitely (None for never)
+
+    The processes are managed by a thread of the pool. The functions, their arguments and results must be
+    picklable.
+    """
+    def __init__(self, workers=None, timeout=None, tasks_per_worker=None, start_method=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.tasks_per_worker = tasks_per_worker
+        self._context = multiprocessing.get_context(start_method or default_start_method())
+
+        self._lock = threading.Lock()
+        self._queue = collections.deque()  # the (future, function, arguments) waiting for a process
+        self._closed = False
+        self._thread = None
+        # wakes up the thread on new tasks and on `close`
+        self._wakeup_reader, self._wakeup_writer = multiprocessing.Pipe(duplex=False)
+        self._woken = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _wakeup(self):
+        # with the lock held; a single pending message is enough
+        if not self._woken:
+            self._woken = True
+            self._wakeup_writer.send_bytes(b'')
+
+    def submit(self, function, *arguments):
+        """
+        Runs `function(*arguments)` on a process of the pool, returning its `concurrent.futures.Future`.
+        Cancelling the future only succeeds while the task waits for a process.
+        """
+        future = concurrent.futures.Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('cannot submit tasks to a closed pool')
+            self._queue.append((future, function, arguments))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._wakeup()
+        return future
+
+    def imap(self, function, items, ordered=True, max_pending=None):
+        """
+        Runs `function(item)` on each item of `items`, yielding (item, result, error) of each of them,
+        where `error` is the exception of a failed item (and `result` None), in the order of `items` or,
+        when not `ordered`, as they complete.
+
+        Only `max_pending` (by default twice `workers`) items are taken from `items` before their results
+        are consumed, so `items` can be lazy and results do not pile up when they are consumed slowly.
+        """
+        if max_pending is None:
+            max_pending = 2 * self.workers
+        items = iter(items)
+        pending = collections.OrderedDict()  # future: item
+        try:
+            while True:
+                for item in items:
+                    pending[self.submit(function, item)] = item
+                    if len(pending) >= max_pending:
+                        break
+                if not pending:
+                    break
+
+                if ordered:
+                    future = next(iter(pending))
+                else:
+                    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    future = next(future for future in pending if future in done)
+                item = pending.pop(future)
+                error = future.exception()
+                yield item, None if error is not None else future.result(), error
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def close(self):
+        """
+        Stops the processes, cancelling the tasks that wait for a process. The tasks that are running fail
+        with `WorkerError`.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+            self._wakeup()
+        if thread is not None:
+            thread.join()
+        self._wakeup_reader.close()
+        self._wakeup_writer.close()
+
+    def _run(self):
+        # the loop of the thread of the pool
+        workers = {}  # connection: worker
+
+        def remove(worker, kill=False):
+            del workers[worker.connection]
+            if kill:
+                worker.kill()
+            else:
+                worker.stop()
+
+        try:
+            while True:
+                with self._lock:
+                    if self._closed:
+                        break
+                    self._woken = False
+                    idle = [worker for worker in workers.values() if worker.ready and worker.future is None]
+                    while self._queue and idle:
+                        future, function, arguments = self._queue.popleft()
+                        if not future.set_running_or_notify_cancel():
+                            continue
+                        worker = idle.pop()
+                        try:
+                            worker.submit(future, function, arguments)
+                        except WorkerError as e:
+                            future.set_exception(e)
+                            del workers[worker.connection]
+                            worker.connection.close()
+                    # the processes that are starting or idle take the next tasks
+                    available = sum(1 for worker in workers.values() if worker.future is None)
+                    starting = max(0, min(len(self._queue) - available, self.workers - len(workers)))
+                for _ in range(starting):
+                    worker = _PoolWorker(self._context)
+                    workers[worker.connection] = worker
+
+                busy = [worker for worker in workers.values() if worker.future is not None]
+                wait = None
+                if self.timeout is not None and busy:
+                    wait = max(0., min(worker.started for worker in busy) + self.timeout - time.monotonic())
+
+                for connection in multiprocessing.connection.wait([self._wakeup_reader] + list(workers), wait):
+                    if connection is self._wakeup_reader:
+                        connection.recv_bytes()
+                        continue
+                    worker = workers[connection]
+                    try:
+                        reply = worker.receive()
+                    except WorkerError as e:
+                        del workers[connection]
+                        worker.connection.close()
+                        if worker.future is not None:
+                            worker.future.set_exception(e)
+                            worker.future = None
+                        elif not worker.ready:
+                            # a process that cannot start fails the next task, instead of being replaced forever
+                            self._fail_next(WorkerError('the worker exited while starting (exit code %s)' %
+                                                        worker.process.exitcode))
+                        continue
+
+                    if reply[0] == 'ready':
+                        worker.ready = True
+                        continue
+                    future = worker.future
+                    worker.future = None
+                    if reply[0] == 'ok':
+                        future.set_result(reply[1])
+                    else:
+                        future.set_exception(reply[1])
+                    # the process stops after a `MemoryError` (see `_serve`)
+                    if reply[0] == 'error' and isinstance(reply[1], MemoryError) or \
+                            self.tasks_per_worker is not None and worker.tasks >= self.tasks_per_worker:
+                        remove(worker)
+
+                if self.timeout is not None:
+                    now = time.monotonic()
+                    for worker in busy:
+                        if worker.future is not None and now - worker.started >= self.timeout:
+                            worker.future.set_exception(
+                                WorkerError('exceeded the time limit of %gs' % self.timeout))
+                            remove(worker, kill=True)
+        finally:
+            error = WorkerError('the pool was closed')
+            for worker in list(workers.values()):
+                if worker.future is not None:
+                    worker.future.set_exception(error)
+                remove(worker, kill=worker.future is not None or not worker.ready)
+            with self._lock:
+                self._closed = True
+                while self._queue:
+                    self._queue.popleft()[0].cancel()
+
+    def _fail_next(self, error):
+        with self._lock:
+            while self._queue:
+                future = self._queue.popleft()[0]
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(error)
+                    return
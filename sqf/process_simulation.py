@@ -0,0 +1,288 @@
+import collections
+import multiprocessing
+import os
+
+from sqf.client import Client
+from sqf.pool import Worker
+
+
+SERVER_ID = -1
+
+
+class _WorkerSimulation:
+    """
+    The simulation seen by the clients of a worker process, that answers the commands of a
+    `ProcessSimulation` through `connection`.
+
+    A broadcast made by a script is sent to the `ProcessSimulation`, and the script waits until it was
+    delivered, answering meanwhile the commands of the delivery (e.g. to set the variable on its clients).
+    Broadcasts made by event handlers are collected and returned with the answer of the command that
+    triggered them, to be delivered after it, like `Simulation` queues them.
+    """
+    def __init__(self, connection, is_dedicated):
+        self._connection = connection
+        self._is_dedicated = is_dedicated
+        self.server = None
+        self.clients = {}  # client id -> Client
+        self._outgoing = []
+        self._delivering = False
+
+    @property
+    def is_dedicated(self):
+        return self._is_dedicated
+
+    def add_client(self, client_id):
+        client = Client(self)
+        if client_id == SERVER_ID:
+            self.server = client
+        self.clients[client_id] = client
+
+    def broadcast(self, var_name, value, client_id=None):
+        if self._delivering:
+            self._outgoing.append((var_name, value, client_id))
+            return
+        self._connection.send(('broadcast', var_name, value, client_id))
+        error = self.serve()
+        if error is not None:
+            raise error
+
+    def take_broadcasts(self):
+        broadcasts = self._outgoing
+        self._outgoing = []
+        return broadcasts
+
+    def serve(self):
+        """
+        Answers commands, tuples (command, *arguments), with ('ok', result) or ('error', exception), until
+        None, or the command 'delivered' that ends the delivery of a broadcast of a script
+        and whose argument is the error of the delivery (or None), returned.
+        """
+        while True:
+            message = self._connection.recv()
+            if message is None:
+                return None
+            command, arguments = message[0], message[1:]
+            if command == 'delivered':
+                return arguments[0]
+            try:
+                result = self._answer(command, arguments)
+            except Exception as e:
+                self._connection.send(('error', e))
+            else:
+                self._connection.send(('ok', result))
+
+    def _answer(self, command, arguments):
+        if command == 'add_client':
+            client_id, variables = arguments
+            self.add_client(client_id)
+            for var_name, value in variables:
+                self.clients[client_id].set_variable(var_name, value, broadcast=False)
+        elif command == 'execute':
+            client_id, code = arguments
+            self.clients[client_id].execute(code)
+        elif command == 'set_variable':
+            return self._set_variable(*arguments)
+        elif command == 'get_variable':
+            client_id, var_name = arguments
+            return self.clients[client_id]._interpreter[var_name]
+        else:
+            raise ValueError('Unknown command "%s"' % command)
+
+    def _set_variable(self, client_ids, var_name, value):
+        # the broadcasts made by the handlers of each client, in the order of the clients, and the first
+        # error of the handlers: a handler that fails does not prevent the delivery to the other clients
+        broadcasts = []
+        error = None
+        delivering = self._delivering
+        self._delivering = True
+        try:
+            for client_id in client_ids:
+                try:
+                    self.clients[client_id].set_variable(var_name, value)
+                except Exception as e:
+                    error = error or e
+                broadcasts.append(self.take_broadcasts())
+        finally:
+            self._delivering = delivering
+        return broadcasts, error
+
+
+def _worker(connection, is_dedicated):
+    """
+    The loop of a worker process.
+    """
+    _WorkerSimulation(connection, is_dedicated).serve()
+    connection.close()
+
+
+class _Worker(Worker):
+    """
+    A worker process. Unlike the processes of `sqf.pool.Pool`, it keeps the state of its clients,
+    so it cannot be replaced when it exits: its commands then raise `sqf.pool.WorkerError`.
+    """
+    def __init__(self, context, is_dedicated):
+        super().__init__(context, _worker, (is_dedicated,))
+
+    def receive(self, deliver=None):
+        """
+        Returns the result of the last command, or raises its error. The broadcasts that the scripts of the
+        worker make meanwhile are delivered with `deliver`, that returns the error of the delivery.
+        """
+        while True:
+            message = super().receive()
+            if message[0] == 'broadcast':
+                self.send(('delivered', deliver(*message[1:])))
+                continue
+            status, result = message
+            if status == 'error':
+                raise result
+            return result
+
+    def request(self, *message, deliver=None):
+        self.send(message)
+        return self.receive(deliver)
+
+
+class ClientProxy:
+    """
+    A client of a `ProcessSimulation`, living in a worker process.
+    """
+    def __init__(self, simulation, client_id):
+        self._simulation = simulation
+        self.id = client_id
+
+    @property
+    def simulation(self):
+        return self._simulation
+
+    @property
+    def is_server(self):
+        return self.id == SERVER_ID
+
+    def execute(self, code):
+        self._simulation._execute(self.id, code)
+
+    def __getitem__(self, var_name):
+        return self._simulation._worker(self.id).request('get_variable', self.id, var_name)
+
+
+class ProcessSimulation:
+    """
+    A `sqf.client.Simulation` whose server and clients run in `workers` processes
+    (by default one per CPU), each process running a group of clients.
+
+    Broadcasts are pickled and delivered by this process with the ordering of `Simulation`:
+    a broadcast of a script is delivered, with the broadcasts it triggers, before the script continues,
+    broadcasts are delivered in the order they were made, and the ones made by
+    event handlers are delivered after the one that triggered them was delivered to every client.
+    A broadcast is delivered to all its clients in parallel, since the handlers it triggers
+    cannot see each other's broadcasts until it was delivered to every client.
+    When a handler fails, the delivery continues and its first error is raised by the script.
+
+    Usage:
+        with ProcessSimulation() as sim:
+            client = sim.add_client()
+            sim.server.execute('x = 1; publicVariable "x"')
+            client['x']
+    """
+    def __init__(self, is_dedicated=True, workers=None, start_method=None):
+        self._is_dedicated = is_dedicated
+        if workers is None:
+            workers = os.cpu_count() or 1
+        context = multiprocessing.get_context(start_method)
+        self._workers = [_Worker(context, is_dedicated) for _ in range(workers)]
+
+        self._broadcasted = collections.OrderedDict()
+
+        self.server = self._add(SERVER_ID)
+        self._clients = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
+
+    @property
+    def is_dedicated(self):
+        return self._is_dedicated
+
+    @property
+    def clients(self):
+        return self._clients
+
+    def _worker(self, client_id):
+        # the server shares the first worker with the clients assigned to it
+        return self._workers[(client_id + 1) % len(self._workers)]
+
+    def _add(self, client_id):
+        self._worker(client_id).request('add_client', client_id, list(self._broadcasted.items()))
+        return ClientProxy(self, client_id)
+
+    def add_client(self):
+        """
+        Adds a client (that joins in progress), returning it.
+        """
+        assert self._is_dedicated
+        client = self._add(len(self._clients))
+        self._clients.append(client)
+        return client
+
+    def _execute(self, client_id, code):
+        self._worker(client_id).request('execute', client_id, code, deliver=self._deliver_broadcast)
+
+    def _deliver_broadcast(self, var_name, value, client_id):
+        # delivers a broadcast of a script, returning the error to be raised by the script
+        try:
+            self.deliver([(var_name, value, client_id)])
+        except Exception as e:
+            return e
+        return None
+
+    def _targets(self, client_id):
+        # client_id=None => to all
+        # client_id=-1 => to the server
+        if client_id is None:
+            return [client.id for client in self._clients] + [SERVER_ID]
+        return [client_id]
+
+    def deliver(self, broadcasts):
+        """
+        Delivers `broadcasts`, a list of (var_name, value, client_id), and the broadcasts they trigger,
+        raising the first error of the event handlers at the end.
+        """
+        queue = collections.deque(broadcasts)
+        error = None
+        while queue:
+            var_name, value, client_id = queue.popleft()
+            if client_id is None:
+                self._broadcasted[var_name] = value
+
+            targets = self._targets(client_id)
+            groups = collections.OrderedDict()  # worker -> client ids
+            for target in targets:
+                groups.setdefault(self._worker(target), []).append(target)
+
+            for worker, client_ids in groups.items():
+                worker.send(('set_variable', client_ids, var_name, value))
+
+            # wait for every worker, so none is left with an unread answer
+            triggered = {}
+            for worker, client_ids in groups.items():
+                try:
+                    client_broadcasts, handler_error = worker.receive()
+                except Exception as e:
+                    error = error or e
+                    continue
+                triggered.update(zip(client_ids, client_broadcasts))
+                error = error or handler_error
+
+            for target in targets:
+                queue.extend(triggered.get(target, ()))
+        if error is not None:
+            raise error
@@ -0,0 +1,91 @@
+import time
+
+from sqf.types import File, Statement
+
+
+def _line(statement):
+    # the position of a statement includes its leading spaces and comments, so we use
+    # the position of its first token that is evaluated
+    while isinstance(statement, Statement) and statement.base_tokens:
+        statement = statement.base_tokens[0]
+    return statement.position[0]
+
+
+class Profiler:
+    """
+    Attributes the wall time spent by an interpreter to the lines of the SQF script
+    and to the stack of code blocks (`call`, `if`, loops, ...) being executed.
+
+    Usage:
+        interpreter = Interpreter()
+        interpreter.profiler = Profiler()
+        interpret(script, interpreter)
+        interpreter.profiler.write_table(sys.stdout)
+
+    Times are *self* times: the time of a statement excludes the time spent on the code
+    blocks it executes, which are attributed to their own lines.
+    """
+    def __init__(self, name='<sqf>', clock=time.perf_counter):
+        self.name = name
+        self._clock = clock
+
+        self.lines = {}  # line -> [count, time]
+        self.stacks = {}  # tuple of frames -> [count, time]
+
+        self._frames = []
+        self._timers = []  # stack of [line, start, time of children]
+
+    def _frame_name(self, code):
+        if isinstance(code, File):
+            return self.name
+        return '%s:%d' % (self.name, code.position[0])
+
+    def enter_code(self, code):
+        self._frames.append(self._frame_name(code))
+        key = tuple(self._frames)
+        if key not in self.stacks:
+            self.stacks[key] = [0, 0.]
+        self.stacks[key][0] += 1
+
+    def exit_code(self):
+        self._frames.pop()
+
+    def enter_statement(self, statement):
+        self._timers.append([_line(statement), self._clock(), 0.])
+
+    def exit_statement(self):
+        line, start, children = self._timers.pop()
+        elapsed = self._clock() - start
+        if self._timers:
+            self._timers[-1][2] += elapsed
+        elapsed -= children
+
+        if line not in self.lines:
+            self.lines[line] = [0, 0.]
+        stats = self.lines[line]
+        stats[0] += 1
+        stats[1] += elapsed
+
+        self.stacks[tuple(self._frames)][1] += elapsed
+
+    def write_collapsed(self, writer):
+        """
+        Writes the stacks in the collapsed format (`frame;frame time`), in microseconds,
+        as consumed by flame graph tools.
+        """
+        for frames in sorted(self.stacks):
+            microseconds = int(round(self.stacks[frames][1]*1e6))
+            if microseconds:
+                writer.write('%s %d\n' % (';'.join(frames), microseconds))
+
+    def write_table(self, writer, limit=None):
+        """
+        Writes the lines sorted by the time spent on them.
+        """
+        lines = sorted(self.lines.items(), key=lambda item: item[1][1], reverse=True)
+        if limit is not None:
+            lines = lines[:limit]
+
+        writer.write('%8s %10s %12s %14s\n' % ('line', 'calls', 'time (ms)', 'per call (us)'))
+        for line, (count, elapsed) in lines:
+            writer.write('%8d %10d %12.3f %14.3f\n' % (line, count, elapsed*1e3, elapsed*1e6/count))
@@ -0,0 +1,300 @@
+import heapq
+import itertools
+import os
+
+from sqf.types import Statement, Code, Nothing, Number, Keyword, File, Script
+from sqf.common_expressions import ForEachExpression, WhileDoExpression, ForFromToDoExpression, \
+    ForSpecDoExpression, IfThenSpecExpression, IfThenElseExpression, IfThenExpression
+from sqf.parser import parse
+from sqf.exceptions import SQFParserError
+
+
+class _Script:
+    def __init__(self, script_id, generator, local_states, namespace):
+        self.id = script_id
+        self.generator = generator
+        self.local_states = local_states  # namespace name -> local state
+        self.namespace = namespace
+        self.done = False
+
+
+class Scheduler:
+    """
+    Runs scripts in the scheduled environment of an interpreter (`spawn`, `execVM`), on a simulated clock.
+
+    Each script is a generator that executes its statements and suspends on `sleep`, `uiSleep`
+    and `waitUntil`. Scripts are resumed in order of wake-up time (and of suspension, on ties),
+    and the clock jumps to the next wake-up, so waiting does not take wall time.
+    `waitUntil` evaluates its condition once per `frame` (in seconds).
+
+    Every script has its own local variables; global variables are shared.
+    Scripts can suspend on the statements of the code they execute and of the code of
+    `if`, `while`, `for`, `forEach` and `call`, but not within expressions (e.g. `_x = call {sleep 1}`).
+
+    Usage:
+        interpreter = Interpreter()
+        scheduler = Scheduler(interpreter)
+        scheduler.execute('sleep 1800; done = true')
+        scheduler.run()
+    """
+    def __init__(self, interpreter, frame=0.02, root=None):
+        self.interpreter = interpreter
+        interpreter.scheduler = self
+        self.frame = frame
+        # the directory `execVM` paths are relative to
+        if root is None:
+            root = os.getcwd()
+        self.root = root
+
+        self.time = 0.
+        self._scripts = {}
+        self._queue = []  # heap of (time, sequence, script id)
+        self._sequence = itertools.count()
+        self._ids = itertools.count()
+
+    def spawn(self, code, arguments=None):
+        """
+        Schedules `code` to be executed with `_this` equal to `arguments`. Returns the id of the script.
+        """
+        if arguments is None:
+            arguments = Nothing()
+        script_id = next(self._ids)
+        extra_scope = {'_this': arguments, '_thisScript': Script(script_id)}
+
+        local_states = {name: namespace.new_locals() for name, namespace in self.interpreter._namespaces.items()}
+        generator = _execute_code(self.interpreter, code, extra_scope)
+
+        self._scripts[script_id] = _Script(script_id, generator, local_states, self.interpreter.namespace('missionnamespace'))
+        self._schedule(script_id, self.time)
+        return script_id
+
+    def execute(self, script, arguments=None):
+        """
+        Parses and schedules a script, returning its id.
+        """
+        file = File(parse(script)._tokens)
+        file.position = (1, 1)
+        return self.spawn(file, arguments)
+
+    def exec_vm(self, path, arguments=None):
+        with open(os.path.join(self.root, path)) as f:
+            return self.execute(f.read(), arguments)
+
+    def is_done(self, script_id):
+        return script_id not in self._scripts
+
+    def terminate(self, script_id):
+        if script_id in self._scripts:
+            self._scripts[script_id].done = True
+            del self._scripts[script_id]
+
+    @property
+    def scripts(self):
+        return len(self._scripts)
+
+    def _schedule(self, script_id, time):
+        heapq.heappush(self._queue, (time, next(self._sequence), script_id))
+
+    def step(self):
+        """
+        Advances the clock to the next wake-up and resumes the scripts waiting for it.
+        Returns False when there are no scripts to run.
+        """
+        while self._queue and self._queue[0][2] not in self._scripts:
+            heapq.heappop(self._queue)  # terminated scripts
+        if not self._queue:
+            return False
+
+        self.time = self._queue[0][0]
+        while self._queue and self._queue[0][0] == self.time:
+            _, _, script_id = heapq.heappop(self._queue)
+            if script_id in self._scripts:
+                self._resume(self._scripts[script_id])
+        return True
+
+    def run(self, until=None):
+        """
+        Runs the scripts until all are done or, if `until` is given, until the clock would pass it.
+        """
+        while self._queue:
+            if until is not None and self._queue[0][0] > until:
+                self.time = until
+                break
+            if not self.step():
+                break
+
+    def _resume(self, script):
+        interpreter = self.interpreter
+
+        # swap the local variables of the interpreter by the ones of the script
+        previous_states = {}
+        for name, namespace in interpreter._namespaces.items():
+            previous_states[name] = namespace.get_locals()
+            namespace.set_locals(script.local_states[name])
+        previous_namespace = interpreter.current_namespace
+        interpreter.current_namespace = script.namespace
+
+        try:
+            delay = next(script.generator)
+        except StopIteration:
+            delay = None
+            script.done = True
+        except Exception:
+            script.done = True
+            raise
+        finally:
+            script.namespace = interpreter.current_namespace
+            interpreter.current_namespace = previous_namespace
+            for name, namespace in interpreter._namespaces.items():
+                namespace.set_locals(previous_states[name])
+
+            if script.done:
+                self.terminate(script.id)
+
+        if not script.done:
+            # a suspension lasts at least one frame
+            self._schedule(script.id, self.time + max(delay, self.frame))
+
+
+def _execute_code(interpreter, code, extra_scope=None, namespace_name='missionnamespace'):
+    """
+    The scheduled equivalent of `BaseInterpreter.execute_code`: a generator that yields the
+    seconds to suspend for, and returns the outcome of the code.
+    """
+    _previous_namespace = interpreter.current_namespace
+    namespace = interpreter.namespace(namespace_name)
+    interpreter.current_namespace = namespace
+
+    if extra_scope is None:
+        extra_scope = {}
+    namespace.add_scope(extra_scope)
+
+    outcome = Nothing()
+    outcome.position = code.position
+    for statement in code.base_tokens:
+        outcome = yield from _execute_statement(interpreter, statement)
+
+    if not isinstance(code, File):
+        namespace.del_scope()
+    interpreter.current_namespace = _previous_namespace
+    return outcome
+
+
+def _execute_statement(interpreter, statement):
+    if not isinstance(statement, Statement):
+        return interpreter.execute_token(statement)[1]
+
+    # statements wrapping a single statement (e.g. with spaces before it)
+    inner = statement
+    while len(inner.base_tokens) == 1 and isinstance(inner.base_tokens[0], Statement) and \
+            not inner.base_tokens[0].parenthesis:
+        inner = inner.base_tokens[0]
+    base_tokens = inner.base_tokens
+
+    if len(base_tokens) == 2 and base_tokens[0] in (Keyword('sleep'), Keyword('uiSleep')):
+        delay = interpreter.execute_token(base_tokens[1])[1]
+        if not isinstance(delay, Number):
+            raise SQFParserError(inner.position, 'Interpretation of "%s" failed' % inner)
+        yield delay.value
+        outcome = Nothing()
+    elif len(base_tokens) == 2 and base_tokens[0] == Keyword('waitUntil'):
+        condition = interpreter.execute_token(base_tokens[1])[1]
+        while interpreter.execute_code(condition).value is not True:
+            yield 0
+        outcome = Nothing()
+    else:
+        tokens, values = interpreter.execute_tokens(base_tokens)
+        case_found = interpreter.find_expression(values)
+        scheduled = _scheduled_action(case_found)
+        if scheduled is None:
+            return interpreter.value(interpreter.execute_values(inner, base_tokens, tokens, values, case_found))
+        outcome = yield from scheduled(interpreter, values)
+
+    if statement.ending:
+        outcome = Nothing()
+    return outcome
+
+
+def _if_then_else(interpreter, condition, then, else_=None):
+    if condition:
+        return (yield from _execute_code(interpreter, then))
+    elif else_ is not None:
+        return (yield from _execute_code(interpreter, else_))
+    return Nothing()
+
+
+def _if_then(interpreter, values):
+    if isinstance(values[2], Code):
+        then, else_ = values[2], None
+    else:
+        then, else_ = values[2].then, values[2].else_
+    return (yield from _if_then_else(interpreter, values[0].condition.value, then, else_))
+
+
+def _if_then_spec(interpreter, values):
+    array = values[2].value
+    return (yield from _if_then_else(interpreter, values[0].condition.value, array[0], array[1]))
+
+
+def _while_loop(interpreter, values):
+    outcome = Nothing()
+    while interpreter.execute_code(values[0].condition).value is not False:
+        outcome = yield from _execute_code(interpreter, values[2])
+    return outcome
+
+
+def _forvar_loop(interpreter, values):
+    for_instance = values[0]
+    outcome = Nothing()
+    for i in range(for_instance.from_.value, for_instance.to.value + 1, for_instance.step.value):
+        outcome = yield from _execute_code(interpreter, values[2],
+                                           extra_scope={for_instance.variable.value: Number(i)})
+    return outcome
+
+
+def _forspecs_loop(interpreter, values):
+    start_code, stop_code, increment_code = values[0].array
+    outcome = Nothing()
+    interpreter.execute_code(start_code)
+    while interpreter.execute_code(stop_code).value is not False:
+        outcome = yield from _execute_code(interpreter, values[2])
+        interpreter.execute_code(increment_code)
+    return outcome
+
+
+def _foreach_loop(interpreter, values):
+    outcome = Nothing()
+    for i, x in enumerate(values[2].value):
+        outcome = yield from _execute_code(interpreter, values[0], extra_scope={'_x': x, '_forEachIndex': Number(i)})
+    return outcome
+
+
+def _call(interpreter, values):
+    if len(values) == 2:
+        return (yield from _execute_code(interpreter, values[1]))
+    return (yield from _execute_code(interpreter, values[2], extra_scope={'_this': values[0]}))
+
+
+_SCHEDULED_ACTIONS = (
+    (IfThenElseExpression, _if_then),
+    (IfThenExpression, _if_then),
+    (IfThenSpecExpression, _if_then_spec),
+    (WhileDoExpression, _while_loop),
+    (ForFromToDoExpression, _forvar_loop),
+    (ForSpecDoExpression, _forspecs_loop),
+    (ForEachExpression, _foreach_loop),
+)
+
+
+def _scheduled_action(expression):
+    """
+    Returns the scheduled equivalent of the action of an expression that executes code, or None.
+    """
+    if expression is None:
+        return None
+    for expression_class, action in _SCHEDULED_ACTIONS:
+        if isinstance(expression, expression_class):
+            return action
+    if expression.keyword == Keyword('call'):
+        return _call
+    return None
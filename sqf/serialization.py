@@ -0,0 +1,452 @@
+"""
+A compact binary format for the trees returned by `sqf.parser.parse`, so they can be cached on disk
+or sent to other processes without parsing the code again.
+
+The format is a header, a table of strings (identifiers, literals, comments) and the nodes of the
+tree in pre-order. Every node is a tag with its kind, its position and its content; integers are
+varints (7 bits per byte) and strings are indexes on the table. Positions are deltas: a node that
+starts where the previous token ended (almost every node) only has a flag on its tag, and the
+others store their column and their line relative to that position. Runs of whitespace and end of lines
+are a single record with their text. Nodes referenced more than once in the tree (e.g. by the
+results of the preprocessor) are stored once and referenced by their index afterwards.
+
+On the code generated by `benchmarks/serialization.py` (100 to 1000 lines), the data is about 1.8
+times the size of the code and `loads` is 2 to 3 times faster than `parse`.
+
+Usage:
+    data = dumps(parse(code))
+    tree = loads(data)  # equal to `parse(code)`, including positions
+"""
+import struct
+
+from sqf.types import Statement, Code, File, Array, Number, Boolean, String, Variable, Keyword, \
+    Namespace, Preprocessor, Nothing
+from sqf.parser_types import Comment, Space, Tab, EndOfLine, BrokenEndOfLine, EndOfFile, ParserKeyword
+from sqf.interpreter_types import DefineStatement, DefineResult, IfDefStatement, IfDefResult
+
+
+MAGIC = b'SQFT'
+VERSION = 2
+
+# the kinds of nodes
+_REFERENCE = 0
+_SPACE = 1
+_TAB = 2
+_END_OF_LINE = 3
+_BROKEN_END_OF_LINE = 4
+_END_OF_FILE = 5
+_PARSER_KEYWORD = 6
+_COMMENT = 7
+_STRING = 8
+_INTEGER = 9
+_FLOAT = 10
+_TRUE = 11
+_FALSE = 12
+_VARIABLE = 13
+_KEYWORD = 14
+_NAMESPACE = 15
+_PREPROCESSOR = 16
+_NOTHING = 17
+_STATEMENT = 18
+_CODE = 19
+_FILE = 20
+_ARRAY = 21
+_DEFINE_STATEMENT = 22
+_DEFINE_RESULT = 23
+_IFDEF_STATEMENT = 24
+_IFDEF_RESULT = 25
+_WHITESPACE = 26
+# set on the tag of nodes that start where the previous token ended, which have no position afterwards
+_AT_END = 0x80
+
+_EMPTY_TAGS = {Space: _SPACE, Tab: _TAB, BrokenEndOfLine: _BROKEN_END_OF_LINE, EndOfFile: _END_OF_FILE,
+               Nothing: _NOTHING}
+_STRING_TAGS = {ParserKeyword: _PARSER_KEYWORD, Comment: _COMMENT, String: _STRING, Variable: _VARIABLE,
+                Keyword: _KEYWORD, Namespace: _NAMESPACE, Preprocessor: _PREPROCESSOR}
+_STATEMENT_TAGS = {Statement: _STATEMENT, Code: _CODE, File: _FILE, DefineStatement: _DEFINE_STATEMENT,
+                   DefineResult: _DEFINE_RESULT, IfDefStatement: _IFDEF_STATEMENT, IfDefResult: _IFDEF_RESULT}
+_ENDINGS = (None, ';', ',')
+_WHITESPACE_TYPES = (Space, Tab, EndOfLine, BrokenEndOfLine)
+
+_DOUBLE = struct.Struct('<d')
+
+
+def _advance(line, column, text):
+    # the position after `text`, when it starts at (line, column)
+    newlines = text.count('\n')
+    if newlines:
+        return line + newlines, len(text) - text.rfind('\n')
+    return line, column + len(text)
+
+
+def _whitespace_run(nodes, start):
+    # the end of the run of whitespace of `nodes` that starts at `start`, whose positions follow each other
+    node = nodes[start]
+    if type(node) not in _WHITESPACE_TYPES or node._position is None:
+        return start
+    position = node._position
+    end = start + 1
+    while end < len(nodes) and type(nodes[end]) in _WHITESPACE_TYPES and \
+            nodes[end]._position == _advance(position[0], position[1], str(node)):
+        node = nodes[end]
+        position = node._position
+        end += 1
+    return end
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+class _Writer:
+    def __init__(self):
+        self.out = bytearray()
+        self.strings = {}  # string -> index
+        self.nodes = {}  # id of a node -> index
+        # the position where the previous token ended
+        self.line = 1
+        self.column = 1
+
+    def string(self, string):
+        index = self.strings.get(string)
+        if index is None:
+            index = self.strings[string] = len(self.strings)
+        _write_varint(self.out, index)
+
+    def head(self, tag, node):
+        # the tag and the position of a node: nothing when it starts where the previous token ended,
+        # 0 when it has no position, or its column and the zigzag difference of lines to that end
+        position = node._position
+        if position == (self.line, self.column):
+            self.out.append(tag | _AT_END)
+            return
+        self.out.append(tag)
+        if position is None:
+            self.out.append(0)
+            return
+        _write_varint(self.out, position[1])
+        delta = position[0] - self.line
+        _write_varint(self.out, delta << 1 if delta >= 0 else (-delta << 1) - 1)
+        self.line, self.column = position
+
+    def token(self, tag, node, text):
+        # the head of a node without tokens, which ends after `text`
+        self.head(tag, node)
+        if node._position is not None:
+            self.line, self.column = _advance(self.line, self.column, text)
+
+    def records(self, nodes):
+        # the nodes, where runs of whitespace are replaced by lists of their nodes
+        records = []
+        i = 0
+        while i < len(nodes):
+            end = _whitespace_run(nodes, i)
+            if end - i > 1 and all(id(node) not in self.nodes for node in nodes[i:end]):
+                records.append(nodes[i:end])
+                i = end
+            else:
+                records.append(nodes[i])
+                i += 1
+        return records
+
+    def write_records(self, records):
+        for record in records:
+            if type(record) == list:
+                self.whitespace(record)
+            else:
+                self.node(record)
+
+    def nodes_list(self, nodes):
+        records = self.records(nodes)
+        _write_varint(self.out, len(records))
+        self.write_records(records)
+
+    def whitespace(self, nodes):
+        text = ''.join(str(node) for node in nodes)
+        self.token(_WHITESPACE, nodes[0], text)
+        self.string(text)
+        for node in nodes:
+            self.nodes[id(node)] = len(self.nodes)
+
+    def node(self, node):
+        out = self.out
+        index = self.nodes.get(id(node))
+        if index is not None:
+            out.append(_REFERENCE)
+            _write_varint(out, index)
+            return
+
+        node_type = type(node)
+        if node_type in _EMPTY_TAGS:
+            self.token(_EMPTY_TAGS[node_type], node, str(node))
+        elif node_type in _STRING_TAGS:
+            self.token(_STRING_TAGS[node_type], node, str(node))
+            self.string(str(node))
+        elif node_type == EndOfLine:
+            self.token(_END_OF_LINE, node, node.value)
+            out.append(node.value == '\r\n')
+        elif node_type == Number:
+            if isinstance(node.value, int):
+                self.token(_INTEGER, node, str(node))
+                _write_varint(out, node.value << 1 if node.value >= 0 else (-node.value << 1) - 1)
+            else:
+                self.token(_FLOAT, node, str(node))
+                out += _DOUBLE.pack(node.value)
+        elif node_type == Boolean:
+            self.token(_TRUE if node.value else _FALSE, node, str(node))
+        elif node_type == Array:
+            self.head(_ARRAY, node)
+            self.nodes_list(node._tokens)
+        elif node_type in _STATEMENT_TAGS:
+            self.head(_STATEMENT_TAGS[node_type], node)
+            # the flags and, when it is small, the number of records of its tokens plus one
+            records = self.records(node._tokens)
+            flags = bool(node._parenthesis) | _ENDINGS.index(node._ending) << 1
+            if len(records) + 1 < 32:
+                out.append(flags | (len(records) + 1) << 3)
+            else:
+                out.append(flags)
+                _write_varint(out, len(records))
+            self.write_records(records)
+            if node_type == DefineStatement:
+                self.string(node.variable_name)
+                self.nodes_list(node.expression)
+                _write_varint(out, len(node.args))
+                for arg in node.args:
+                    self.string(arg)
+            elif node_type == DefineResult:
+                self.node(node.define_statement)
+                self.node(node.result)
+            elif node_type == IfDefResult:
+                self.node(node.ifdef_statement)
+                self.nodes_list(node.result)
+        else:
+            raise TypeError('Nodes of type "%s" cannot be serialized' % node_type.__name__)
+
+        self.nodes[id(node)] = len(self.nodes)
+
+
+def dumps(tree):
+    """
+    Returns the binary representation of a tree returned by `sqf.parser.parse`.
+    """
+    writer = _Writer()
+    writer.node(tree)
+
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    _write_varint(out, len(writer.strings))
+    for string in writer.strings:  # in order of insertion, i.e. of index
+        encoded = string.encode('utf-8')
+        _write_varint(out, len(encoded))
+        out += encoded
+    out += writer.out
+    return bytes(out)
+
+
+def dump(tree, file):
+    file.write(dumps(tree))
+
+
+class _Reader:
+    def __init__(self, data):
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError('The data is not a serialized SQF tree')
+        if data[len(MAGIC)] != VERSION:
+            raise ValueError('Unsupported version %d of serialized SQF trees' % data[len(MAGIC)])
+        self.data = data
+        self.i = len(MAGIC) + 1
+        self.nodes = []
+        self.line = 1
+        self.column = 1
+        self.runs = {}  # index of the text of a run of whitespace -> its classes and values
+
+        self.strings = []
+        for _ in range(self.varint()):
+            size = self.varint()
+            self.strings.append(data[self.i:self.i + size].decode('utf-8'))
+            self.i += size
+
+    def varint(self):
+        data = self.data
+        byte = data[self.i]
+        self.i += 1
+        if byte < 0x80:
+            return byte
+        result = byte & 0x7f
+        shift = 7
+        while True:
+            byte = data[self.i]
+            self.i += 1
+            result |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def zigzag(self):
+        value = self.varint()
+        return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+    def position(self):
+        column = self.varint()
+        if column == 0:
+            return None
+        self.line += self.zigzag()
+        self.column = column
+        return self.line, column
+
+    def advance(self, text):
+        if '\n' in text:
+            self.line, self.column = _advance(self.line, self.column, text)
+        else:
+            self.column += len(text)
+
+    def string(self):
+        return self.strings[self.varint()]
+
+    def nodes_list(self, count=None):
+        if count is None:
+            count = self.varint()
+        nodes = []
+        for _ in range(count):
+            if self.data[self.i] & ~_AT_END == _WHITESPACE:
+                self.whitespace(nodes)
+            else:
+                nodes.append(self.node())
+        return nodes
+
+    def whitespace(self, nodes):
+        tag = self.data[self.i]
+        self.i += 1
+        if not tag & _AT_END:
+            self.position()
+        index = self.varint()
+        run = self.runs.get(index)
+        if run is None:
+            run = self.runs[index] = _whitespace_classes(self.strings[index])
+        for node_class, value in run:
+            node = node_class(value) if value is not None else node_class()
+            node._position = (self.line, self.column)
+            self.advance(value or str(node))
+            nodes.append(node)
+            self.nodes.append(node)
+
+    def statement(self, node_class, position):
+        node = node_class.__new__(node_class)
+        node._position = position
+        flags = self.data[self.i]
+        self.i += 1
+        count = flags >> 3
+        node._tokens = self.nodes_list(count - 1 if count else None)
+        node._parenthesis = _PARENTHESIS.get(node_class) if flags & 1 else None
+        node._ending = _ENDINGS[flags >> 1 & 3]
+        return node
+
+    def node(self):
+        data = self.data
+        tag = data[self.i]
+        self.i += 1
+        if tag == _REFERENCE:
+            return self.nodes[self.varint()]
+
+        if tag & _AT_END:
+            tag &= ~_AT_END
+            position = (self.line, self.column)
+        else:
+            position = self.position()
+        if tag in _STRING_CLASSES:
+            string = self.string()
+            node = _STRING_CLASSES[tag](string)
+            if position is not None:
+                self.advance(string)
+        elif tag in _EMPTY_CLASSES:
+            node = _EMPTY_CLASSES[tag]()
+            if position is not None:
+                self.advance(_EMPTY_TEXTS[tag])
+        elif tag == _END_OF_LINE:
+            node = EndOfLine('\r\n' if data[self.i] else '\n')
+            self.i += 1
+            if position is not None:
+                self.advance(node.value)
+        elif tag == _INTEGER or tag == _FLOAT or tag == _TRUE or tag == _FALSE:
+            if tag == _INTEGER:
+                node = Number(self.zigzag())
+            elif tag == _FLOAT:
+                node = Number(_DOUBLE.unpack_from(data, self.i)[0])
+                self.i += _DOUBLE.size
+            else:
+                node = Boolean(tag == _TRUE)
+            if position is not None:
+                self.advance(str(node))
+        elif tag == _ARRAY:
+            node = Array.__new__(Array)
+            node._tokens = self.nodes_list()
+            node._values = node._tokens[1:-1:2]
+        elif tag == _STATEMENT:
+            node = self.statement(Statement, position)
+        elif tag == _CODE or tag == _FILE:
+            node = self.statement(Code if tag == _CODE else File, position)
+            node._undefined = False
+        elif tag == _DEFINE_STATEMENT:
+            node = self.statement(DefineStatement, position)
+            node.variable_name = self.string()
+            node.expression = self.nodes_list()
+            node.args = [self.string() for _ in range(self.varint())]
+        elif tag == _DEFINE_RESULT:
+            node = self.statement(DefineResult, position)
+            node.define_statement = self.node()
+            node.result = self.node()
+        elif tag == _IFDEF_STATEMENT:
+            node = self.statement(IfDefStatement, position)
+            node.statement_class = Statement
+        elif tag == _IFDEF_RESULT:
+            node = self.statement(IfDefResult, position)
+            node.ifdef_statement = self.node()
+            node.result = self.nodes_list()
+        else:
+            raise ValueError('Invalid node kind %d' % tag)
+        node._position = position
+
+        self.nodes.append(node)
+        return node
+
+
+_STRING_CLASSES = {tag: node_class for node_class, tag in _STRING_TAGS.items()}
+_EMPTY_CLASSES = {tag: node_class for node_class, tag in _EMPTY_TAGS.items()}
+_EMPTY_TEXTS = {tag: str(node_class()) for tag, node_class in _EMPTY_CLASSES.items()}
+
+
+def _whitespace_classes(text):
+    # the class and the value (None for classes without value) of each token of a run of whitespace
+    run = []
+    i = 0
+    while i < len(text):
+        if text[i] == ' ':
+            run.append((Space, None))
+        elif text[i] == '\t':
+            run.append((Tab, None))
+        elif text[i] == '\\':
+            run.append((BrokenEndOfLine, None))
+            i += 1
+        elif text[i] == '\r':
+            run.append((EndOfLine, '\r\n'))
+            i += 1
+        else:
+            run.append((EndOfLine, '\n'))
+        i += 1
+    return run
+_PARENTHESIS = {Statement: '()', Code: '{}'}
+
+
+def loads(data):
+    """
+    Returns the tree serialized by `dumps`.
+    """
+    return _Reader(data).node()
+
+
+def load(file):
+    return loads(file.read())
@@ -0,0 +1,257 @@
+"""
+Runs SQF unit tests on the interpreter.
+
+A test file is a `.sqf` file whose name starts with `test_`. It is executed once, and every global
+variable it defines whose name starts with `test` (case-insensitive) and whose value is code is a test.
+Each test is called on a fork of the interpreter that executed the file, so tests are independent,
+and fails when any of its `assert` is false. The tests are run in parallel by a pool of processes.
+
+Usage:
+    python -m sqf.testrunner tests_directory -j 8 --json report.json
+"""
+import argparse
+import fnmatch
+import json
+import os
+import sys
+import time
+
+from sqf.exceptions import SQFParserError
+from sqf.interpreter import interpret
+from sqf.namespace import normalize
+from sqf.parser import parse
+from sqf.pool import Pool
+from sqf.types import Code, Variable
+
+
+def discover(directory, pattern='test_*.sqf'):
+    """
+    Returns the sorted paths of the test files within `directory` (recursively).
+    """
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        for file in files:
+            if fnmatch.fnmatch(file.lower(), pattern):
+                paths.append(os.path.join(root, file))
+    return sorted(paths)
+
+
+def _error(result, exception):
+    result['status'] = 'error'
+    if isinstance(exception, SQFParserError):
+        result['line'] = exception.position[0]
+        result['message'] = exception.message
+    else:
+        # e.g. functionality not implemented by the interpreter
+        result['line'] = None
+        result['message'] = '%s: %s' % (exception.__class__.__name__, exception)
+
+
+def _execute_file(path):
+    """
+    Executes a test file, returning the interpreter that executed it and its tests, a dictionary
+    {name as declared: code}, or raising the exception of the file.
+    """
+    with open(path) as f:
+        script = f.read()
+
+    # the names in the namespace are case-insensitive: the tests are named as declared in the file
+    declared = {}
+    for token in parse(script).get_all_tokens():
+        if isinstance(token, Variable):
+            declared.setdefault(normalize(token.name), token.name)
+
+    interpreter = interpret(script)[0]
+    tests = {}
+    for name, value in interpreter.namespace('missionnamespace').base_scope.values.items():
+        if name.startswith('test') and isinstance(value, Code):
+            tests[declared.get(name, name)] = value
+    return interpreter, tests
+
+
+def _file_error(path, exception, start, name=None):
+    result = {'file': path, 'test': name, 'assertions': 0, 'failures': [],
+              'time': time.perf_counter() - start}
+    _error(result, exception)
+    return result
+
+
+def _run_test(path, name, interpreter, code):
+    result = {'file': path, 'test': name, 'status': 'passed'}
+
+    start = time.perf_counter()
+    test_interpreter = interpreter.fork()
+    test_interpreter.assertions = []
+    try:
+        test_interpreter.execute_code(code)
+    except Exception as e:
+        _error(result, e)
+    result['time'] = time.perf_counter() - start
+
+    result['assertions'] = len(test_interpreter.assertions)
+    result['failures'] = [position[0] for position, passed in test_interpreter.assertions if not passed]
+    if result['failures'] and result['status'] == 'passed':
+        result['status'] = 'failed'
+    return result
+
+
+def run_file(path):
+    """
+    Runs the tests of a test file, returning a list with the result of each test. Each result is a
+    dictionary with the `file`, the `test` (None when the file itself fails), the `status`
+    ("passed", "failed" or "error"), the number of `assertions`, the `failures` (lines of the
+    failed assertions), the `time` (in seconds) and, on errors, the `line` and `message`.
+    """
+    start = time.perf_counter()
+    try:
+        interpreter, tests = _execute_file(path)
+    except Exception as e:
+        return [_file_error(path, e, start)]
+    return [_run_test(path, name, interpreter, code) for name, code in tests.items()]
+
+
+# the (path, interpreter, tests) of the last file executed by this process, since the tests
+# of a file are run in chunks by the same process
+_last_file = None
+
+
+def _load(path):
+    global _last_file
+    if _last_file is None or _last_file[0] != path:
+        _last_file = None
+        _last_file = (path,) + _execute_file(path)
+    return _last_file[1:]
+
+
+def collect(path):
+    """
+    Executes a test file, returning the names of its tests and None, or an empty list and the result
+    of the file (see `run_file`) when it fails.
+    """
+    start = time.perf_counter()
+    try:
+        return list(_load(path)[1]), None
+    except Exception as e:
+        return [], _file_error(path, e, start)
+
+
+def run_test(path_and_name):
+    """
+    Runs the test `name` of the test file `path`, returning its result (see `run_file`).
+    """
+    path, name = path_and_name
+    interpreter, tests = _load(path)
+    return _run_test(path, name, interpreter, tests[name])
+
+
+def run_tests(tests):
+    """
+    Runs a list of tests (path, name), returning a list with their results (see `run_test`).
+    """
+    return [run_test(test) for test in tests]
+
+
+def _chunk_results(pool, chunks):
+    # the results of the tests of `chunks`, in order; the tests of a chunk whose process failed get its error
+    for chunk, results, error in pool.imap(run_tests, chunks):
+        if error is not None:
+            start = time.perf_counter()
+            results = [_file_error(path, error, start, name) for path, name in chunk]
+        yield from results
+
+
+def run(paths, workers=None, chunksize=None):
+    """
+    Runs the test files in `paths` on `workers` processes (by default one per CPU), yielding
+    the results of each file (see `run_file`) in the order of `paths`, as they complete.
+
+    The files are first executed to collect their tests, and the tests are then distributed to
+    the processes in chunks of `chunksize` tests (by default about 4 chunks per process).
+    A test (or a file) whose process exits gets an error, and the other tests continue.
+    """
+    if workers == 1:
+        for path in paths:
+            yield run_file(path)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with Pool(workers) as pool:
+        start = time.perf_counter()
+        collected = [names_and_error if error is None else ([], _file_error(path, error, start))
+                     for path, names_and_error, error in pool.imap(collect, paths)]
+        tests = [(path, name) for path, (names, error) in zip(paths, collected) for name in names]
+        if chunksize is None:
+            chunksize = max(1, len(tests) // (4 * workers))
+
+        results = _chunk_results(pool, [tests[i:i + chunksize] for i in range(0, len(tests), chunksize)])
+        for path, (names, error) in zip(paths, collected):
+            if error is not None:
+                yield [error]
+            else:
+                yield [next(results) for _ in names]
+
+
+def summarize(results, elapsed):
+    summary = {'tests': len(results), 'passed': 0, 'failed': 0, 'error': 0, 'time': elapsed}
+    for result in results:
+        summary[result['status']] += 1
+    return summary
+
+
+def write_result(result, writer):
+    name = result['file']
+    if result['test'] is not None:
+        name += '::' + result['test']
+    writer.write('%s %s\n' % (name, result['status'].upper() if result['status'] != 'passed' else 'ok'))
+    if result['status'] == 'failed':
+        writer.write('\tassertions failed at lines %s\n' % ', '.join(str(line) for line in result['failures']))
+    elif result['status'] == 'error' and result['line'] is None:
+        writer.write('\t%s\n' % result['message'])
+    elif result['status'] == 'error':
+        writer.write('\t[%d]:%s\n' % (result['line'], result['message']))
+
+
+def write_summary(summary, writer):
+    writer.write('Ran %d tests in %.3fs: %d passed, %d failed, %d errors\n' % (
+        summary['tests'], summary['time'], summary['passed'], summary['failed'], summary['error']))
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description="Runner of SQF unit tests")
+    parser.add_argument('directory', help='The directory to recursively discover test files on')
+    parser.add_argument('-p', '--pattern', default='test_*.sqf',
+                        help='The pattern of the names of test files (default test_*.sqf)')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='The number of processes to run the tests on (default one per CPU)')
+    parser.add_argument('--json', nargs='?', type=argparse.FileType('w'), default=None,
+                        help='File path to write the summary and the result of each test as JSON')
+    return parser.parse_args(args)
+
+
+def main(args, writer=sys.stdout):
+    """
+    Runs the tests and returns the exit code: 0 if all tests passed, 1 otherwise.
+    """
+    args = parse_args(args)
+
+    start = time.perf_counter()
+    results = []
+    for file_results in run(discover(args.directory, args.pattern), args.workers):
+        for result in file_results:
+            write_result(result, writer)
+        results += file_results
+    summary = summarize(results, time.perf_counter() - start)
+    write_summary(summary, writer)
+
+    if args.json is not None:
+        json.dump({'summary': summary, 'tests': results}, args.json, indent=2)
+        args.json.close()
+    return int(summary['passed'] != summary['tests'])
+
+
+def _main():
+    sys.exit(main(sys.argv[1:]))
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,60 @@
+import time
+
+
+class Timer:
+    """
+    Accumulates the wall time spent on named phases (e.g. "tokenize", "analysis").
+
+    Phases can be nested: the time of a phase excludes the time of the phases started
+    within it, so the times of all phases add up to the total time.
+    """
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self.times = {}
+        self._stack = []  # stack of [name, start, time of children]
+
+    def start(self, name):
+        self._stack.append([name, self._clock(), 0.])
+
+    def stop(self):
+        name, start, children = self._stack.pop()
+        elapsed = self._clock() - start
+        if self._stack:
+            self._stack[-1][2] += elapsed
+        self.times[name] = self.times.get(name, 0.) + elapsed - children
+
+    @property
+    def total(self):
+        return sum(self.times.values())
+
+
+class _Phase:
+    def __init__(self, timer, name):
+        self._timer = timer
+        self._name = name
+
+    def __enter__(self):
+        self._timer.start(self._name)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._timer.stop()
+
+
+class _NoPhase:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+_NO_PHASE = _NoPhase()
+
+
+def phase(timer, name):
+    """
+    A context manager that times the phase `name` on `timer`, or does nothing when `timer` is None.
+    """
+    if timer is None:
+        return _NO_PHASE
+    return _Phase(timer, name)
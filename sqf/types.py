@@ -137,6 +137,12 @@ class Variable(Type):
 
 
 class _Statement(BaseTypeContainer):
+    # `base_tokens` and `content` are computed on first use and cached as tuples,
+    # since interpreters evaluate the same statements many times. Methods that modify the tokens reset them.
+    _base_tokens = None
+    _content = None
+    _uncompared = BaseTypeContainer._uncompared | {'_base_tokens', '_content'}
+
     def __init__(self, tokens, parenthesis=None, ending=None):
         assert (ending in (None, ',', ';'))
         assert (parenthesis in (None, '()', '[]', '{}'))
@@ -158,15 +164,32 @@ class _Statement(BaseTypeContainer):
         for i, s in enumerate(tokens):
             assert (isinstance(s, (Type, Keyword, Preprocessor, Statement, ParserType)))
         self._tokens = tokens + self._tokens
+        self.reset_views()
+
+    def reset_views(self):
+        """
+        Resets the cached `base_tokens` and `content`. Must be called after modifying the tokens.
+        """
+        # the class attributes (None) are used until they are computed again
+        self.__dict__.pop('_base_tokens', None)
+        self.__dict__.pop('_content', None)
+
+    @property
+    def base_tokens(self):
+        if self._base_tokens is None:
+            self._base_tokens = tuple(token for token in self._tokens if self.is_base_token(token))
+        return self._base_tokens
 
     @property
     def content(self):
-        tokens = self.tokens.copy()
-        if self.ending:
-            del tokens[-1]
-        if self.parenthesis:
-            return tokens[1:-1]
-        return tokens
+        if self._content is None:
+            tokens = self._tokens
+            if self.ending:
+                tokens = tokens[:-1]
+            if self.parenthesis:
+                tokens = tokens[1:-1]
+            self._content = tuple(tokens)
+        return self._content
 
     @staticmethod
     def is_base_token(token):
@@ -186,6 +209,7 @@ class _Statement(BaseTypeContainer):
         if ending is not None:
             self._tokens.append(ParserKeyword(ending))
         self._ending = ending
+        self.reset_views()
 
     def __len__(self):
         return len(self._tokens)
@@ -217,8 +241,8 @@ class Array(Type, BaseTypeContainer):
         self._tokens = [ParserKeyword('[')] + list(self._with_commas()) + [ParserKeyword(']')]
 
     def _with_commas(self):
-        if self._values is None:
-            return []
+        if not self._values:
+            return
         it = iter(self._values)
         yield next(it)
         for x in it:
@@ -234,6 +258,12 @@ class Array(Type, BaseTypeContainer):
             return '[undefined]'
         return ''.join(func(item) for item in self._tokens)
 
+    @property
+    def string_tokens(self):
+        if self.is_undefined:
+            return [ParserKeyword('[undefined]')]
+        return self._tokens
+
     def __len__(self):
         assert(not self.is_undefined)
         return len(self._values)
@@ -291,6 +321,26 @@ class Array(Type, BaseTypeContainer):
         self.update_tokens()
 
 
+def fork_value(value, memo):
+    """
+    Returns a copy of `value` that can be modified without modifying `value`. Arrays are the only
+    values modified in place, so they are copied (recursively) and every other value is shared.
+    `memo` maps the id of the arrays already copied to their copy, so arrays referenced
+    more than once (or by themselves) are copied once.
+    """
+    if not isinstance(value, Array) or value.is_undefined:
+        return value
+    try:
+        return memo[id(value)]
+    except KeyError:
+        pass
+    copy = memo[id(value)] = Array.__new__(Array)
+    copy.__dict__.update(value.__dict__)
+    copy._values = [fork_value(item, memo) for item in value._values]
+    copy.update_tokens()
+    return copy
+
+
 class Statement(_Statement, BaseType):
     """
     The main class for holding statements. It is a BaseType because it can be nested, and
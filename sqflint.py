@@ -1,10 +1,26 @@
 import sys
 import os
 import argparse
+import collections
+import contextlib
+import functools
+import json
+import mmap
+import subprocess
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
 
 from sqf.parser import parse
 import sqf.analyzer
 from sqf.exceptions import SQFParserError
+from sqf.timing import Timer, phase
+from sqf.memory import MemoryTracker
+from sqf.includes import IncludeGraph, normalize_path
+from sqf.pool import Pool, describe
 
 
 class Writer:
@@ -15,39 +31,416 @@ class Writer:
         self.strings.append(message)
 
 
-def analyze(code, writer=sys.stdout):
+def write_exception(exception, writer, output_format='text', file=None):
+    """
+    Writes an exception as `[line,column]:message` (text) or as a JSON record (jsonl).
+    """
+    line, column = exception.position[0], exception.position[1] - 1
+    if output_format == 'jsonl':
+        writer.write(json.dumps({
+            'file': file,
+            'line': line,
+            'column': column,
+            'severity': exception.severity,
+            'message': exception.message[len(exception.severity) + 1:],
+        }) + '\n')
+    else:
+        writer.write('[%d,%d]:%s\n' % (line, column, exception.message))
+
+
+def analyze(code, writer=sys.stdout, timer=None, output_format='text', file=None):
     try:
-        result = parse(code)
+        result = parse(code, timer)
     except SQFParserError as e:
-        writer.write('[%d,%d]:%s\n' % (e.position[0], e.position[1] - 1, e.message))
+        write_exception(e, writer, output_format, file)
         return
 
-    exceptions = sqf.analyzer.analyze(result).exceptions
+    analyzer = sqf.analyzer.Analyzer()
+    analyzer.timer = timer
+    with phase(timer, 'analysis'):
+        exceptions = sqf.analyzer.analyze(result, analyzer).exceptions
     for e in exceptions:
-        writer.write('[%d,%d]:%s\n' % (e.position[0], e.position[1] - 1, e.message))
+        write_exception(e, writer, output_format, file)
 
 
-def analyze_dir(directory, writer):
+def analyze_tracked(code, writer, name, stats=None, memory=None, output_format='text'):
     """
-    Analyzes a directory recursively
+    Analyzes `code` and stores, under `name`, the time (in `stats`) or the memory (in `memory`)
+    of each phase, when the respective dictionary is given.
+    """
+    if memory is not None:
+        with MemoryTracker() as tracker:
+            analyze(code, writer, tracker, output_format, name)
+        memory[name] = {'peak': tracker.peak, 'phases': tracker.phases}
+    elif stats is not None:
+        timer = Timer()
+        analyze(code, writer, timer, output_format, name)
+        stats[name] = timer.times
+    else:
+        analyze(code, writer, output_format=output_format, file=name)
+
+
+@contextlib.contextmanager
+def read_file(path, use_mmap=False):
+    """
+    Yields the code of a file: its contents or, when `use_mmap`, a read-only memory map of it,
+    which the parser decodes incrementally (for very large files).
+    """
+    if not use_mmap:
+        with open(path) as f:
+            yield f.read()
+        return
+
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:  # empty files cannot be mapped
+            yield ''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def sqf_files(directory):
+    """
+    Yields the path and the name (relative to `directory`) of the sqf files of a directory, recursively.
     """
     for root, dirs, files in os.walk(directory):
         for file in files:
             if file.endswith(".sqf"):
                 file_path = os.path.join(root, file)
+                yield file_path, os.path.relpath(file_path, directory)
+
+
+def write_file_result(name, strings, writer, output_format='text'):
+    """
+    Writes the diagnostics of a file, under its name (text) or as they are (jsonl, flushed).
+    """
+    if output_format == 'jsonl':
+        for string in strings:
+            writer.write(string)
+        writer.flush()
+    elif strings:
+        writer.write(name + '\n')
+        for string in strings:
+            writer.write('\t%s' % string)
+
+
+def changed_files(directory, revision):
+    """
+    Returns the paths of the files of `directory` that differ from `revision` of its git repository:
+    modified, added, deleted and untracked (not ignored) files.
+    """
+    def git(*arguments):
+        output = subprocess.run(('git', '-C', directory) + arguments, check=True, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, universal_newlines=True).stdout
+        return [name for name in output.split('\0') if name]
 
-                writer_helper = Writer()
+    names = git('diff', '--name-only', '--relative', '-z', revision, '--') + \
+        git('ls-files', '--others', '--exclude-standard', '-z')
+    return set(os.path.join(directory, name) for name in names)
 
-                with open(file_path) as f:
-                    analyze(f.read(), writer_helper)
 
-                if writer_helper.strings:
-                    writer.write(os.path.relpath(file_path, directory) + '\n')
-                    for string in writer_helper.strings:
-                        writer.write('\t%s' % string)
+def changed_sqf_files(directory, revision):
+    """
+    Returns the (normalized) paths of the sqf files of `directory` that changed since `revision`
+    or that include a changed file, directly or through other headers.
+    """
+    changed = changed_files(directory, revision)
+    graph = IncludeGraph(directory)
+    for file_path, _ in sqf_files(directory):
+        graph.scan(file_path)
+    result = set(normalize_path(path) for path in changed if path.endswith('.sqf') and os.path.isfile(path))
+    return result | set(path for path in graph.dependents(changed) if path.endswith('.sqf'))
+
+
+def analyze_dir(directory, writer, stats=None, memory=None, output_format='text', use_mmap=False, limits=None,
+                only=None, aborted=None):
+    """
+    Analyzes a directory recursively
+
+    stats: an optional dictionary where the time of each phase of each file is stored
+    memory: an optional dictionary where the memory of each phase of each file is stored
+    output_format: 'text' or 'jsonl'. In jsonl, the records of each file are written (and flushed)
+        as soon as the file is analyzed.
+    use_mmap: whether the files are memory-mapped instead of read (see `read_file`)
+    limits: optional `Limits`, to analyze each file in a worker process (see `analyze_files`)
+    only: an optional set of the paths (normalized by `normalize_path`) of the only files to analyze
+    aborted: an optional list where the names of the files whose analysis exceeded `limits` are stored
+    """
+    files = sqf_files(directory)
+    if only is not None:
+        files = [(file_path, name) for file_path, name in files if normalize_path(file_path) in only]
+
+    if limits is not None:
+        results = analyze_files(list(files), limits, stats, memory, output_format, use_mmap, aborted)
+        for name, strings in results:
+            write_file_result(name, strings, writer, output_format)
+        return writer
+
+    for file_path, name in files:
+        if output_format == 'jsonl':
+            with read_file(file_path, use_mmap) as code:
+                analyze_tracked(code, writer, name, stats, memory, output_format)
+            writer.flush()
+            continue
+
+        writer_helper = Writer()
+
+        with read_file(file_path, use_mmap) as code:
+            analyze_tracked(code, writer_helper, name, stats, memory)
+
+        write_file_result(name, writer_helper.strings, writer)
     return writer
 
 
+Limits = collections.namedtuple('Limits', ['timeout', 'memory', 'workers', 'files_per_worker'])
+Limits.__new__.__defaults__ = (None, None, 1, None)
+Limits.__doc__ = """
+The budgets of the analysis of each file by `analyze_files`:
+
+timeout: the wall time, in seconds, of each file (None for no limit)
+memory: the memory, in bytes, that the analysis of each file can allocate (None for no limit)
+workers: the number of worker processes
+files_per_worker: the number of files after which a worker is replaced by a new one (None for never)
+"""
+
+
+def can_limit_memory():
+    """
+    Whether the memory of a worker can be limited, which requires `resource` and `/proc` (Linux).
+    """
+    return resource is not None and os.path.exists('/proc/self/statm')
+
+
+def _limit_memory(limit):
+    """
+    Limits the address space of this process to its current size plus `limit` bytes (None to remove the limit).
+    """
+    hard = resource.getrlimit(resource.RLIMIT_AS)[1]
+    if limit is None:
+        resource.setrlimit(resource.RLIMIT_AS, (hard, hard))
+        return
+    with open('/proc/self/statm') as f:
+        size = int(f.read().split()[0]) * resource.getpagesize()
+    soft = size + limit
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+
+def _analyze_file(file, memory_limit, output_format, use_mmap, track_stats, track_memory):
+    """
+    Analyzes a file (path, name) on a process of `analyze_files`, returning its diagnostics,
+    its stats and its memory.
+    """
+    path, name = file
+    writer = Writer()
+    stats = {} if track_stats else None
+    memory = {} if track_memory else None
+    if memory_limit is not None:
+        _limit_memory(memory_limit)
+    try:
+        with read_file(path, use_mmap) as code:
+            analyze_tracked(code, writer, name, stats, memory, output_format)
+    finally:
+        if memory_limit is not None:
+            _limit_memory(None)
+    return writer.strings, (stats or {}).get(name), (memory or {}).get(name)
+
+
+def _aborted(name, reason, output_format):
+    writer = Writer()
+    write_exception(SQFParserError((1, 1), 'Analysis aborted: %s' % reason), writer, output_format, name)
+    return name, writer.strings
+
+
+def analyze_files(files, limits, stats=None, memory=None, output_format='text', use_mmap=False, aborted=None):
+    """
+    Yields the name and the diagnostics (as written by `write_exception`) of each file (path, name)
+    of `files`, in order, analyzing them on a `sqf.pool.Pool` of `limits.workers` processes.
+
+    A file that exceeds the time or the memory of `limits` (or crashes the analyzer) is not analyzed further
+    and gets a single "Analysis aborted" error instead. Its worker is replaced by a new one, like workers
+    that analyzed `limits.files_per_worker` files, so the memory of a worker does not grow indefinitely.
+    The names of the aborted files are appended to `aborted`, when given.
+    """
+    # the workers are not forked from this process (see `default_start_method`), so the memory it freed
+    # is not reused by them and counted in the memory limit
+    analyze_file = functools.partial(_analyze_file, memory_limit=limits.memory, output_format=output_format,
+                                     use_mmap=use_mmap, track_stats=stats is not None,
+                                     track_memory=memory is not None)
+    with Pool(limits.workers, limits.timeout, limits.files_per_worker) as pool:
+        for (path, name), result, error in pool.imap(analyze_file, files):
+            if error is None:
+                strings, file_stats, file_memory = result
+                if stats is not None:
+                    stats[name] = file_stats
+                if memory is not None:
+                    memory[name] = file_memory
+                yield name, strings
+                continue
+
+            if isinstance(error, MemoryError) and limits.memory is not None:
+                reason = 'exceeded the memory limit of %d MiB' % (limits.memory // 2**20)
+            else:
+                reason = describe(error)
+            if aborted is not None:
+                aborted.append(name)
+            yield _aborted(name, reason, output_format)
+
+
+def _stamp(path):
+    # the modification time and size of a file (None when it does not exist)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class Watcher:
+    """
+    Keeps the diagnostics of the sqf files of a directory. Each `poll` analyzes the files that were added
+    or modified since the previous one and the files that include a file that changed; the diagnostics of
+    the other files are kept.
+    """
+    def __init__(self, directory, output_format='text', use_mmap=False):
+        self.directory = directory
+        self.output_format = output_format
+        self.use_mmap = use_mmap
+        self.graph = IncludeGraph(directory)
+        # path: the stamp of each scanned file, sqf files and headers
+        self.stamps = {}
+        # path: (name, diagnostics) of each sqf file
+        self.results = {}
+
+    def _analyze(self, path, name):
+        writer = Writer()
+        with read_file(path, self.use_mmap) as code:
+            analyze(code, writer, output_format=self.output_format, file=name)
+        return writer.strings
+
+    def poll(self):
+        """
+        Returns a list with (name, old diagnostics, new diagnostics) of each file that was analyzed,
+        or removed, in order of names. The old diagnostics of added files and the new diagnostics
+        of removed files are None.
+        """
+        files = {normalize_path(file_path): name for file_path, name in sqf_files(self.directory)}
+
+        changed = set()
+        # the sqf files, the headers they include (or used to include) and the files that are removed
+        for path in set(files) | set(self.stamps) | set(self.graph.included_by):
+            stamp = _stamp(path)
+            if stamp != self.stamps.get(path):
+                changed.add(path)
+                self.stamps[path] = stamp
+
+        for path in changed:
+            if self.stamps[path] is None:
+                self.graph.remove(path)
+                del self.stamps[path]
+            else:
+                self.graph.scan(path)
+        # the includes of modified headers may have been scanned again, e.g. on new headers
+        for path in self.graph.includes:
+            if path not in self.stamps:
+                self.stamps[path] = _stamp(path)
+
+        analyzed = []
+        for path in (changed | self.graph.dependents(changed)) & (set(files) | set(self.results)):
+            if path in files:
+                old = self.results.get(path, (None, None))[1]
+                strings = self._analyze(path, files[path])
+                self.results[path] = (files[path], strings)
+                analyzed.append((files[path], old, strings))
+            else:
+                name, old = self.results.pop(path)
+                analyzed.append((name, old, None))
+        return sorted(analyzed, key=lambda result: result[0])
+
+
+def write_diff(name, old, new, writer, output_format='text'):
+    """
+    Writes the diagnostics of a file that are new (+) or that disappeared (-), when any.
+    In jsonl, the records get a "change" ("added" or "removed").
+    """
+    removed = collections.Counter(old or ())
+    removed.subtract(new or ())
+    added = collections.Counter(new or ())
+    added.subtract(old or ())
+
+    lines = []
+    for strings, counts, sign, change in ((old, removed, '-', 'removed'), (new, added, '+', 'added')):
+        for string in strings or ():
+            if counts[string] > 0:
+                counts[string] -= 1
+                if output_format == 'jsonl':
+                    record = json.loads(string)
+                    record['change'] = change
+                    lines.append(json.dumps(record) + '\n')
+                else:
+                    lines.append('%s%s' % (sign, string))
+    write_file_result(name, lines, writer, output_format)
+
+
+def watch(directory, writer, output_format='text', use_mmap=False, interval=1.):
+    """
+    Analyzes a directory and then, every `interval` seconds, the files that changed (see `Watcher`),
+    writing the changes of their diagnostics. Runs until interrupted.
+    """
+    watcher = Watcher(directory, output_format, use_mmap)
+    for name, _, strings in watcher.poll():
+        write_file_result(name, strings, writer, output_format)
+    writer.flush()
+    try:
+        while True:
+            time.sleep(interval)
+            for name, old, new in watcher.poll():
+                write_diff(name, old, new, writer, output_format)
+            writer.flush()
+    except KeyboardInterrupt:
+        pass
+
+
+def write_stats(stats, writer, limit=10):
+    """
+    Writes the `limit` slowest files and the total time of each phase.
+    """
+    totals = {}
+    for times in stats.values():
+        for phase_name in times:
+            totals[phase_name] = totals.get(phase_name, 0.) + times[phase_name]
+
+    files = sorted(stats, key=lambda file: sum(stats[file].values()), reverse=True)[:limit]
+
+    writer.write('Slowest %d files (ms):\n' % len(files))
+    for file in files:
+        writer.write('%12.3f  %s\n' % (sum(stats[file].values())*1e3, file))
+
+    writer.write('Totals of %d files (ms):\n' % len(stats))
+    for phase_name in sorted(totals, key=totals.get, reverse=True):
+        writer.write('%12.3f  %s\n' % (totals[phase_name]*1e3, phase_name))
+    writer.write('%12.3f  %s\n' % (sum(totals.values())*1e3, 'total'))
+
+
+def write_memory(memory, writer, limit=10, sites=3):
+    """
+    Writes the `limit` files with the highest peak memory, with the peak of each phase
+    and the `sites` lines that allocated most memory on it.
+    """
+    files = sorted(memory, key=lambda file: memory[file]['peak'], reverse=True)[:limit]
+
+    writer.write('Largest %d files by peak memory (KiB):\n' % len(files))
+    for file in files:
+        writer.write('%12.1f  %s\n' % (memory[file]['peak']/1024, file))
+        phases = memory[file]['phases']
+        for phase_name in sorted(phases, key=lambda name: phases[name]['peak'], reverse=True):
+            writer.write('%12.1f    %s (net %+.1f)\n' % (phases[phase_name]['peak']/1024, phase_name,
+                                                           phases[phase_name]['net']/1024))
+            for site in phases[phase_name]['top'][:sites]:
+                writer.write('%12s      %+.1f %s:%d\n' % ('', site['size']/1024, site['file'], site['line']))
+
+
 def readable_dir(prospective_dir):
     if not os.path.isdir(prospective_dir):
         raise Exception("readable_dir:{0} is not a valid path".format(prospective_dir))
@@ -65,8 +458,60 @@ def parse_args(args):
                         help='The full path of the directory to recursively analyse sqf files on')
     parser.add_argument('-o', '--output', nargs='?', type=argparse.FileType('w'), default=None,
                         help='File path to redirect the output to (default to stdout)')
+    parser.add_argument('-f', '--format', choices=('text', 'jsonl'), default='text',
+                        help='Output format: "text" or "jsonl", one JSON record per diagnostic (default text)')
+    parser.add_argument('--mmap', action='store_true',
+                        help='Memory-map the files instead of reading them, to reduce the memory used by large files')
+    parser.add_argument('--stats', nargs='?', type=int, const=10, default=None,
+                        help='Print the time spent on each phase of the N (default 10) slowest files to stderr')
+    parser.add_argument('--stats-json', nargs='?', type=argparse.FileType('w'), default=None,
+                        help='File path to write the time of each phase of each file (in seconds) as JSON')
+    parser.add_argument('--memory-report', nargs='?', type=int, const=10, default=None,
+                        help='Print the peak memory of each phase of the N (default 10) files with '
+                             'highest peak memory to stderr')
+    parser.add_argument('--memory-json', nargs='?', type=argparse.FileType('w'), default=None,
+                        help='File path to write the memory of each phase of each file (in bytes) as JSON')
+    parser.add_argument('--changed-since', metavar='REVISION', default=None,
+                        help='With -d, only analyze the files that changed since a git revision (e.g. origin/master), '
+                             'and the files that include them')
+    parser.add_argument('--watch', action='store_true',
+                        help='With -d, analyze the directory and then, whenever files change, analyze them (and the files '
+                             'that include them) again and print the diagnostics that were added (+) or removed (-)')
+    parser.add_argument('--watch-interval', type=float, default=1., metavar='SECONDS',
+                        help='The interval between checks for changed files of --watch (default 1)')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='With -d, abort the analysis of a file after TIMEOUT seconds')
+    parser.add_argument('--memory-limit', type=int, default=None,
+                        help='With -d, abort the analysis of a file after it allocates MEMORY_LIMIT MiB')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='With -d, the number of worker processes analyzing the files (default 1)')
+    parser.add_argument('--max-files-per-worker', type=int, default=None,
+                        help='With -d, replace each worker by a new one after it analyzed N files')
 
-    return parser.parse_args(args)
+    args = parser.parse_args(args)
+    if (args.stats is not None or args.stats_json is not None) and \
+            (args.memory_report is not None or args.memory_json is not None):
+        parser.error('the memory report cannot be combined with the timing stats (tracing memory slows down the analysis)')
+    if has_limits(args) and args.directory is None:
+        parser.error('--timeout, --memory-limit, --jobs and --max-files-per-worker require --directory')
+    if args.changed_since is not None and args.directory is None:
+        parser.error('--changed-since requires --directory')
+    if args.watch and args.directory is None:
+        parser.error('--watch requires --directory')
+    if args.watch and (has_limits(args) or args.changed_since is not None or args.stats is not None or
+                       args.stats_json is not None or args.memory_report is not None or args.memory_json is not None):
+        parser.error('--watch cannot be combined with the limits, --changed-since or the reports')
+    if args.memory_limit is not None and not can_limit_memory():
+        parser.error('--memory-limit is not supported on this platform')
+    for name in ('timeout', 'memory_limit', 'jobs', 'max_files_per_worker'):
+        if getattr(args, name) is not None and getattr(args, name) <= 0:
+            parser.error('--%s must be positive' % name.replace('_', '-'))
+    return args
+
+
+def has_limits(args):
+    return args.timeout is not None or args.memory_limit is not None or args.jobs is not None or \
+        args.max_files_per_worker is not None
 
 
 def main(args):
@@ -77,19 +522,61 @@ def main(args):
     else:
         writer = args.output
 
+    stats = None
+    aborted = None
+    if args.stats is not None or args.stats_json is not None:
+        stats = {}
+    memory = None
+    if args.memory_report is not None or args.memory_json is not None:
+        memory = {}
+
     if args.file is None and args.directory is None:
         code = sys.stdin.read()
-        analyze(code, writer)
+        analyze_tracked(code, writer, '<stdin>', stats, memory, args.format)
+    elif args.file is not None and args.mmap:
+        args.file.close()
+        with read_file(args.file.name, use_mmap=True) as code:
+            analyze_tracked(code, writer, args.file.name, stats, memory, args.format)
     elif args.file is not None:
         code = args.file.read()
         args.file.close()
-        analyze(code, writer)
+        analyze_tracked(code, writer, args.file.name, stats, memory, args.format)
+    elif args.watch:
+        watch(args.directory, writer, args.format, args.mmap, args.watch_interval)
     else:
-        analyze_dir(args.directory, writer)
+        limits = None
+        aborted = []
+        if has_limits(args):
+            limits = Limits(args.timeout,
+                            None if args.memory_limit is None else args.memory_limit * 2**20,
+                            args.jobs or 1,
+                            args.max_files_per_worker)
+        only = None
+        if args.changed_since is not None:
+            try:
+                only = changed_sqf_files(args.directory, args.changed_since)
+            except (OSError, subprocess.CalledProcessError) as e:
+                sys.exit('sqflint: error: cannot list the files changed since "%s": %s' % (
+                    args.changed_since, (getattr(e, 'stderr', None) or str(e)).strip()))
+        analyze_dir(args.directory, writer, stats, memory, args.format, args.mmap, limits, only, aborted)
 
     if args.output is not None:
         writer.close()
 
+    if args.stats is not None:
+        write_stats(stats, sys.stderr, args.stats)
+    if args.stats_json is not None:
+        json.dump(stats, args.stats_json, indent=2, sort_keys=True)
+        args.stats_json.close()
+    if args.memory_report is not None:
+        write_memory(memory, sys.stderr, args.memory_report)
+    if args.memory_json is not None:
+        json.dump(memory, args.memory_json, indent=2, sort_keys=True)
+        args.memory_json.close()
+
+    if aborted:
+        sys.exit('sqflint: error: the analysis of %d file(s) was aborted' % len(aborted))
+
 def _main():
     main(sys.argv[1:])
 
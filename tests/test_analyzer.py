@@ -862,6 +862,21 @@ class NestedCode(TestCase):
         self.assertEqual(len(errors), 1)
         self.assertEqual((2, 3), errors[0].position)
 
+    def test_same_code_other_context(self):
+        # codes analyzed once per file are identified by their source, not only by their text
+        code = 'fnc_a = {private _y = 1; call {hint str _y}};\nfnc_b = {call {hint str _y}};'
+        analyzer = analyze(parse(code))
+        errors = analyzer.exceptions
+        self.assertEqual(len(errors), 1)
+        self.assertEqual((2, 25), errors[0].position)
+
+    def test_nested_unexecuted_code(self):
+        code = 'x = {y = {z = {w = {_a}}}}'
+        analyzer = analyze(parse(code))
+        errors = analyzer.exceptions
+        self.assertEqual(len(errors), 1)
+        self.assertEqual((1, 21), errors[0].position)
+
     def test_code_with_private(self):
         code = "x = {\ncall {private _x; _x}\n}"
         analyzer = analyze(parse(code))
@@ -1349,6 +1364,14 @@ class UnusedVariables(TestCase):
         analyzer = analyze(parse(code))
         self.assertEqual(analyzer.exceptions, [])
 
+    def test_symbols(self):
+        code = 'private _a = 1; private _B = 2; if (_b > 1) then {private _a = 3}; _A'
+        analyzer = analyze(parse(code))
+        self.assertEqual(analyzer.symbols.counts, [1, 1, 0])
+        self.assertEqual([variable.value for variable in analyzer.symbols.unused()], ['_a'])
+        self.assertEqual(len(analyzer.exceptions), 1)
+        self.assertEqual((1, 59), analyzer.exceptions[0].position)
+
 
 class StringAsCodeFunctions(TestCase):
     """
@@ -1375,3 +1398,61 @@ class StringAsCodeFunctions(TestCase):
                '"isClass _x && {getNumber (_x >> \'scope\') == 2} && {getText (_x >> \'crew\') != _defaultCrew}" configClasses (configFile >> "cfgVehicles")'
         analyzer = analyze(parse(code))
         self.assertEqual(len(analyzer.exceptions), 0)
+
+
+class FunctionSummaries(TestCase):
+
+    def test_return_type(self):
+        code = 'fnc_a = {params ["_x"]; _x + 1}; y = [1] call fnc_a; z = call fnc_unknown'
+        analyzer = analyze(parse(code))
+        self.assertEqual(analyzer.exceptions, [])
+        self.assertEqual(Number(), analyzer['y'])
+        self.assertEqual(Anything(), analyzer['z'])
+
+    def test_return_type_with_ending(self):
+        # the last statement is returned whatever its ending
+        code = 'fnc = {1 + 1;}; y = call fnc; hint str (y + 1);'
+        analyzer = analyze(parse(code))
+        self.assertEqual(analyzer.exceptions, [])
+        self.assertEqual(Anything(), analyzer['y'])
+
+    def test_exit_with(self):
+        code = 'fnc_a = {if (a) exitWith {1}; ""}; y = [] call fnc_a'
+        analyzer = analyze(parse(code))
+        self.assertEqual(Anything(), analyzer['y'])
+
+    def test_memoized_by_signature(self):
+        code = 'fnc_a = {params ["_x"]; _x}; [1] call fnc_a; [2] call fnc_a; [""] call fnc_a'
+        analyzer = analyze(parse(code))
+        function = analyzer._functions['fnc_a']
+        self.assertEqual({(Array, (Number,)), (Array, (String,))}, set(function.summaries))
+
+    def test_params_types(self):
+        code = 'fnc_a = {params ["_x", ["_y", 0, [0]]]; [_x, _y]}; [1, 2] call fnc_a; [1, ""] call fnc_a'
+        analyzer = analyze(parse(code))
+        errors = analyzer.exceptions
+        self.assertEqual(len(errors), 1)
+        self.assertEqual((1, 71), errors[0].position)
+        summary = analyzer._functions['fnc_a'].summaries[(Array, (Number, Number))]
+        self.assertEqual([('_x', None), ('_y', (Number,))], summary.params)
+
+    def test_globals(self):
+        code = 'fnc_a = {z = w}; call fnc_a; y = z'
+        analyzer = analyze(parse(code))
+        summary = analyzer._functions['fnc_a'].summaries[Anything]
+        self.assertEqual({'w'}, summary.globals_read)
+        self.assertEqual({'z': Anything}, summary.globals_written)
+
+        analyzer = analyze(parse('fnc_a = {z = ""}; call fnc_a; y = z'))
+        self.assertEqual(String(), analyzer['y'])
+
+    def test_recursion(self):
+        code = 'fnc_a = {params ["_n"]; if (_n > 0) then {[_n - 1] call fnc_a}}; [2] call fnc_a'
+        analyzer = analyze(parse(code))
+        self.assertEqual(analyzer.exceptions, [])
+
+    def test_nested_calls(self):
+        code = 'fnc_b = {params ["_y"]; _y}; fnc_a = {params ["_x"]; [_x] call fnc_b}; y = [1] call fnc_a'
+        analyzer = analyze(parse(code))
+        self.assertEqual(analyzer.exceptions, [])
+        self.assertEqual(Number(), analyzer['y'])
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from unittest import TestCase
+
+import sqf
+from sqf.async_analysis import AsyncAnalyzer
+from sqf.pool import WorkerError
+
+
+def _summary(exceptions):
+    return [(e.position, e.message) for e in exceptions]
+
+
+class AsyncAnalysis(TestCase):
+
+    def test_analyze_async(self):
+        exceptions = asyncio.run(sqf.analyze_async('hint _x'))
+        self.assertEqual([((1, 6), 'warning:Local variable "_x" is not from this scope (not private)')],
+                         _summary(exceptions))
+
+        exceptions = asyncio.run(sqf.analyze_async('('))
+        self.assertEqual([((1, 1), 'error:Parenthesis "(" not closed')], _summary(exceptions))
+
+    def test_imported_on_first_use(self):
+        code = 'import sys, sqf.analyzer; print("asyncio" in sys.modules)'
+        self.assertEqual('False', subprocess.check_output([sys.executable, '-c', code], text=True).strip())
+
+    def test_analyze_files_async(self):
+        paths = ['tests/test_dir/test.sqf', 'tests/test_dir/test1.sqf']
+        results = asyncio.run(sqf.analyze_files_async(paths))
+        self.assertEqual(paths, [path for path, _ in results])
+        self.assertEqual([((1, 6), 'warning:Local variable "_y" is not from this scope (not private)')],
+                         _summary(results[1][1]))
+
+    def test_responsive(self):
+        code = ''.join('_a%d = [1, 2] select 0; if (_a%d > 2) then {hint str _a%d};\n' % (i, i, i)
+                       for i in range(100))
+
+        async def run():
+            async with AsyncAnalyzer(workers=1) as analyzer:
+                await analyzer.analyze('')  # starts the pool
+                task = asyncio.ensure_future(analyzer.analyze(code))
+                ticks = 0
+                while not task.done():
+                    await asyncio.sleep(0.001)
+                    ticks += 1
+                return ticks, await task
+
+        ticks, exceptions = asyncio.run(run())
+        self.assertTrue(ticks > 1)
+        self.assertTrue(exceptions)
+
+    def test_cancel(self):
+        async def run():
+            async with AsyncAnalyzer(workers=1, concurrency=1) as analyzer:
+                first = asyncio.ensure_future(analyzer.analyze('hint _x'))
+                waiting = asyncio.ensure_future(analyzer.analyze('hint _y'))
+                await asyncio.sleep(0)
+                waiting.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await waiting
+                self.assertEqual(1, len(await first))
+                # the slot of the cancelled analysis is free again
+                return await asyncio.wait_for(analyzer.analyze('hint _z'), 60)
+
+        self.assertEqual(1, len(asyncio.run(run())))
+
+    def test_file_errors(self):
+        paths = ['tests/test_dir/test1.sqf', 'tests/test_dir/missing.sqf']
+        results = asyncio.run(sqf.analyze_files_async(paths))
+        self.assertEqual(1, len(results[0][1]))
+        (position, message), = _summary(results[1][1])
+        self.assertEqual((1, 1), position)
+        self.assertTrue(message.startswith('error:Analysis aborted: FileNotFoundError: '), message)
+
+    def test_worker_exits(self):
+        async def run():
+            async with AsyncAnalyzer(workers=1) as analyzer:
+                # the process of an analysis dies
+                with self.assertRaises(WorkerError):
+                    await analyzer._run(os._exit, 1)
+                (_, message), = _summary(await analyzer._analyze(os._exit, 1))
+                self.assertEqual('error:Analysis aborted: the worker exited unexpectedly (exit code 1)', message)
+                return await analyzer.analyze('hint _x')
+
+        self.assertEqual(1, len(asyncio.run(run())))
@@ -0,0 +1,127 @@
+from unittest import TestCase
+
+from sqf.parser import parse
+from sqf.cfg import build
+
+
+def _nodes(block):
+    return [str(node.token).strip().rstrip(';') for node in block.nodes]
+
+
+class TestCFG(TestCase):
+
+    def test_sequence(self):
+        cfg = build(parse('_a = 1; _b = _a'))
+        self.assertEqual(['_a = 1', '_b = _a'], _nodes(cfg.entry))
+        self.assertEqual([cfg.exit], cfg.entry.successors)
+        self.assertEqual({'_b'}, cfg.entry.nodes[1].defines)
+        self.assertEqual({'_a'}, cfg.entry.nodes[1].uses)
+
+    def test_case_insensitive(self):
+        cfg = build(parse('private _aB = 1; _Ab'))
+        self.assertEqual(cfg.entry.nodes[0].defines, cfg.entry.nodes[1].uses)
+
+    def test_if_then_else(self):
+        cfg = build(parse('if (_a) then {_b = 1} else {_c = 2}; _d'))
+        self.assertEqual(['_a'], _nodes(cfg.entry))
+        then, else_ = cfg.entry.successors
+        self.assertEqual(['_b = 1'], _nodes(then))
+        self.assertEqual(['_c = 2'], _nodes(else_))
+        self.assertEqual(then.successors, else_.successors)
+        self.assertEqual(['_d'], _nodes(then.successors[0]))
+
+    def test_if_then(self):
+        cfg = build(parse('if (_a) then {_b}; _d'))
+        then, after = cfg.entry.successors
+        self.assertEqual(['_b'], _nodes(then))
+        self.assertEqual([after], then.successors)
+        self.assertEqual(['_d'], _nodes(after))
+
+    def test_if_then_array(self):
+        cfg = build(parse('_x = if (_a) then [{1}, {_b}]'))
+        then, else_ = cfg.entry.successors
+        self.assertEqual(['_b'], _nodes(else_))
+        after = else_.successors[0]
+        self.assertEqual(['_x = if (_a) then [{1}, {_b}]'], _nodes(after))
+        self.assertEqual({'_x'}, after.nodes[0].defines)
+        self.assertEqual(set(), after.nodes[0].uses)
+
+    def test_exit_with(self):
+        cfg = build(parse('if (_a) exitWith {_b}; _c'))
+        body, after = cfg.entry.successors
+        self.assertEqual([cfg.exit], body.successors)
+        self.assertEqual(['_c'], _nodes(after))
+
+    def test_exit_with_in_loop(self):
+        cfg = build(parse('{if (_x) exitWith {}; _y} forEach _a; _z'))
+        header = cfg.entry.successors[0]
+        body, after = header.successors
+        self.assertEqual(['_z'], _nodes(after))
+        exit_body = body.successors[0]
+        self.assertEqual([after], exit_body.successors)
+
+    def test_while(self):
+        cfg = build(parse('while {_x < 3} do {_x = _x + 1}'))
+        header = cfg.entry.successors[0]
+        self.assertEqual(['_x < 3'], _nodes(header))
+        body, after = header.successors
+        self.assertEqual([header], body.successors)
+        self.assertEqual([cfg.exit], after.successors)
+
+    def test_for(self):
+        cfg = build(parse('for "_i" from 0 to _n do {_i}'))
+        self.assertEqual(['0', '_n'], _nodes(cfg.entry))
+        header = cfg.entry.successors[0]
+        self.assertEqual({'_i'}, header.nodes[0].defines)
+        body, after = header.successors
+        self.assertEqual([header], body.successors)
+
+    def test_for_specs(self):
+        cfg = build(parse('for [{_i = 0}, {_i < 3}, {_i = _i + 1}] do {_a}'))
+        self.assertEqual(['_i = 0'], _nodes(cfg.entry))
+        header = cfg.entry.successors[0]
+        body = header.successors[0]
+        self.assertEqual(['_a', '_i = _i + 1'], _nodes(body))
+        self.assertEqual([header], body.successors)
+
+    def test_switch(self):
+        cfg = build(parse('switch (_a) do {case 1: {_b}; case 2; case 3: {_c}; default {_d}}'))
+        self.assertEqual(['_a', '1', '2', '3'], _nodes(cfg.entry))
+        self.assertEqual([['_b'], ['_c'], ['_d']], [_nodes(block) for block in cfg.entry.successors])
+
+    def test_switch_without_default(self):
+        cfg = build(parse('switch (_a) do {case 1: {_b}}; _c'))
+        case, after = cfg.entry.successors
+        self.assertEqual([after], case.successors)
+        self.assertEqual(['_c'], _nodes(after))
+
+    def test_try_catch(self):
+        cfg = build(parse('try {_a; if (_b) then {throw 1}; _c} catch {_exception}'))
+        handler = [block for block in cfg.blocks if _nodes(block) == ['_exception']][0]
+        # the try may throw before or after any of its statements
+        self.assertIn(handler, cfg.entry.successors)
+        for nodes in (['_a'], ['_b'], ['throw 1'], ['_c']):
+            block = [block for block in cfg.blocks if _nodes(block) == nodes][0]
+            self.assertIn(handler, block.successors)
+
+    def test_throw(self):
+        cfg = build(parse('_a; throw _b; _c'))
+        self.assertEqual([cfg.exit], cfg.entry.successors)
+        unreachable = [block for block in cfg.blocks if _nodes(block) == ['_c']][0]
+        self.assertEqual([], unreachable.predecessors)
+        self.assertNotIn(unreachable, cfg.reverse_postorder())
+
+    def test_call(self):
+        cfg = build(parse('[_a] call {_b = _this}; _b'))
+        self.assertEqual(['[_a]', '_b = _this'], _nodes(cfg.entry))
+        self.assertEqual(['_b'], _nodes(cfg.entry.successors[0]))
+
+    def test_functions(self):
+        cfg = build(parse('_f = {_g = {_a}; _b}; [] spawn {_c}'))
+        self.assertEqual(['{_g = {_a}; _b}', '{_c}'], [str(code) for code in cfg.functions])
+        self.assertEqual({'_g', '_a', '_b'}, cfg.entry.nodes[0].uses)
+
+    def test_params(self):
+        cfg = build(parse('params ["_a", ["_b", _c]]; private ["_d"]; private "_e"'))
+        self.assertEqual([{'_a', '_b'}, {'_d'}, {'_e'}], [node.defines for node in cfg.entry.nodes])
+        self.assertEqual({'_c'}, cfg.entry.nodes[0].uses)
@@ -0,0 +1,77 @@
+from unittest import TestCase
+
+from sqf.parser import parse
+from sqf.cfg import build
+from sqf.dataflow import solve, Liveness, ReachingDefinitions, dead_definitions
+
+
+def _dead(script):
+    return [(name, str(node.token).strip().rstrip(';')) for name, node in dead_definitions(build(parse(script)))]
+
+
+class TestLiveness(TestCase):
+
+    def test_sequence(self):
+        cfg = build(parse('_a = 1; _b = _a + _c'))
+        before, after = solve(cfg, Liveness())
+        self.assertEqual({'_c'}, before[cfg.entry])
+        self.assertEqual(set(), after[cfg.entry])
+
+    def test_loop(self):
+        cfg = build(parse('_i = 0; while {_i < 3} do {_i = _i + 1}'))
+        header = cfg.entry.successors[0]
+        before, after = solve(cfg, Liveness())
+        self.assertEqual({'_i'}, before[header])
+        self.assertEqual(set(), before[cfg.entry])
+
+    def test_dead_definitions(self):
+        self.assertEqual([('_a', '_a = 1')], _dead('_a = 1; _a = 2; _a'))
+        self.assertEqual([], _dead('_a = 1; if (_b) then {_a = 2}; _a'))
+        self.assertEqual([('_b', '_b = _a')], _dead('_a = 1; _b = _a'))
+
+    def test_dead_in_loop(self):
+        # the value assigned in the body is read by the condition of the next iteration
+        self.assertEqual([], _dead('_i = 0; while {_i < 3} do {_i = _i + 1}'))
+        self.assertEqual([('_j', '_j = 1')], _dead('while {true} do {_j = 1}'))
+
+    def test_read_by_function(self):
+        self.assertEqual([('_f', 'private _f = {_a}')], _dead('_a = 1; private _f = {_a}'))
+
+    def test_read_by_call(self):
+        # local variables are dynamically scoped, so the called code may read any of them
+        self.assertEqual([], _dead('_f = {hint str _a}; _a = 1; call _f;'))
+        self.assertEqual([], _dead('_a = 1; [] call fnc_x'))
+        self.assertEqual([], _dead('_a = 1; _b = [] call fnc_x; _b'))
+
+    def test_private_in_scope(self):
+        # the private variables of the branches do not hide the outer variable
+        code = '_a = 1; if (c) then {private _a = 2; hint str _a} else {private _a = 3; hint str _a}; hint str _a;'
+        self.assertEqual([], _dead(code))
+        self.assertEqual([('_a', 'private _a = 2')], _dead('_a = 1; if (c) then {private _a = 2}; hint str _a'))
+        self.assertEqual([], _dead('_a = 1; if (c) then {params ["_a"]; hint str _a}; hint str _a'))
+
+    def test_exit_with(self):
+        self.assertEqual([('_a', '_a = 2')], _dead('_a = 1; if (_b) exitWith {_a}; _a = 2'))
+
+    def test_try_catch(self):
+        self.assertEqual([], _dead('_a = 1; try {_a = 2; throw 1} catch {_a}'))
+
+
+class TestReachingDefinitions(TestCase):
+
+    def test_branches(self):
+        cfg = build(parse('_a = 1; if (_b) then {_a = 2}; _c = _a'))
+        before, after = solve(cfg, ReachingDefinitions())
+        end = [block for block in cfg.blocks if block.nodes and str(block.nodes[0].token) == ' _c = _a'][0]
+        self.assertEqual({'_a = 1;', '_a = 2'}, {str(node.token).strip() for name, node in before[end]})
+
+    def test_kill(self):
+        cfg = build(parse('_a = 1; _a = 2'))
+        before, after = solve(cfg, ReachingDefinitions())
+        self.assertEqual([(('_a', cfg.entry.nodes[1]))], list(after[cfg.entry]))
+
+    def test_loop(self):
+        cfg = build(parse('_i = 0; while {_i < 3} do {_i = _i + 1}'))
+        header = cfg.entry.successors[0]
+        before, after = solve(cfg, ReachingDefinitions())
+        self.assertEqual(2, len(before[header]))
@@ -0,0 +1,58 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from sqf.includes import IncludeGraph, find_includes, normalize_path
+
+
+class TestIncludes(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.write('macros.hpp', '#define A 1\n')
+        self.write('common.hpp', '#include "macros.hpp"\n')
+        self.write('a.sqf', '#include "common.hpp"\nhint str A;\n')
+        self.write('sub/b.sqf', '  #include <\\macros.hpp>\n')
+        self.write('c.sqf', 'hint "#include";\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return normalize_path(os.path.join(self.directory, name))
+
+    def write(self, name, code):
+        os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+        with open(self.path(name), 'w') as f:
+            f.write(code)
+
+    def graph(self):
+        graph = IncludeGraph(self.directory)
+        for name in ('a.sqf', 'sub/b.sqf', 'c.sqf'):
+            graph.scan(self.path(name))
+        return graph
+
+    def test_find_includes(self):
+        self.assertEqual(['a.hpp', 'b\\c.h'], find_includes('#include "a.hpp"\n_x = 1;\n #include <b\\c.h>'))
+        self.assertEqual([], find_includes('// a comment #include "a.hpp"\n'))
+
+    def test_dependents(self):
+        graph = self.graph()
+        self.assertEqual({self.path('common.hpp'), self.path('a.sqf'), self.path('sub/b.sqf')},
+                         graph.dependents([self.path('macros.hpp')]))
+        self.assertEqual({self.path('a.sqf')}, graph.dependents([self.path('common.hpp')]))
+        self.assertEqual(set(), graph.dependents([self.path('c.sqf')]))
+
+    def test_rescan(self):
+        graph = self.graph()
+        self.write('a.sqf', 'hint "no includes";\n')
+        graph.scan(self.path('a.sqf'))
+        self.assertEqual({self.path('common.hpp'), self.path('sub/b.sqf')},
+                         graph.dependents([self.path('macros.hpp')]))
+
+    def test_deleted_header(self):
+        graph = self.graph()
+        os.remove(self.path('common.hpp'))
+        graph.scan(self.path('a.sqf'))
+        self.assertEqual({self.path('a.sqf')}, graph.dependents([self.path('common.hpp')]))
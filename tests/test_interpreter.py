@@ -443,6 +443,12 @@ class Scopes(TestCase):
         interpreter, _ = interpret('x = 1; if (true) then {x = 2;}')
         self.assertEqual(N(2), interpreter['x'])
 
+    def test_nested_private(self):
+        interpreter, _ = interpret('_x = 1; _y = call {private _x = 2; call {_x = _x + 1; _X}}; _z = call {_x}')
+        self.assertEqual(N(1), interpreter['_x'])
+        self.assertEqual(N(3), interpreter['_y'])
+        self.assertEqual(N(1), interpreter['_z'])
+
 
 class Namespaces(TestCase):
 
@@ -483,3 +489,31 @@ class Operators(TestCase):
     def test_assign_array(self):
         interpreter = interpret('_y = [];')[0]
         self.assertEqual(Array([]), interpreter['_y'])
+
+
+class Fork(TestCase):
+
+    def test_fork(self):
+        interpreter = interpret('a = [1, [2]]; b = a; f = {a pushBack _this}; uiNamespace setVariable ["u", 1]')[0]
+        fork = interpreter.fork()
+
+        interpret('1 call f; (a select 1) pushBack 3; uiNamespace setVariable ["u", 2]; c = 1', fork)
+
+        self.assertEqual(Array([N(1), Array([N(2), N(3)]), N(1)]), fork['b'])
+        self.assertEqual(N(2), fork.namespace('uiNamespace')['u'])
+        # the original is not modified
+        self.assertEqual(Array([N(1), Array([N(2)])]), interpreter['a'])
+        self.assertEqual(N(1), interpreter.namespace('uiNamespace')['u'])
+        self.assertEqual(Nothing(), interpreter['c'])
+        # arrays referenced by more than one variable are still the same array
+        self.assertIs(fork['a'], fork['b'])
+        # code is shared
+        self.assertIs(interpreter['f'], fork['f'])
+
+    def test_fork_locals(self):
+        interpreter = interpret('_x = 1; private _y = [1]')[0]
+        fork = interpreter.fork()
+        interpret('_y pushBack 2; _x = 2', fork)
+        self.assertEqual(N(1), interpreter['_x'])
+        self.assertEqual(Array([N(1)]), interpreter['_y'])
+        self.assertEqual(Array([N(1), N(2)]), fork['_y'])
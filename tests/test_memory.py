@@ -0,0 +1,41 @@
+from unittest import TestCase
+
+from sqf.memory import MemoryTracker
+
+
+class MemoryTrackerTestCase(TestCase):
+
+    def test_snapshots_not_counted(self):
+        with MemoryTracker() as tracker:
+            # the traces of these objects are in the snapshots
+            objects = [[] for _ in range(50000)]
+            tracker.start('empty')
+            tracker.stop()
+        stats = tracker.phases['empty']
+        self.assertLess(stats['net'], 10000)
+        self.assertLess(stats['peak'], 10000)
+        del objects
+
+    def test_peak_from_start(self):
+        with MemoryTracker() as tracker:
+            kept = bytearray(10**6)
+            tracker.start('phase')
+            temporary = bytearray(10**5)
+            del temporary
+            tracker.stop()
+        stats = tracker.phases['phase']
+        self.assertLess(stats['peak'], 2 * 10**5)
+        self.assertGreaterEqual(tracker.peak, 10**6)
+        del kept
+
+    def test_repeated_phase(self):
+        kept = []
+        with MemoryTracker() as tracker:
+            for _ in range(2):
+                tracker.start('phase')
+                kept.append(bytearray(10**5))
+                tracker.stop()
+        stats = tracker.phases['phase']
+        self.assertGreaterEqual(stats['net'], 2 * 10**5)
+        self.assertGreaterEqual(stats['top'][0]['size'], 2 * 10**5)
+        self.assertGreaterEqual(stats['top'][0]['count'], 2)
@@ -0,0 +1,46 @@
+from unittest import TestCase
+
+from sqf.parallel_analysis import analyze_many
+
+
+class AnalyzeMany(TestCase):
+
+    def setUp(self):
+        self.sources = [('s%d' % i, 'hint _x%d' % i) for i in range(10)] + [('error', '(')]
+
+    def summary(self, results):
+        return [(name, [(e.position, e.message) for e in exceptions]) for name, exceptions in results]
+
+    def test_ordered(self):
+        expected = self.summary(analyze_many(self.sources, workers=1))
+        self.assertEqual(('s3', [((1, 6), 'warning:Local variable "_x3" is not from this scope (not private)')]),
+                         expected[3])
+        self.assertEqual(('error', [((1, 1), 'error:Parenthesis "(" not closed')]), expected[-1])
+
+        self.assertEqual(expected, self.summary(analyze_many(self.sources, workers=2, ordered=True)))
+        self.assertEqual(sorted(expected), sorted(self.summary(analyze_many(self.sources, workers=2))))
+
+    def test_back_pressure(self):
+        taken = []
+
+        def sources():
+            for source in self.sources:
+                taken.append(source[0])
+                yield source
+
+        results = analyze_many(sources(), workers=2, max_pending=3)
+        next(results)
+        self.assertEqual(3, len(taken))
+        results.close()
+
+
+    def test_failed_source(self):
+        # the code is not a string: the analysis of the source fails, not the others
+        sources = [('a', 'hint _a'), ('b', None), ('c', 'hint _c')]
+        for workers in (1, 2):
+            results = self.summary(analyze_many(sources, workers=workers, ordered=True))
+            self.assertEqual(['a', 'b', 'c'], [name for name, _ in results])
+            self.assertEqual(1, len(results[2][1]))
+            (position, message), = results[1][1]
+            self.assertEqual((1, 1), position)
+            self.assertTrue(message.startswith('error:Analysis aborted: '), message)
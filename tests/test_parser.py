@@ -1,14 +1,15 @@
+import sys
 from unittest import TestCase
 
 from sqf.base_type import get_coord
-from sqf.parser_exp import parse_exp
+from sqf.parser_exp import parse_exp, Parser
 from sqf.exceptions import SQFParenthesisError, SQFParserError
 from sqf.types import String, Statement, Code, Array, Boolean, Variable as V, \
     Number as N, BaseTypeContainer, Keyword, Preprocessor, Nothing
 from sqf.interpreter_types import DefineStatement, IfDefStatement, DefineResult, IfDefResult
-from sqf.parser_types import Comment, Space, Tab, EndOfLine, BrokenEndOfLine, ParserKeyword
-from sqf.parser import parse, parse_strings_and_comments, identify_token
-from sqf.base_tokenizer import tokenize
+from sqf.parser_types import Comment, Space, Tab, EndOfLine, BrokenEndOfLine, EndOfFile, ParserKeyword
+from sqf.parser import parse, parse_strings_and_comments, identify_token, parse_block, _analyze_simple
+from sqf.base_tokenizer import tokenize, tokenize_buffer
 
 
 def build_indexes(string):
@@ -87,6 +88,18 @@ class TestExpParser(TestCase):
         test = ['1', '-', '1', '-', '1']
         self.assertEqual([['1', '-', '1'], '-', '1'], parse_exp(test))
 
+    def test_reuse(self):
+        parser = Parser(Statement)
+
+        # the spaces stay next to the base tokens they surround
+        test = [Space(), V('a'), Space(), Keyword('+'), Space(), V('b'), Space()]
+        expected = Statement([Statement([Space(), V('a'), Space()]), Keyword('+'),
+                              Statement([Space(), V('b'), Space()])])
+        self.assertEqual(expected, parser.parse(test))
+
+        test = [V('a'), Keyword('='), V('b')]
+        self.assertEqual(Statement(test), parser.parse(test))
+
 
 class ParserTestCase(TestCase):
     
@@ -1001,6 +1014,75 @@ class ParseStrings(ParserTestCase):
         self.assertEqualStatement(expected, result, code)
 
 
+class IdentifyToken(TestCase):
+
+    def test_repeated_tokens(self):
+        for token in ('_x', 'call', 'CALL', 'missionNamespace', '#define', '1', '1.5', 'true', ' ', '\r\n', '('):
+            first, second = identify_token(token), identify_token(token)
+            self.assertEqual(first, second)
+            self.assertEqual(type(first), type(second))
+            # occurrences are distinct nodes, with their own positions
+            self.assertIsNot(first, second)
+            first.position = (1, 1)
+            self.assertTrue(second.undefined_position)
+
+        self.assertEqual(Keyword('CALL'), identify_token('CALL'))
+        self.assertEqual('CALL', identify_token('CALL').value)
+
+
+class ParseBlock(TestCase):
+
+    def test_deep_nesting(self):
+        # the blocks are not parsed recursively, so their depth is not limited by the recursion limit
+        depth = 10 * sys.getrecursionlimit()
+        tokens = [identify_token(x) for x in tokenize('[{(' * depth + 'a' + ')}]' * depth)] + [EndOfFile()]
+
+        result, size = parse_block(tokens, _analyze_simple)
+
+        self.assertEqual(len(tokens), size)
+        counts = {Array: 0, Code: 0}
+        nodes = [result]
+        while nodes:
+            node = nodes.pop()
+            if type(node) in counts:
+                counts[type(node)] += 1
+            if isinstance(node, Array):
+                nodes.extend(node.value)
+            elif isinstance(node, BaseTypeContainer):
+                nodes.extend(node.tokens)
+        self.assertEqual({Array: depth, Code: depth}, counts)
+
+    def test_parse_deep_nesting(self):
+        # neither parsing the expressions, the positions nor the string are recursive
+        depth = 10 * sys.getrecursionlimit()
+        for code in ('[' * depth + ']' * depth,
+                     '_x = ' + '[1, (2 + {' * depth + '_y' + '})]' * depth):
+            result = parse(code)
+            self.assertEqual(code, str(result))
+
+        variable = next(token for token in result.get_all_tokens() if token == V('_y'))
+        self.assertEqual((1, 6 + len('[1, (2 + {') * depth), variable.position)
+
+
+class ParseBuffer(ParserTestCase):
+
+    code = 'a = 1;\r\n// comment\r\nb = "x""y" + \'é\'; /* c */ c = 1 == 2 \\\n;\n_x = [1.5, {_y >= 2}];'
+
+    def test_tokenize_buffer(self):
+        # tokens across chunks, including multi-byte characters and 2-character tokens
+        for chunk_size in (1, 2, 3, 7, 1000):
+            self.assertEqual(tokenize(self.code), list(tokenize_buffer(self.code.encode(), chunk_size)))
+
+    def test_parse(self):
+        self.assertEqual(parse(self.code), parse(self.code.encode()))
+        self.assertEqual(parse(''), parse(b''))
+
+    def test_error(self):
+        with self.assertRaises(SQFParserError) as cm:
+            parse(b"_x='1111")
+        self.assertEqual((1, 4), cm.exception.position)
+
+
 class ParsePreprocessor(ParserTestCase):
 
     def test_include(self):
@@ -0,0 +1,75 @@
+import os
+import time
+from unittest import TestCase
+
+from sqf.pool import Pool, WorkerError, describe
+
+
+class PoolTestCase(TestCase):
+
+    def test_imap(self):
+        with Pool(workers=2) as pool:
+            results = list(pool.imap(abs, range(-5, 5)))
+        self.assertEqual([(i, abs(i), None) for i in range(-5, 5)], results)
+
+    def test_unordered(self):
+        with Pool(workers=2) as pool:
+            results = list(pool.imap(abs, range(-5, 5), ordered=False))
+        self.assertEqual([(i, abs(i), None) for i in range(-5, 5)], sorted(results))
+
+    def test_error(self):
+        with Pool(workers=1) as pool:
+            results = list(pool.imap(int, ['1', 'x', '2']))
+        self.assertEqual([('1', 1, None), ('2', 2, None)], [results[0], results[2]])
+        self.assertIsInstance(results[1][2], ValueError)
+        self.assertEqual(None, results[1][1])
+
+    def test_worker_exits(self):
+        with Pool(workers=1) as pool:
+            with self.assertRaises(WorkerError) as context:
+                pool.submit(os._exit, 3).result()
+            self.assertEqual('the worker exited unexpectedly (exit code 3)', str(context.exception))
+            # the process is replaced
+            self.assertEqual(1, pool.submit(abs, -1).result())
+
+    def test_timeout(self):
+        with Pool(workers=1, timeout=0.5) as pool:
+            slow = pool.submit(time.sleep, 60)
+            waiting = pool.submit(abs, -1)
+            with self.assertRaises(WorkerError) as context:
+                slow.result()
+            self.assertEqual('exceeded the time limit of 0.5s', describe(context.exception))
+            self.assertEqual(1, waiting.result())
+
+    def test_tasks_per_worker(self):
+        with Pool(workers=1, tasks_per_worker=1) as pool:
+            pids = [pid for _, pid, _ in pool.imap(_pid, range(3))]
+        self.assertEqual(3, len(set(pids)))
+
+    def test_memory_error(self):
+        with Pool(workers=1) as pool:
+            pid = pool.submit(_pid, None).result()
+            with self.assertRaises(MemoryError):
+                pool.submit(_exhaust_memory).result()
+            # the process stopped, and was replaced
+            self.assertNotEqual(pid, pool.submit(_pid, None).result())
+
+    def test_close(self):
+        pool = Pool(workers=1)
+        running = pool.submit(time.sleep, 60)
+        waiting = pool.submit(abs, -1)
+        while not running.running():
+            time.sleep(0.01)
+        pool.close()
+        self.assertTrue(waiting.cancelled())
+        self.assertIsInstance(running.exception(), WorkerError)
+        with self.assertRaises(RuntimeError):
+            pool.submit(abs, -1)
+
+
+def _pid(_):
+    return os.getpid()
+
+
+def _exhaust_memory():
+    raise MemoryError()
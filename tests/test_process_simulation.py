@@ -0,0 +1,127 @@
+from unittest import TestCase
+
+from sqf.exceptions import SQFParserError
+from sqf.types import Number as N, Nothing, Boolean
+from sqf.process_simulation import ProcessSimulation
+from sqf.pool import WorkerError
+
+
+class ProcessSim(TestCase):
+
+    def setUp(self):
+        self.sim = ProcessSimulation(workers=2)
+
+    def tearDown(self):
+        self.sim.close()
+
+    def test_broadcast(self):
+        sim = self.sim
+
+        client = sim.add_client()
+        client.execute('"x" addPublicVariableEventHandler {y = _this select 1};')
+
+        sim.server.execute('x = 123; publicVariable "x";')
+        self.assertEqual(N(123), client['x'])
+        self.assertEqual(N(123), client['y'])
+
+        # broadcast to a JIP client updates the var but does not trigger the PVEH
+        client = sim.add_client()
+        client.execute('"x" addPublicVariableEventHandler {y = _this select 1};')
+
+        self.assertEqual(N(123), client['x'])
+        self.assertEqual(Nothing(), client['y'])
+
+    def test_publicVariableOther(self):
+        sim = self.sim
+
+        client0 = sim.add_client()
+        client1 = sim.add_client()
+        # to server
+        client0.execute('x = 2; publicVariableServer "x";')
+        self.assertEqual(N(2), sim.server['x'])
+        self.assertEqual(Nothing(), client1['x'])
+
+        # to client but not the server
+        client0.execute('x = 3; 1 publicVariableClient "x";')
+        self.assertEqual(N(2), sim.server['x'])
+        self.assertEqual(N(3), client1['x'])
+
+    def test_is_server(self):
+        sim = self.sim
+
+        client = sim.add_client()
+        client.execute('_x = isServer;')
+        self.assertEqual(Boolean(False), client['_x'])
+
+        sim.server.execute('_x = isServer; _y = isDedicated;')
+        self.assertEqual(Boolean(True), sim.server['_x'])
+        self.assertEqual(Boolean(True), sim.server['_y'])
+
+    def test_broadcast_from_handler_is_queued(self):
+        sim = self.sim
+
+        client0 = sim.add_client()
+        client1 = sim.add_client()
+        client0.execute('"a" addPublicVariableEventHandler {b = 1; publicVariable "b"};')
+        client1.execute('"a" addPublicVariableEventHandler {seen_b = b};')
+
+        sim.server.execute('a = 1; publicVariable "a";')
+
+        self.assertEqual(Nothing(), client1['seen_b'])
+        self.assertEqual(N(1), client1['b'])
+        self.assertEqual(N(1), sim.server['b'])
+
+    def test_broadcast_chain(self):
+        sim = self.sim
+        client = sim.add_client()
+        sim.server.execute('"n" addPublicVariableEventHandler {n = (_this select 1) + 1; if (n < 100) then {publicVariable "n"}};')
+
+        sim.server.execute('n = 0; publicVariable "n";')
+
+        self.assertEqual(N(100), sim.server['n'])
+        self.assertEqual(N(99), client['n'])
+
+    def test_error(self):
+        client = self.sim.add_client()
+        with self.assertRaises(SQFParserError):
+            client.execute('x = 1 +;')
+        # the worker keeps working
+        client.execute('x = 1;')
+        self.assertEqual(N(1), client['x'])
+
+    def test_broadcasts_during_script(self):
+        sim = self.sim
+        client = sim.add_client()
+        sim.server.execute('"a" addPublicVariableEventHandler {c = 1; publicVariable "c"};')
+
+        # like `Simulation`, a broadcast and the ones it triggers are delivered before the script continues
+        client.execute('a = 1; publicVariable "a"; seen_c = c;')
+        self.assertEqual(N(1), client['seen_c'])
+
+    def test_broadcasts_before_error(self):
+        client = self.sim.add_client()
+        with self.assertRaises(SQFParserError):
+            client.execute('x = 1; publicVariable "x"; [] select 10;')
+        self.assertEqual(N(1), self.sim.server['x'])
+
+    def test_handler_error(self):
+        sim = self.sim
+        # client 0 and client 2 run on the same worker
+        clients = [sim.add_client() for _ in range(3)]
+        clients[0].execute('"a" addPublicVariableEventHandler {c = 2; publicVariable "c"; _x = [1] select 5;};')
+
+        with self.assertRaises(SQFParserError):
+            sim.server.execute('a = 1; publicVariable "a"; b = 1;')
+        self.assertEqual(Nothing(), sim.server['b'])
+        # the broadcast and the ones of the handler were delivered to every client
+        self.assertEqual(N(1), clients[2]['a'])
+        self.assertEqual(N(2), clients[2]['c'])
+        self.assertEqual(N(2), sim.server['c'])
+
+    def test_worker_exits(self):
+        client = self.sim.add_client()
+        process = self.sim._worker(client.id).process
+        process.kill()
+        process.join()
+        with self.assertRaises(WorkerError):
+            client.execute('x = 1;')
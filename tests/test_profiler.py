@@ -0,0 +1,64 @@
+import io
+from unittest import TestCase
+
+from sqf.exceptions import SQFParserError
+from sqf.interpreter import interpret, Interpreter
+from sqf.profiler import Profiler
+
+
+class ProfilerTestCase(TestCase):
+
+    def setUp(self):
+        self.interpreter = Interpreter()
+        self.interpreter.profiler = Profiler('test.sqf')
+
+    def test_lines(self):
+        interpret('_f = {\n'
+                  '  _x = 1;\n'
+                  '  _x = _x + 1;\n'
+                  '};\n'
+                  'call _f;\n'
+                  'call _f;', self.interpreter)
+        lines = self.interpreter.profiler.lines
+        self.assertEqual([1, 2, 3, 5, 6], sorted(lines))
+        self.assertEqual(2, lines[2][0])
+        self.assertEqual(1, lines[5][0])
+
+    def test_stacks(self):
+        interpret('_f = {_x = 1};\ncall _f;\ncall {call _f};', self.interpreter)
+        stacks = self.interpreter.profiler.stacks
+        self.assertEqual(1, stacks[('test.sqf',)][0])
+        self.assertEqual(1, stacks[('test.sqf', 'test.sqf:2')][0])
+        self.assertEqual(1, stacks[('test.sqf', 'test.sqf:3', 'test.sqf:3')][0])
+
+    def test_self_time(self):
+        times = iter(range(100))
+        profiler = Profiler('test.sqf', clock=lambda: next(times))
+        self.interpreter.profiler = profiler
+        interpret('call {_x = 1};', self.interpreter)
+        # 1 unit on the inner statement and 3 - 1 units on the outer statement, both on line 1
+        self.assertEqual([2, 3], profiler.lines[1])
+
+    def test_error(self):
+        with self.assertRaises(SQFParserError):
+            interpret('call {_x = [1] select 5};', self.interpreter)
+        profiler = self.interpreter.profiler
+        self.assertEqual([], profiler._frames)
+        self.assertEqual([], profiler._timers)
+
+        interpret('_y = 1;', self.interpreter)
+        self.assertIn(('test.sqf',), profiler.stacks)
+
+    def test_write(self):
+        interpret('_x = 1;\n_y = 2;', self.interpreter)
+        table = io.StringIO()
+        self.interpreter.profiler.write_table(table, limit=1)
+        self.assertEqual(2, len(table.getvalue().splitlines()))
+
+        collapsed = io.StringIO()
+        self.interpreter.profiler.write_collapsed(collapsed)
+        self.assertTrue(collapsed.getvalue().startswith('test.sqf '))
+
+    def test_disabled(self):
+        interpreter, _ = interpret('_x = 1;')
+        self.assertEqual(None, interpreter.profiler)
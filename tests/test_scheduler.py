@@ -0,0 +1,86 @@
+from unittest import TestCase
+
+from sqf.exceptions import SQFParserError
+from sqf.types import Number as N, Boolean, Array
+from sqf.interpreter import interpret, Interpreter
+from sqf.scheduler import Scheduler
+
+
+class SchedulerTestCase(TestCase):
+
+    def setUp(self):
+        self.interpreter = Interpreter()
+        self.scheduler = Scheduler(self.interpreter)
+
+    def test_sleep(self):
+        self.scheduler.execute('sleep 1800; done = true; t = time')
+        self.scheduler.run()
+        self.assertEqual(Boolean(True), self.interpreter['done'])
+        self.assertEqual(N(1800), self.interpreter['t'])
+        self.assertEqual(0, self.scheduler.scripts)
+
+    def test_order(self):
+        self.scheduler.execute('order = [];'
+                               '[1] spawn {sleep 2; order pushBack (_this select 0)};'
+                               '[2] spawn {sleep 1; order pushBack (_this select 0)};'
+                               '[3] spawn {order pushBack (_this select 0)};')
+        self.scheduler.run()
+        self.assertEqual(Array([N(3), N(2), N(1)]), self.interpreter['order'])
+
+    def test_locals_per_script(self):
+        self.scheduler.execute('[1] spawn {private _x = _this select 0; sleep 1; a = _x};'
+                               '[2] spawn {private _x = _this select 0; sleep 2; b = _x};')
+        self.scheduler.run()
+        self.assertEqual(N(1), self.interpreter['a'])
+        self.assertEqual(N(2), self.interpreter['b'])
+
+    def test_wait_until(self):
+        self.scheduler.execute('_h = 0 spawn {for "_i" from 1 to 3 do {sleep 10}};'
+                               'waitUntil {scriptDone _h};'
+                               't = time;')
+        self.scheduler.run()
+        self.assertTrue(29.9 < self.interpreter['t'].value < 30.1)
+
+    def test_control_structures(self):
+        self.scheduler.execute('x = 0;'
+                               'while {x < 3} do {sleep 1; x = x + 1};'
+                               'if (x == 3) then {sleep 1; y = 1} else {y = 2};'
+                               '{sleep 1; z = _x} forEach [1, 2];'
+                               'call {sleep 1; w = time};')
+        self.scheduler.run()
+        self.assertEqual(N(3), self.interpreter['x'])
+        self.assertEqual(N(1), self.interpreter['y'])
+        self.assertEqual(N(2), self.interpreter['z'])
+        self.assertEqual(N(7), self.interpreter['w'])
+
+    def test_until(self):
+        self.scheduler.execute('while {true} do {sleep 60; ticks = ticks + 1}')
+        self.interpreter.set_global_variable('ticks', N(0))
+        self.scheduler.run(until=1800)
+        self.assertEqual(N(30), self.interpreter['ticks'])
+        self.assertEqual(1, self.scheduler.scripts)
+
+    def test_terminate(self):
+        self.scheduler.execute('_h = 0 spawn {sleep 10; x = 1}; sleep 1; terminate _h')
+        self.scheduler.run()
+        self.assertEqual(0, self.scheduler.scripts)
+        self.assertFalse('x' in self.interpreter)
+
+    def test_many_scripts(self):
+        for i in range(500):
+            self.scheduler.execute('sleep %d; count_done = count_done + 1' % (i % 7))
+        self.interpreter.set_global_variable('count_done', N(0))
+        self.scheduler.run()
+        self.assertEqual(N(500), self.interpreter['count_done'])
+
+    def test_unscheduled(self):
+        with self.assertRaises(SQFParserError):
+            interpret('sleep 1')
+        with self.assertRaises(SQFParserError):
+            interpret('[] spawn {}')
+
+    def test_sleep_type(self):
+        self.scheduler.execute('sleep "x"')
+        with self.assertRaises(SQFParserError) as context:
+            self.scheduler.run()
+        self.assertEqual('error:Interpretation of "sleep "x"" failed', context.exception.message)
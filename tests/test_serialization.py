@@ -0,0 +1,61 @@
+import io
+from unittest import TestCase
+
+from sqf.parser import parse
+from sqf.interpreter_types import DefineStatement, DefineResult
+from sqf.serialization import dumps, loads, dump, load
+
+
+def _positions(node):
+    positions = [(type(node), node._position)]
+    for token in getattr(node, '_tokens', []):
+        positions += _positions(token)
+    return positions
+
+
+class Serialization(TestCase):
+
+    def assertRoundTrip(self, code):
+        tree = parse(code)
+        result = loads(dumps(tree))
+        self.assertEqual(tree, result)
+        self.assertEqual(str(tree), str(result))
+        self.assertEqual(repr(tree), repr(result))
+        self.assertEqual(_positions(tree), _positions(result))
+        return result
+
+    def test_types(self):
+        self.assertRoundTrip('_x = [1, -2, 2.5, 1e10, "a""b", \'c\', true, false, [], missionNamespace];\r\n'
+                             '\tx = {if (_x) then {hint "é"} else {call _y}}; // comment\n'
+                             '/* bulk\ncomment */ y = 1 \\\n + 2')
+
+    def test_preprocessor(self):
+        result = self.assertRoundTrip('#define A(x) x+1\n#define B 2\n#include "a.h"\n'
+                                      'hint str A(B);\n#ifdef B\nb = 1;\n#else\nb = 2;\n#endif\n')
+        # nodes shared by the results of the preprocessor are still shared
+        define_result = next(token for token in result.tokens if isinstance(token, DefineResult))
+        define_statement = result.tokens[0].tokens[0]
+        self.assertIsInstance(define_statement, DefineStatement)
+        self.assertIs(define_statement, define_result.define_statement)
+
+    def test_whitespace(self):
+        self.assertRoundTrip('if (x) then {\r\n\t  a = 1;  \\\n\n};\n\n\n  b = [ 1 ,\t2 ];')
+
+    def test_size(self):
+        code = ''.join('_a%d = [1, 2] select 0;\nif (_a%d > 2) then {\n    hint str _a%d;\n};\n' % (i, i, i)
+                       for i in range(100))
+        self.assertLess(len(dumps(parse(code))), 2 * len(code))
+
+    def test_empty(self):
+        self.assertRoundTrip('')
+
+    def test_file(self):
+        tree = parse('x = 1;')
+        f = io.BytesIO()
+        dump(tree, f)
+        f.seek(0)
+        self.assertEqual(tree, load(f))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            loads(b'not a tree')
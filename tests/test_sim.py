@@ -1,7 +1,9 @@
 from unittest import TestCase
 
-from sqf.types import Number as N, Nothing, Boolean
+from sqf.types import Number as N, Nothing, Boolean, Array
 from sqf.client import Simulation, Client
+from sqf.exceptions import SQFParserError
+from sqf.interpreter import interpret
 
 
 class Sim(TestCase):
@@ -53,3 +55,81 @@ class Sim(TestCase):
 
         sim.server.execute('_x = isDedicated;')
         self.assertEqual(Boolean(True), sim.server._interpreter['_x'])
+
+    def test_broadcast_from_handler_is_queued(self):
+        sim = Simulation()
+
+        id0 = sim.add_client(Client(sim))
+        id1 = sim.add_client(Client(sim))
+        sim.clients[id0].execute('"a" addPublicVariableEventHandler {b = 1; publicVariable "b"};')
+        sim.clients[id1].execute('"a" addPublicVariableEventHandler {seen_b = b};')
+
+        sim.server.execute('a = 1; publicVariable "a";')
+
+        # "b" is delivered after "a" was delivered to every client
+        self.assertEqual(Nothing(), sim.clients[id1]._interpreter['seen_b'])
+        self.assertEqual(N(1), sim.clients[id1]._interpreter['b'])
+        self.assertEqual(N(1), sim.server._interpreter['b'])
+
+    def test_broadcast_chain(self):
+        sim = Simulation()
+        id0 = sim.add_client(Client(sim))
+        sim.server.execute('"n" addPublicVariableEventHandler {n = (_this select 1) + 1; if (n < 500) then {publicVariable "n"}};')
+
+        sim.server.execute('n = 0; publicVariable "n";')
+
+        self.assertEqual(N(500), sim.server._interpreter['n'])
+        self.assertEqual(N(499), sim.clients[id0]._interpreter['n'])
+
+    def test_fork(self):
+        sim = Simulation()
+        id0 = sim.add_client(Client(sim))
+        sim.clients[id0].execute('"x" addPublicVariableEventHandler {y = _this select 1};')
+        sim.server.execute('x = [1]; publicVariable "x";')
+
+        fork = sim.fork()
+        fork.server.execute('x pushBack 2; publicVariable "x";')
+        self.assertEqual(Array([N(1), N(2)]), fork.clients[id0]._interpreter['y'])
+        self.assertIs(fork, fork.clients[id0]._interpreter.simulation)
+
+        self.assertEqual(Array([N(1)]), sim.clients[id0]._interpreter['y'])
+        self.assertEqual(Array([N(1)]), sim.server._interpreter['x'])
+
+        # new clients of the fork receive its broadcasted values
+        id1 = fork.add_client(Client(fork))
+        self.assertEqual(Array([N(1), N(2)]), fork.clients[id1]._interpreter['x'])
+        self.assertEqual(1, len(sim.clients))
+
+    def test_fork_client_interpreter(self):
+        sim = Simulation()
+        id0 = sim.add_client(Client(sim))
+        interpreter = sim.clients[id0]._interpreter
+
+        fork = interpreter.fork()
+        interpret('"x" addPublicVariableEventHandler {y = _this select 1}; x = 1; publicVariable "x"', fork)
+
+        # the fork broadcasts to a copy of the simulation
+        self.assertIsNot(sim, fork.simulation)
+        self.assertEqual(N(1), fork.simulation.server._interpreter['x'])
+        # the original simulation is not modified
+        self.assertEqual({}, sim.clients[id0]._listening_variables)
+        self.assertEqual(Nothing(), sim.server._interpreter['x'])
+        self.assertEqual(Nothing(), interpreter['x'])
+
+    def test_handler_error(self):
+        sim = Simulation()
+        id0 = sim.add_client(Client(sim))
+        id1 = sim.add_client(Client(sim))
+        sim.clients[id0].execute('"a" addPublicVariableEventHandler {c = 2; publicVariable "c"; _x = [1] select 5;};')
+
+        with self.assertRaises(SQFParserError):
+            sim.server.execute('a = 1; publicVariable "a";')
+        # the broadcast and the ones of the handler were delivered to every client
+        self.assertEqual(N(1), sim.clients[id1]._interpreter['a'])
+        self.assertEqual(N(1), sim.server._interpreter['a'])
+        self.assertEqual(N(2), sim.clients[id1]._interpreter['c'])
+
+        sim.server.execute('d = 1; publicVariable "d";')
+        self.assertEqual(N(1), sim.clients[id1]._interpreter['d'])
+        fork = sim.fork()
+        self.assertEqual(N(2), fork.clients[id1]._interpreter['c'])
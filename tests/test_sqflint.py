@@ -1,9 +1,13 @@
 import sys
 import os
 import io
-from unittest import TestCase
+import json
+import shutil
+import subprocess
+import tempfile
+from unittest import TestCase, skipUnless
 
-from sqflint import parse_args, main
+from sqflint import parse_args, main, can_limit_memory, Watcher, write_diff
 
 
 class ParseCode(TestCase):
@@ -42,6 +46,15 @@ class ParseCode(TestCase):
             'test.sqf\n\t[1,5]:warning:Local variable "_x" is not from this scope (not private)\n'
             'test1.sqf\n\t[1,5]:warning:Local variable "_y" is not from this scope (not private)\n')
 
+    def test_mmap_run(self):
+        main(['tests/test_dir/test.sqf', '--mmap'])
+        main(['--directory', 'tests/test_dir', '--mmap'])
+        self.assertEqual(
+            self.stdout.getvalue(),
+            '[1,5]:warning:Local variable "_x" is not from this scope (not private)\n'
+            'test.sqf\n\t[1,5]:warning:Local variable "_x" is not from this scope (not private)\n'
+            'test1.sqf\n\t[1,5]:warning:Local variable "_y" is not from this scope (not private)\n')
+
     def test_directory_run_to_file(self):
         main(['--directory', 'tests/test_dir', '-o', 'tests/result.txt'])
 
@@ -57,3 +70,245 @@ class ParseCode(TestCase):
             result,
             'test.sqf\n\t[1,5]:warning:Local variable "_x" is not from this scope (not private)\n'
             'test1.sqf\n\t[1,5]:warning:Local variable "_y" is not from this scope (not private)\n')
+
+    def test_directory_stats(self):
+        stderr = io.StringIO()
+        sys.stderr = stderr
+        try:
+            main(['--directory', 'tests/test_dir', '--stats', '1', '--stats-json', 'tests/stats.json'])
+        finally:
+            sys.stderr = sys.__stderr__
+
+        with open('tests/stats.json') as f:
+            stats = json.load(f)
+
+        try:
+            os.remove('tests/stats.json')
+        except OSError:
+            pass
+
+        self.assertEqual({'test.sqf', 'test1.sqf'}, set(stats))
+        self.assertTrue({'tokenize', 'parse_block', 'analysis', 'unexecuted_code'} <= set(stats['test.sqf']))
+
+        lines = stderr.getvalue().splitlines()
+        self.assertEqual('Slowest 1 files (ms):', lines[0])
+        self.assertEqual('Totals of 2 files (ms):', lines[2])
+        self.assertTrue(lines[-1].endswith('total'))
+
+        # the diagnostics are unchanged
+        self.assertEqual(
+            self.stdout.getvalue(),
+            'test.sqf\n\t[1,5]:warning:Local variable "_x" is not from this scope (not private)\n'
+            'test1.sqf\n\t[1,5]:warning:Local variable "_y" is not from this scope (not private)\n')
+
+    def test_memory_report(self):
+        stderr = io.StringIO()
+        sys.stderr = stderr
+        try:
+            main(['tests/test_dir/test.sqf', '--memory-report', '--memory-json', 'tests/memory.json'])
+        finally:
+            sys.stderr = sys.__stderr__
+
+        with open('tests/memory.json') as f:
+            memory = json.load(f)
+
+        try:
+            os.remove('tests/memory.json')
+        except OSError:
+            pass
+
+        result = memory['tests/test_dir/test.sqf']
+        self.assertTrue(result['peak'] > 0)
+        self.assertTrue({'tokenize', 'parse_block', 'analysis', 'unexecuted_code'} <= set(result['phases']))
+        self.assertTrue(result['phases']['analysis']['peak'] >= result['phases']['unexecuted_code']['peak'])
+        self.assertEqual('Largest 1 files by peak memory (KiB):', stderr.getvalue().splitlines()[0])
+
+    def test_memory_and_stats(self):
+        sys.stderr = io.StringIO()
+        try:
+            with self.assertRaises(SystemExit):
+                parse_args(['--stats', '--memory-report'])
+        finally:
+            sys.stderr = sys.__stderr__
+
+    def test_directory_run_jsonl(self):
+        main(['--directory', 'tests/test_dir', '--format', 'jsonl'])
+        records = [json.loads(line) for line in self.stdout.getvalue().splitlines()]
+        self.assertEqual(
+            sorted(records, key=lambda record: record['file']),
+            [{'file': 'test.sqf', 'line': 1, 'column': 5, 'severity': 'warning',
+              'message': 'Local variable "_x" is not from this scope (not private)'},
+             {'file': 'test1.sqf', 'line': 1, 'column': 5, 'severity': 'warning',
+              'message': 'Local variable "_y" is not from this scope (not private)'}])
+
+    def test_stdin_jsonl_error(self):
+        sys.stdin = io.StringIO('(')
+        main(['--format', 'jsonl'])
+        record = json.loads(self.stdout.getvalue())
+        self.assertEqual('<stdin>', record['file'])
+        self.assertEqual('error', record['severity'])
+        self.assertEqual('Parenthesis "(" not closed', record['message'])
+
+
+class FileLimits(TestCase):
+
+    def setUp(self):
+        self.stdout = io.StringIO()
+        sys.stdout = self.stdout
+        self.directory = tempfile.mkdtemp()
+        shutil.copy('tests/test_dir/test.sqf', self.directory)
+        # its analysis takes many seconds, longer than any time limit of these tests
+        with open(os.path.join(self.directory, 'large.sqf'), 'w') as f:
+            for i in range(10000):
+                f.write('_a%d = [1, 2] select 0; if (_a%d > 2) then {hint str _a%d};\n' % (i, i, i))
+
+    def tearDown(self):
+        sys.stdout = sys.__stdout__
+        shutil.rmtree(self.directory)
+
+    def test_timeout(self):
+        with self.assertRaises(SystemExit) as context:
+            main(['--directory', self.directory, '--timeout', '1'])
+        self.assertEqual('sqflint: error: the analysis of 1 file(s) was aborted', context.exception.code)
+        self.assertEqual(
+            self.stdout.getvalue(),
+            'large.sqf\n\t[1,0]:error:Analysis aborted: exceeded the time limit of 1s\n'
+            'test.sqf\n\t[1,5]:warning:Local variable "_x" is not from this scope (not private)\n')
+
+    @skipUnless(can_limit_memory(), 'requires resource and /proc')
+    def test_memory_limit_jsonl(self):
+        with self.assertRaises(SystemExit):
+            main(['--directory', self.directory, '--memory-limit', '1', '--format', 'jsonl'])
+        records = [json.loads(line) for line in self.stdout.getvalue().splitlines()]
+        self.assertEqual(
+            [{'file': 'large.sqf', 'line': 1, 'column': 0, 'severity': 'error',
+              'message': 'Analysis aborted: exceeded the memory limit of 1 MiB'},
+             {'file': 'test.sqf', 'line': 1, 'column': 5, 'severity': 'warning',
+              'message': 'Local variable "_x" is not from this scope (not private)'}],
+            sorted(records, key=lambda record: record['file']))
+
+    def test_workers(self):
+        main(['--directory', 'tests/test_dir'])
+        expected = self.stdout.getvalue()
+        self.stdout.truncate(0)
+        self.stdout.seek(0)
+
+        main(['--directory', 'tests/test_dir', '--jobs', '2', '--max-files-per-worker', '1', '--timeout', '60'])
+        self.assertEqual(expected, self.stdout.getvalue())
+
+    def test_limits_require_directory(self):
+        sys.stderr = io.StringIO()
+        try:
+            with self.assertRaises(SystemExit):
+                parse_args(['tests/test_dir/test.sqf', '--timeout', '1'])
+            with self.assertRaises(SystemExit):
+                parse_args(['--directory', 'tests/test_dir', '--jobs', '0'])
+        finally:
+            sys.stderr = sys.__stderr__
+
+
+@skipUnless(shutil.which('git'), 'requires git')
+class ChangedSince(TestCase):
+
+    def setUp(self):
+        self.stdout = io.StringIO()
+        sys.stdout = self.stdout
+        self.directory = tempfile.mkdtemp()
+        self.write('macros.hpp', '#define A 1\n')
+        self.write('a.sqf', 'hint _a;\n')
+        self.write('b.sqf', '#include "macros.hpp"\nhint _b;\n')
+        self.write('c.sqf', 'hint _c;\n')
+        self.git('init', '-q')
+        self.git('add', '.')
+        self.git('-c', 'user.name=test', '-c', 'user.email=test@test', 'commit', '-q', '-m', 'initial')
+
+    def tearDown(self):
+        sys.stdout = sys.__stdout__
+        shutil.rmtree(self.directory)
+
+    def git(self, *arguments):
+        subprocess.check_call(('git', '-C', self.directory) + arguments)
+
+    def write(self, name, code):
+        with open(os.path.join(self.directory, name), 'w') as f:
+            f.write(code)
+
+    def test_changed_since(self):
+        main(['--directory', self.directory, '--changed-since', 'HEAD'])
+        self.assertEqual('', self.stdout.getvalue())
+
+        # a modified header, a modified file and an untracked file
+        self.write('macros.hpp', '#define A 2\n')
+        self.write('c.sqf', 'hint _d;\n')
+        self.write('d.sqf', 'hint _e;\n')
+        main(['--directory', self.directory, '--changed-since', 'HEAD'])
+        self.assertEqual(
+            ['b.sqf', 'c.sqf', 'd.sqf'],
+            sorted(line for line in self.stdout.getvalue().splitlines() if not line.startswith('\t')))
+
+    def test_unknown_revision(self):
+        sys.stderr = io.StringIO()
+        try:
+            with self.assertRaises(SystemExit):
+                main(['--directory', self.directory, '--changed-since', 'unknown'])
+        finally:
+            sys.stderr = sys.__stderr__
+
+
+class Watch(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.write('macros.hpp', '#define A 1\n')
+        self.write('a.sqf', 'hint _a;\n')
+        self.write('b.sqf', '#include "macros.hpp"\nhint _b;\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, code):
+        path = os.path.join(self.directory, name)
+        stamp = os.stat(path).st_mtime_ns if os.path.exists(path) else 0
+        with open(path, 'w') as f:
+            f.write(code)
+        # a modification time different from the previous one, regardless of the resolution of the clock
+        os.utime(path, ns=(stamp + 10**9, stamp + 10**9))
+
+    def test_poll(self):
+        watcher = Watcher(self.directory)
+        warning = '[1,5]:warning:Local variable "%s" is not from this scope (not private)\n'
+        warning_b = '[2,5]:warning:Local variable "_b" is not from this scope (not private)\n'
+        self.assertEqual([('a.sqf', None, [warning % '_a']), ('b.sqf', None, [warning_b])], watcher.poll())
+        self.assertEqual([], watcher.poll())
+
+        self.write('a.sqf', 'hint _c;\n')
+        self.assertEqual([('a.sqf', [warning % '_a'], [warning % '_c'])], watcher.poll())
+
+        # the files that include a changed header are analyzed again
+        self.write('macros.hpp', '#define A 2\n')
+        self.assertEqual([('b.sqf', [warning_b], [warning_b])], watcher.poll())
+
+        os.remove(os.path.join(self.directory, 'a.sqf'))
+        self.write('c.sqf', 'hint "1";\n')
+        self.assertEqual([('a.sqf', [warning % '_c'], None), ('c.sqf', None, [])], watcher.poll())
+
+    def test_new_header(self):
+        self.write('c.sqf', '#include "new.hpp"\nhint "1";\n')
+        watcher = Watcher(self.directory)
+        watcher.poll()
+
+        self.write('new.hpp', '#define B 1\n')
+        self.assertEqual([('c.sqf', [], [])], watcher.poll())
+
+    def test_write_diff(self):
+        writer = io.StringIO()
+        write_diff('a.sqf', ['[1,1]:error:a\n', '[1,2]:error:b\n'], ['[1,2]:error:b\n', '[1,3]:error:c\n'], writer)
+        self.assertEqual('a.sqf\n\t-[1,1]:error:a\n\t+[1,3]:error:c\n', writer.getvalue())
+
+        writer = io.StringIO()
+        write_diff('a.sqf', ['[1,2]:error:b\n'], ['[1,2]:error:b\n'], writer)
+        self.assertEqual('', writer.getvalue())
+
+        writer = io.StringIO()
+        write_diff('a.sqf', None, ['{"file": "a.sqf"}\n'], writer, 'jsonl')
+        self.assertEqual({'file': 'a.sqf', 'change': 'added'}, json.loads(writer.getvalue()))
@@ -0,0 +1,82 @@
+import io
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from sqf.testrunner import discover, run_file, collect, run_test, run_tests, run, main
+
+
+DIRECTORY = os.path.join('tests', 'test_sqf_tests')
+MATH = os.path.join(DIRECTORY, 'test_math.sqf')
+BROKEN = os.path.join(DIRECTORY, 'nested', 'test_broken.sqf')
+
+
+class TestRunner(TestCase):
+
+    def test_discover(self):
+        self.assertEqual([BROKEN, MATH], discover(DIRECTORY))
+
+    def test_run_file(self):
+        results = {result['test']: result for result in run_file(MATH)}
+
+        self.assertEqual(['test_add', 'test_modifies_values', 'test_values_are_independent',
+                          'TEST_fails', 'test_error'], list(results))
+        self.assertEqual('passed', results['test_add']['status'])
+        self.assertEqual(2, results['test_add']['assertions'])
+        # each test runs on a copy of the state of the file
+        self.assertEqual('passed', results['test_modifies_values']['status'])
+        self.assertEqual('passed', results['test_values_are_independent']['status'])
+
+        # tests are named as declared
+        self.assertEqual('failed', results['TEST_fails']['status'])
+        self.assertEqual([20], results['TEST_fails']['failures'])
+
+        self.assertEqual('error', results['test_error']['status'])
+        self.assertIn('selecting element 10', results['test_error']['message'])
+
+    def test_broken_file(self):
+        result, = run_file(BROKEN)
+        self.assertEqual(None, result['test'])
+        self.assertEqual('error', result['status'])
+        self.assertEqual(1, result['line'])
+
+    def test_parallel(self):
+        paths = discover(DIRECTORY)
+
+        def without_time(results):
+            return [[dict(result, time=None) for result in file_results] for file_results in results]
+
+        self.assertEqual(without_time(run(paths, workers=1)), without_time(run(paths, workers=2)))
+        # the tests of a file are distributed to the processes
+        self.assertEqual(without_time(run(paths, workers=1)), without_time(run(paths, workers=3, chunksize=1)))
+
+    def test_collect(self):
+        self.assertEqual((['test_add', 'test_modifies_values', 'test_values_are_independent',
+                           'TEST_fails', 'test_error'], None), collect(MATH))
+        names, error = collect(BROKEN)
+        self.assertEqual([], names)
+        self.assertEqual('error', error['status'])
+
+    def test_run_test(self):
+        result = run_test((MATH, 'TEST_fails'))
+        self.assertEqual((MATH, 'TEST_fails', 'failed'), (result['file'], result['test'], result['status']))
+
+    def test_run_tests(self):
+        results = run_tests([(MATH, 'test_add'), (MATH, 'TEST_fails')])
+        self.assertEqual(['passed', 'failed'], [result['status'] for result in results])
+
+    def test_main(self):
+        output = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            report_path = os.path.join(directory, 'report.json')
+            code = main([DIRECTORY, '-j', '2', '--json', report_path], output)
+            with open(report_path) as f:
+                report = json.load(f)
+
+        self.assertEqual(1, code)
+        self.assertEqual({'tests': 6, 'passed': 3, 'failed': 1, 'error': 2},
+                         {key: report['summary'][key] for key in ('tests', 'passed', 'failed', 'error')})
+        self.assertEqual(6, len(report['tests']))
+        self.assertIn('%s::TEST_fails FAILED\n\tassertions failed at lines 20\n' % MATH, output.getvalue())
+        self.assertTrue(output.getvalue().endswith('1 failed, 2 errors\n'))
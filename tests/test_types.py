@@ -65,3 +65,27 @@ class TestGetPosition(TestCase):
 
         self.assertEqual(Keyword('='), s[1][1])
         self.assertEqual((5, 3), s[1][1].position)
+
+
+class TestStatementViews(TestCase):
+
+    def test_cached(self):
+        statement = Statement([Space(), N(1), Space()], parenthesis=True)
+        self.assertEqual((N(1),), statement.base_tokens)
+        self.assertIs(statement.base_tokens, statement.base_tokens)
+        self.assertEqual((Space(), N(1), Space()), statement.content)
+
+        # equality does not depend on the cached views
+        self.assertEqual(Statement([Space(), N(1), Space()], parenthesis=True), statement)
+
+    def test_reset(self):
+        statement = Statement([N(1)])
+        self.assertEqual((N(1),), statement.base_tokens)
+
+        statement.prepend([N(2), Space()])
+        self.assertEqual((N(2), N(1)), statement.base_tokens)
+        self.assertEqual((N(2), Space(), N(1)), statement.content)
+
+        statement.ending = ';'
+        self.assertEqual((N(2), Space(), N(1)), statement.content)
+        self.assertEqual((N(2), N(1)), statement.base_tokens)